@@ -7,6 +7,7 @@ import matplotlib.pyplot as plt
 import contextily as ctx
 from shapely.geometry import Point
 import glob
+import os
 import numpy as np
 import matplotlib.ticker as mticker
 from matplotlib.colors import LinearSegmentedColormap
@@ -25,19 +26,35 @@ quarter = 2  # Desired quarter for analysis (1, 2, 3, or 4)
 
 
 # %%
-# Find all CSV files for the selected property type and city
-csv_files = glob.glob(f'data/{property_type}/listings_data_m2_medellin*.csv')
+# Months of the selected quarter
+start_month = 3 * (quarter - 1) + 1
+end_month = start_month + 2
 
-# Read and concatenate all CSV files into a single DataFrame for analysis
-df = pd.concat((pd.read_csv(f) for f in csv_files), ignore_index=True)
+# %%
+# Load the Medellín metrocuadrado listings. The Parquet dataset (built by src/update_combined_csv.py,
+# or downloaded from the weekly workflow's artifact) is partitioned by property type and month,
+# so only the quarter and the columns used are read
+dataset_dir = 'data/combined_listings_parquet'
+if os.path.isdir(dataset_dir):
+    months = [f'{year}-{month:02d}' for month in range(start_month, end_month + 1)]
+    df = pd.read_parquet(
+        dataset_dir,
+        columns=['propertyId', 'salePrice', 'area', 'Extraction Date', 'lon', 'lat'],
+        filters=[('property_type', '==', property_type), ('extraction_month', 'in', months),
+                 ('search_city', '==', 'medellin')],
+    )
+else:
+    # Find all CSV files for the selected property type and city
+    csv_files = glob.glob(f'data/{property_type}/listings_data_m2_medellin*.csv')
+
+    # Read and concatenate all CSV files into a single DataFrame for analysis
+    df = pd.concat((pd.read_csv(f) for f in csv_files), ignore_index=True)
 
 # %%
 # Convert 'Extraction Date' column to datetime format if not already
 df['Extraction Date'] = pd.to_datetime(df['Extraction Date'])
 
 # Filter data for the selected quarter and year
-start_month = 3 * (quarter - 1) + 1
-end_month = start_month + 2
 mask = (
     (df['Extraction Date'].dt.year == year) &
     (df['Extraction Date'].dt.month >= start_month) &
@@ -57,10 +74,11 @@ df.drop_duplicates(subset='propertyId', inplace=True, keep='first')
 # Calculate price per square meter for each property
 df['price_per_m2'] = df['salePrice'] / df['area']
 
-# Extract longitude and latitude from the 'coordinates' column
-df['coordinates'] = df['coordinates'].apply(lambda x: ast.literal_eval(x) if isinstance(x, str) else x)
-df['lon'] = df['coordinates'].apply(lambda x: x.get('lon') if isinstance(x, dict) else None)
-df['lat'] = df['coordinates'].apply(lambda x: x.get('lat') if isinstance(x, dict) else None)
+# Extract longitude and latitude from the 'coordinates' column (the Parquet dataset already has them)
+if 'lon' not in df:
+    df['coordinates'] = df['coordinates'].apply(lambda x: ast.literal_eval(x) if isinstance(x, str) else x)
+    df['lon'] = df['coordinates'].apply(lambda x: x.get('lon') if isinstance(x, dict) else None)
+    df['lat'] = df['coordinates'].apply(lambda x: x.get('lat') if isinstance(x, dict) else None)
 
 # Remove rows with missing or zero coordinates
 df = df[(df['lon'] != 0.0) & (df['lat'] != 0.0)]
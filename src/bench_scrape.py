@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the scraping hot paths: payload location, page parsing and browser page loads.
+
+Each benchmark runs over saved page fixtures (a directory of .html files) when one is given,
+and otherwise over synthetic pages shaped like the real ones, so it can be run offline.
+They only time the code paths; tests/test_parsing_equivalence.py checks that the old and new ones agree.
+
+Usage:
+    python src/bench_scrape.py payload [--fixtures DIR] [--pages N] [--repeat N]
+    python src/bench_scrape.py scan [--fixtures DIR] [--pages N]
+    python src/bench_scrape.py labels [--fixtures DIR] [--pages N] [--repeat N]
+    python src/bench_scrape.py parsers [--fixtures DIR] [--pages N] [--repeat N]
+    python src/bench_scrape.py pageload [--fixtures DIR] [--pages N] [--profiles full lean ...] [--asset-delay S]
+
+pageload drives headless Chrome (it needs Chrome and chromedriver) against a local fixture site
+whose detail pages pull images, fonts, a stylesheet and analytics scripts like the real ones.
+"""
+
+import argparse
+import json
+import random
+import re
+import statistics
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from m2_payload import DATA_MARKER, extract_payload, find_payload_in_html
+from lalonja import LISTING_LABELS, extract_listing_fields
+from html_parsing import DEFAULT_PARSER, LISTING_LINKS, PAGINATION, SCRIPTS
+
+def synthetic_m2_detail_page(index, filler_chunks=40):
+    """Builds a page shaped like a metrocuadrado detail page, with the payload inside a Next.js flight chunk.
+
+    Args:
+        index (int): Number used to vary the listing values.
+        filler_chunks (int): Number of unrelated flight chunks surrounding the payload.
+
+    Returns:
+        str: The page HTML.
+    """
+    rng = random.Random(index)
+    data = {
+        'propertyId': f'16974-M{6000000 + index}',
+        'propertyType': {'id': '1', 'nombre': 'Apartamento'},
+        'salePrice': rng.randrange(150, 2000) * 1000000,
+        'area': round(rng.uniform(30, 300), 2),
+        'areac': round(rng.uniform(30, 300), 2),
+        'rooms': str(rng.randrange(1, 5)),
+        'bathrooms': str(rng.randrange(1, 4)),
+        'garages': str(rng.randrange(0, 3)),
+        'city': {'id': '4483', 'nombre': 'Medellín'},
+        'zone': None,
+        'neighborhood': 'EL POBLADO',
+        'commonNeighborhood': 'El Poblado',
+        'detail': {'adminPrice': rng.randrange(100, 900) * 1000, 'floor': rng.randrange(1, 30)},
+        'companyName': 'INMOBILIARIA {DEMO}',
+        'propertyState': 'Usado',
+        'coordinates': {'lon': -75.56 + rng.random() / 10, 'lat': 6.2 + rng.random() / 10},
+        'link': f'https://www.metrocuadrado.com/inmueble/venta-apartamento-medellin/16974-M{6000000 + index}',
+        'builtTime': 'Entre 5 y 10 años',
+        'stratum': rng.randrange(1, 7),
+        'comment': 'Apartamento {remodelado} con vista, cerca de centros comerciales. ' * 20,
+        'images': [{'image': f'https://img.metrocuadrado.com/{index}/{i}.jpg'} for i in range(30)],
+    }
+    chunks = []
+    for i in range(filler_chunks):
+        filler = ['$', 'div', None, {'className': f'section-{i}', 'children': ['texto de relleno'] * 40}]
+        chunks.append(f'{i + 10}:' + json.dumps(filler, separators=(',', ':')) + '\n')
+    payload = '5:' + json.dumps(['$', '$L1', None, {'data': data}], separators=(',', ':'), ensure_ascii=False) + '\n'
+    chunks.insert(filler_chunks // 2, payload)
+    scripts = ''.join(
+        '<script>self.__next_f.push(' + json.dumps([1, chunk], ensure_ascii=False) + ')</script>' for chunk in chunks
+    )
+    return f'<!DOCTYPE html><html><head><title>Inmueble {index}</title></head><body><main>{"<div>card</div>" * 200}</main>{scripts}</body></html>'
+
+def synthetic_lalonja_listing_page(index):
+    """Builds a page shaped like a lalonja listing page: navigation, gallery, features list and footer.
+
+    Args:
+        index (int): Number used to vary the listing values.
+
+    Returns:
+        str: The page HTML.
+    """
+    rng = random.Random(index)
+    menu = ''.join(f'<li><a href="/inmuebles/Venta/clases_{kind}">{kind}</a></li>' for kind in ('Apartamento', 'Casa', 'Local', 'Lote', 'Finca') * 6)
+    gallery = ''.join(f'<div class="item"><img src="/fotos/{index}/{i}.jpg" alt="foto {i}"></div>' for i in range(25))
+    features = {'Baños': rng.randrange(1, 4), 'Área': f'{rng.randrange(40, 200)}m', 'Habitaciones': rng.randrange(1, 5),
+                'Garajes': rng.randrange(0, 3), 'Closets': rng.randrange(1, 5), 'Estrato': rng.randrange(1, 7)}
+    feature_list = ''.join(f'<li><strong>{label}:</strong><span>{value}</span></li>' for label, value in features.items())
+    description = '<p>Inmueble con excelente ubicación, cerca de transporte y zonas comerciales.</p>' * 15
+    similar = ''.join(f'<div class="card"><a href="/inmueble/{index + i}/Venta/">Inmueble {index + i}</a><span class="price">$ {i}00,000,000</span></div>' for i in range(12))
+    return (f'<!DOCTYPE html><html><head><title>Inmueble {index}</title></head><body>'
+            f'<header><nav><ul>{menu}</ul></nav></header><main><div class="gallery">{gallery}</div>'
+            f'<h1>Apartamento en venta</h1><div class="property-price">${rng.randrange(150, 900)},000,000</div>'
+            f'<div class="listing-address">Medellín, Barrio {index}</div><ul class="features">{feature_list}</ul>'
+            f'<section class="description">{description}</section><section class="similar">{similar}</section></main>'
+            f'<footer>{"<p>Lalonja Propiedad Raíz</p>" * 10}</footer></body></html>')
+
+def synthetic_lalonja_results_page(index, listings=24, total_pages=40):
+    """Builds a page shaped like a lalonja results page: cards with #ruta32 anchors and a pagination list."""
+    cards = ''.join(
+        f'<div class="card"><a id="ruta32" href="/inmueble/{index * listings + i}/Venta/"><img src="/fotos/{i}.jpg"></a>'
+        f'<h3>Apartamento en venta</h3><p class="price">$ {200 + i},000,000</p><ul><li>2 baños</li><li>3 habitaciones</li></ul></div>'
+        for i in range(listings)
+    )
+    pagination = ''.join(f'<li><a href="/inmuebles/Venta/clases_Apartamento/pagina/{i}">{i}</a></li>' for i in range(1, total_pages + 1))
+    nav = '<a href="/">Inicio</a>' * 30
+    return (f'<!DOCTYPE html><html><head><title>Resultados {index}</title></head><body>'
+            f'<header><nav>{nav}</nav></header><main>{cards}</main>'
+            f'<ul class="pagination">{pagination}<li><a href="#">»</a></li></ul><footer>{"<p>Lalonja</p>" * 10}</footer></body></html>')
+
+def load_pages(fixtures, pages, builder):
+    """Returns the HTML of the saved fixtures, or `pages` synthetic pages built with `builder`."""
+    if fixtures:
+        return [path.read_text(encoding='utf-8') for path in sorted(Path(fixtures).glob('*.html'))]
+    return [builder(i) for i in range(pages)]
+
+def legacy_extract_payload(script_text):
+    """The per-character brace counter previously used by extract_json_data, kept for comparison."""
+    start_index = script_text.find(DATA_MARKER)
+    brace_count = 0
+    end_index = start_index
+    for i in range(start_index, len(script_text)):
+        if script_text[i] == '{':
+            brace_count += 1
+        elif script_text[i] == '}':
+            brace_count -= 1
+            if brace_count == 0:
+                end_index = i + 1
+                break
+    json_string = script_text[start_index:end_index].replace("\\", "")
+    return json.loads(json_string)
+
+def time_pages(function, items, repeat):
+    """Runs `function` over every item `repeat` times and returns (pages per second, results of the last round)."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        results = []
+        for item in items:
+            try:
+                results.append(function(item))
+            except ValueError:
+                results.append(None)
+    elapsed = time.perf_counter() - start
+    return len(items) * repeat / elapsed, results
+
+def bench_payload(args):
+    pages = load_pages(args.fixtures, args.pages, synthetic_m2_detail_page)
+    scripts = []
+    for html in pages:
+        soup = BeautifulSoup(html, 'html.parser')
+        scripts.extend(tag.string for tag in soup.find_all('script') if tag.string and DATA_MARKER in tag.string)
+    print(f"Payload locator over {len(scripts)} pages ({sum(map(len, scripts)) / max(len(scripts), 1) / 1024:.0f} KB of script each)")
+
+    before, _ = time_pages(legacy_extract_payload, scripts, args.repeat)
+    after, _ = time_pages(extract_payload, scripts, args.repeat)
+    print(f"  brace counter : {before:10.1f} pages/s")
+    print(f"  raw_decode    : {after:10.1f} pages/s  ({after / before:.1f}x)")
+
+def soup_find_payload(html):
+    """The BeautifulSoup path of extract_json_data: build the DOM, then look through every script tag."""
+    soup = BeautifulSoup(html, 'html.parser')
+    for script_tag in soup.find_all('script'):
+        if script_tag.string and DATA_MARKER in script_tag.string:
+            return extract_payload(script_tag.string)
+    return None
+
+def measure_page(function, html):
+    """Returns (seconds, peak traced bytes) for one call of `function` on a page."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    function(html)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+def bench_scan(args):
+    pages = load_pages(args.fixtures, args.pages, synthetic_m2_detail_page)
+    print(f"Detail page parsing over {len(pages)} pages ({sum(map(len, pages)) / len(pages) / 1024:.0f} KB of HTML each)")
+    for name, function in (('BeautifulSoup', soup_find_payload), ('raw scan', find_payload_in_html)):
+        measurements = [measure_page(function, html) for html in pages]
+        times = sorted(elapsed for elapsed, _ in measurements)
+        peaks = [peak for _, peak in measurements]
+        print(f"  {name:13}: median {times[len(times) // 2] * 1000:8.2f} ms/page, "
+              f"max {times[-1] * 1000:8.2f} ms/page, peak memory {max(peaks) / 1024:8.0f} KB/page")
+
+def legacy_extract_value(soup, label):
+    """The extract_value previously used by get_listing_data (three tree searches per label), kept for comparison."""
+    label_element = soup.find(string=re.compile(rf"\s*{label}\s*", re.IGNORECASE))
+    if label_element:
+        value_element = label_element.find_next(string=True)
+        if value_element:
+            return value_element.strip()
+    label_element = soup.find('strong', string=re.compile(rf"\s*{label}\s*", re.IGNORECASE))
+    if label_element:
+        value_element = label_element.find_next(string=True)
+        if value_element:
+            return value_element.strip()
+    value_element = soup.find('span', class_=re.compile(rf".*{label}.*", re.IGNORECASE))
+    if value_element:
+        return value_element.text.strip()
+    return None
+
+def legacy_listing_fields(soup):
+    """The per-field searches previously done by get_listing_data."""
+    fields = {label: legacy_extract_value(soup, label) for label in LISTING_LABELS}
+    price_element = soup.find(class_="property-price")
+    fields["Precio"] = price_element.text.strip() if price_element else None
+    location_element = soup.find(class_="listing-address")
+    fields["location"] = location_element.text.strip() if location_element else None
+    return fields
+
+def bench_labels(args):
+    pages = load_pages(args.fixtures, args.pages, synthetic_lalonja_listing_page)
+    soups = [BeautifulSoup(html, 'html.parser') for html in pages]
+    print(f"lalonja field extraction over {len(soups)} pages ({sum(map(len, pages)) / len(pages) / 1024:.0f} KB of HTML each)")
+
+    before, _ = time_pages(legacy_listing_fields, soups, args.repeat)
+    after, _ = time_pages(extract_listing_fields, soups, args.repeat)
+    print(f"  per-label soup.find : {before:10.1f} pages/s")
+    print(f"  single pass         : {after:10.1f} pages/s  ({after / before:.1f}x)")
+
+def bench_parsers(args):
+    parsers = ['html.parser'] + (['lxml'] if DEFAULT_PARSER == 'lxml' else [])
+    full_page = ('full page', None)
+    corpora = [
+        ('lalonja listing', load_pages(args.fixtures, args.pages, synthetic_lalonja_listing_page), [full_page]),
+        ('lalonja results', [synthetic_lalonja_results_page(i) for i in range(args.pages)],
+         [full_page, ('#ruta32 only', LISTING_LINKS), ('.pagination only', PAGINATION)]),
+        ('m2 detail', [synthetic_m2_detail_page(i) for i in range(args.pages)], [full_page, ('scripts only', SCRIPTS)]),
+    ]
+    print(f"HTML parser comparison ({args.pages} pages per corpus)")
+    for corpus, pages, strainers in corpora:
+        for label, strainer in strainers:
+            for parser in parsers:
+                speed, _ = time_pages(lambda html: BeautifulSoup(html, parser, parse_only=strainer), pages, args.repeat)
+                print(f"  {corpus:16} {label:17} {parser:12}: {speed:10.1f} pages/s")
+
+# Assets referenced by the pageload fixture pages; the analytics paths embed the real hostnames so the
+# TRACKER_URLS patterns of the lean profiles match them on the local server
+FIXTURE_ASSETS = (
+    '<link rel="stylesheet" href="/static/site.css">'
+    '<script async src="/www.googletagmanager.com/gtm.js"></script>'
+    '<script async src="/www.google-analytics.com/analytics.js"></script>'
+    '<script async src="/connect.facebook.net/fbevents.js"></script>'
+)
+FIXTURE_CSS = '@font-face{font-family:Demo;src:url(/static/demo.woff2)}body{font-family:Demo}' + '.c{margin:0}' * 2000
+
+def start_fixture_site(pages, images=12, asset_delay=0.05):
+    """Serves the detail pages and their assets from a local server in a daemon thread.
+
+    Assets wait `asset_delay` seconds before answering, like a CDN at a few tens of ms away.
+
+    Returns:
+        tuple: (base URL, stats dict of requests and bytes per kind of resource, lock guarding stats).
+    """
+    stats = {}
+    lock = threading.Lock()
+
+    class FixtureHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.startswith('/detail/'):
+                index = int(self.path.rsplit('/', 1)[1])
+                gallery = ''.join(f'<img src="/static/img/{index}-{i}.jpg">' for i in range(images))
+                html = pages[index % len(pages)].replace('</head>', FIXTURE_ASSETS + '</head>').replace('<main>', '<main>' + gallery)
+                body, kind, content_type = html.encode(), 'html', 'text/html; charset=utf-8'
+            else:
+                time.sleep(asset_delay)
+                if self.path.endswith('.css'):
+                    body, kind, content_type = FIXTURE_CSS.encode(), 'css', 'text/css'
+                elif self.path.endswith('.woff2'):
+                    body, kind, content_type = bytes(60 * 1024), 'font', 'font/woff2'
+                elif self.path.endswith('.jpg'):
+                    body, kind, content_type = bytes(120 * 1024), 'image', 'image/jpeg'
+                else:
+                    body, kind, content_type = b'/* tracker */' + b' ' * 40 * 1024, 'tracker', 'application/javascript'
+            with lock:
+                requests, sent = stats.get(kind, (0, 0))
+                stats[kind] = (requests + 1, sent + len(body))
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_address[1]}', stats, lock
+
+def bench_pageload(args):
+    from browser_pool import PROFILES, create_driver
+    from metrocuadrado import wait_for_payload_script
+
+    pages = load_pages(args.fixtures, args.pages, synthetic_m2_detail_page)
+    base_url, stats, lock = start_fixture_site(pages, asset_delay=args.asset_delay)
+    print(f"Detail page load per browser profile ({len(pages)} pages, {args.asset_delay * 1000:.0f} ms per asset)")
+    for profile in args.profiles or list(PROFILES):
+        driver = create_driver(profile=profile)
+        try:
+            driver.get(f'{base_url}/detail/0')  # Warm up the browser outside the measurement
+            with lock:
+                stats.clear()
+            load_times, ready_times = [], []
+            for i in range(len(pages)):
+                start = time.perf_counter()
+                driver.get(f'{base_url}/detail/{i}')
+                load_times.append(time.perf_counter() - start)
+                found = wait_for_payload_script(driver) is not None
+                ready_times.append(time.perf_counter() - start if found else float('nan'))
+            time.sleep(args.asset_delay * 2)  # Let late asset requests of the last page land in the stats
+        finally:
+            driver.quit()
+        with lock:
+            requests = sum(count for count, _ in stats.values())
+            sent = sum(size for _, size in stats.values())
+            kinds = ', '.join(f"{kind} {count}" for kind, (count, _) in sorted(stats.items()))
+        ready_times.sort()
+        print(f"  {profile:8}: get() p50 {statistics.median(load_times) * 1000:7.1f} ms, payload ready p50 "
+              f"{statistics.median(ready_times) * 1000:7.1f} ms p95 {ready_times[int(0.95 * (len(ready_times) - 1))] * 1000:7.1f} ms, "
+              f"{sent / len(pages) / 1024:7.1f} KB and {requests / len(pages):4.1f} requests per page ({kinds})")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    payload = subparsers.add_parser('payload', help='metrocuadrado JSON payload locator')
+    payload.add_argument('--fixtures', help='directory of saved detail pages (*.html)')
+    payload.add_argument('--pages', type=int, default=50, help='number of synthetic pages when no fixtures are given')
+    payload.add_argument('--repeat', type=int, default=5)
+    payload.set_defaults(run=bench_payload)
+
+    scan = subparsers.add_parser('scan', help='m2 detail page parsing, raw scan vs BeautifulSoup (time and peak memory)')
+    scan.add_argument('--fixtures', help='directory of saved detail pages (*.html)')
+    scan.add_argument('--pages', type=int, default=30, help='number of synthetic pages when no fixtures are given')
+    scan.set_defaults(run=bench_scan)
+
+    labels = subparsers.add_parser('labels', help='lalonja label extraction, per-label searches vs single pass')
+    labels.add_argument('--fixtures', help='directory of saved listing pages (*.html)')
+    labels.add_argument('--pages', type=int, default=50, help='number of synthetic pages when no fixtures are given')
+    labels.add_argument('--repeat', type=int, default=5)
+    labels.set_defaults(run=bench_labels)
+
+    parsers = subparsers.add_parser('parsers', help='html.parser vs lxml, full and SoupStrainer-restricted parsing')
+    parsers.add_argument('--fixtures', help='directory of saved lalonja listing pages (*.html)')
+    parsers.add_argument('--pages', type=int, default=20, help='number of synthetic pages per corpus')
+    parsers.add_argument('--repeat', type=int, default=3)
+    parsers.set_defaults(run=bench_parsers)
+
+    pageload = subparsers.add_parser('pageload', help='headless Chrome page load time and bytes per browser profile')
+    pageload.add_argument('--fixtures', help='directory of saved detail pages (*.html)')
+    pageload.add_argument('--pages', type=int, default=20, help='number of synthetic pages when no fixtures are given')
+    pageload.add_argument('--profiles', nargs='+', help='browser profiles to compare (default: all)')
+    pageload.add_argument('--asset-delay', type=float, default=0.05, help='seconds each asset takes to answer')
+    pageload.set_defaults(run=bench_pageload)
+
+    args = parser.parse_args()
+    args.run(args)
+
+if __name__ == '__main__':
+    main()
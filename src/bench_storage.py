@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the data pipeline: combining, ingesting and storing the CSVs of a data/ directory.
+
+Each one reads a data/ tree of <property type>/*.csv folders, the repository's own by default.
+
+Usage:
+    python src/bench_storage.py combine [--data-dir DIR]
+    python src/bench_storage.py ingest [--data-dir DIR] [--workers 1 2 4 8]
+    python src/bench_storage.py schemas [--data-dir DIR]
+    python src/bench_storage.py dataset [--data-dir DIR] [--property-type TYPE] [--city SLUG] [--quarter YYYY-Q]
+    python src/bench_storage.py store [--data-dir DIR] [--days N]
+"""
+
+import argparse
+import contextlib
+import csv
+import functools
+import hashlib
+import io
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from combine_csvs import combine_csv_files
+from csv_ingest import PROPERTY_TYPE_BY_FOLDER, CsvTreeReader, _normalize_rows, data_files
+from schema_registry import SchemaRegistry, column_mapping
+import listing_dataset
+from listing_store import ListingStore, segment_of
+
+def combine_csv_files_in_memory(data_dir, output_file):
+    """The combine_csv_files previously used by combine_csvs.py (every row held as a dict until the end), kept for comparison."""
+    all_columns = set()
+    file_data = []
+    for csv_file in Path(data_dir).glob('*/*.csv'):
+        with open(csv_file, 'r', encoding='utf-8') as f:
+            sample = f.read(1024)
+            f.seek(0)
+            reader = csv.DictReader(f, dialect=csv.Sniffer().sniff(sample))
+            if reader.fieldnames:
+                all_columns.update(reader.fieldnames)
+                file_data.append((list(reader), csv_file.parent.name))
+    all_columns = sorted(all_columns)
+    with open(output_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=all_columns)
+        writer.writeheader()
+        for rows, source_folder in file_data:
+            for row in rows:
+                complete_row = {col: row.get(col, '') for col in all_columns}
+                if not (complete_row.get('propertyType') or '').strip() and source_folder in PROPERTY_TYPE_BY_FOLDER:
+                    complete_row['propertyType'] = PROPERTY_TYPE_BY_FOLDER[source_folder]
+                writer.writerow(complete_row)
+
+COMBINERS = {'in-memory': combine_csv_files_in_memory, 'streaming': functools.partial(combine_csv_files, workers=1)}
+
+def _measure_combine(name, data_dir, output_file, results):
+    """Runs one combiner in the current (fresh) process and puts its wall time and peak RSS in `results`."""
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        COMBINERS[name](data_dir, output_file)
+    results.put((time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+
+def bench_combine(args):
+    files = data_files(args.data_dir)
+    print(f"Combining {len(files)} CSVs ({sum(f.stat().st_size for f in files) / 1e6:.0f} MB) under {args.data_dir}")
+    context = multiprocessing.get_context('spawn')  # A new interpreter per run, so the peak RSS is its own
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in COMBINERS:
+            output_file = Path(tmp) / f'{name}.csv'
+            results = context.Queue()
+            process = context.Process(target=_measure_combine, args=(name, args.data_dir, output_file, results))
+            process.start()
+            wall, max_rss = results.get()
+            process.join()
+            # ru_maxrss is in KB on Linux
+            print(f"  {name:9}: {wall:6.2f} s, peak RSS {max_rss / 1024:7.1f} MB, output {output_file.stat().st_size / 1e6:.0f} MB")
+
+def bench_ingest(args):
+    files = data_files(args.data_dir)
+    print(f"Full rebuild of the combined CSV from {len(files)} files per worker count ({os.cpu_count()} cores)")
+    baseline = None
+    with tempfile.TemporaryDirectory() as tmp:
+        output_file = Path(tmp) / 'combined.csv'
+        for workers in args.workers:
+            start = time.perf_counter()
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                combine_csv_files(args.data_dir, output_file, workers=workers)
+            wall = time.perf_counter() - start
+            digest = hashlib.sha1(output_file.read_bytes()).hexdigest()
+            baseline = baseline or (wall, digest)
+            print(f"  {workers} workers: {wall:6.2f} s, speedup {baseline[0] / wall:4.2f}x, "
+                  f"output {'identical' if digest == baseline[1] else 'DIFFERENT'}")
+
+def sniff_headers(csv_files):
+    """The header pass previously done by combine_csvs.py (csv.Sniffer on every file), kept for comparison."""
+    headers = []
+    for csv_file in csv_files:
+        with open(csv_file, 'r', encoding='utf-8') as f:
+            sample = f.read(1024)
+            f.seek(0)
+            headers.append(csv.DictReader(f, dialect=csv.Sniffer().sniff(sample)).fieldnames)
+    return headers
+
+def normalize_rows_with_dicts(csv_files, columns):
+    """The row pass previously done by combine_csvs.py (a DictReader row and a complete dict per row), kept for comparison."""
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=columns)
+    for csv_file in csv_files:
+        property_type = PROPERTY_TYPE_BY_FOLDER.get(csv_file.parent.name)
+        with open(csv_file, 'r', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                complete_row = {col: row.get(col, '') for col in columns}
+                if property_type and not (complete_row.get('propertyType') or '').strip():
+                    complete_row['propertyType'] = property_type
+                writer.writerow(complete_row)
+    return output.getvalue()
+
+def bench_schemas(args):
+    csv_files = data_files(args.data_dir)
+    print(f"Header and row passes over {len(csv_files)} files, one process")
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = SchemaRegistry(Path(tmp) / 'schemas.sqlite')
+        with CsvTreeReader(workers=1, registry=registry) as reader:
+            timings = []
+            start = time.perf_counter()
+            sniff_headers(csv_files)
+            timings.append(('csv.Sniffer per file', time.perf_counter() - start))
+            for label in ('registry, cold', 'registry, warm'):
+                start = time.perf_counter()
+                files = [(csv_file, schema_id, header) for csv_file, schema_id, header, _ in reader.headers(csv_files)]
+                timings.append((label, time.perf_counter() - start))
+            print(f"  headers ({registry.stats()['schemas']} schemas):")
+            for label, wall in timings:
+                print(f"    {label:20}: {wall:6.2f} s")
+        registry.close()
+    columns = sorted({column for _, _, header in files for column in header})
+    start = time.perf_counter()
+    with_dicts = normalize_rows_with_dicts(csv_files, columns)
+    dict_wall = time.perf_counter() - start
+    start = time.perf_counter()
+    mappings = {schema_id: (column_mapping(header, columns), len(header)) for _, schema_id, header in files}
+    by_index, _ = _normalize_rows([(csv_file, schema_id) for csv_file, schema_id, _ in files], mappings, columns.index('propertyType'))
+    index_wall = time.perf_counter() - start
+    print("  rows:")
+    print(f"    {'dict per row':20}: {dict_wall:6.2f} s")
+    print(f"    {'index mapping':20}: {index_wall:6.2f} s, output {'identical' if by_index == with_dicts else 'DIFFERENT'}")
+
+def bench_dataset(args):
+    year, quarter = (int(part) for part in args.quarter.split('-'))
+    start_month = 3 * (quarter - 1) + 1
+    months = [f'{year}-{month:02d}' for month in range(start_month, start_month + 3)]
+    columns = ['propertyId', 'salePrice', 'area', 'Extraction Date', 'coordinates']
+    print(f"Loading {args.property_type} listings of {args.city}, {months[0]} to {months[-1]}")
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset_dir = Path(tmp) / 'dataset'
+        start = time.perf_counter()
+        report = listing_dataset.write_dataset(data_files(args.data_dir), dataset_dir, workers=1)
+        size = sum(f.stat().st_size for f in dataset_dir.rglob('*.parquet'))
+        print(f"  build: {time.perf_counter() - start:6.2f} s, {sum(rows for _, rows, _ in report)} rows, {size / 1e6:.1f} MB")
+
+        # What the analyses did so far: every daily CSV of the city, then filter the quarter
+        start = time.perf_counter()
+        csv_files = Path(args.data_dir, args.property_type).glob(f'listings_data_m2_{args.city}_*.csv')
+        df = pd.concat((pd.read_csv(f) for f in csv_files), ignore_index=True)
+        df['Extraction Date'] = pd.to_datetime(df['Extraction Date'])
+        from_csv = df[df['Extraction Date'].dt.strftime('%Y-%m').isin(months)][columns]
+        csv_wall = time.perf_counter() - start
+
+        start = time.perf_counter()
+        from_dataset = listing_dataset.read_listings(
+            columns=columns, property_types=[args.property_type], start=f'{months[0]}-01',
+            end=(pd.Timestamp(f'{months[-1]}-01') + pd.offsets.MonthEnd()).date(),
+            filter=listing_dataset.ds.field('search_city') == args.city, dataset_dir=dataset_dir,
+        )
+        dataset_wall = time.perf_counter() - start
+    print(f"  {'CSV glob':8}: {csv_wall * 1000:8.1f} ms, {len(from_csv)} rows")
+    print(f"  {'Parquet':8}: {dataset_wall * 1000:8.1f} ms, {len(from_dataset)} rows")
+
+def _tree_bytes(root, since=None):
+    """Returns (number, total size) of the files under root, only those modified after `since` if given."""
+    files = [f for f in Path(root).rglob('*') if f.is_file() and (since is None or f.stat().st_mtime_ns > since)]
+    return len(files), sum(f.stat().st_size for f in files)
+
+def bench_store(args):
+    data_dir = Path(args.data_dir)
+    csv_files = data_files(data_dir)
+    dates = sorted({segment_of(f).split('/')[1] for f in csv_files if segment_of(f)})
+    week = set(dates[-args.days:])
+    history = [f for f in csv_files if segment_of(f) and segment_of(f).split('/')[1] not in week]
+    new_files = [f for f in csv_files if segment_of(f) and segment_of(f).split('/')[1] in week]
+    print(f"Weekly update of {len(new_files)} files ({args.days} days) over {len(history)} already combined, one process")
+    with tempfile.TemporaryDirectory() as tmp, CsvTreeReader(workers=1) as reader:
+        # What update_combined_csv.py did: append to the single combined CSV, committed whole
+        combined_file = Path(tmp) / 'combined_listings.csv'
+        columns = sorted({column for _, _, header, _ in reader.headers(csv_files) if header for column in header})
+        with open(combined_file, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerow(columns)
+            files = [(csv_file, schema_id, header) for csv_file, schema_id, header, _ in reader.headers(history) if header]
+            for text, _ in reader.normalized_rows(files, columns):
+                f.write(text)
+        start = time.perf_counter()
+        with open(combined_file, 'a', newline='', encoding='utf-8') as f:
+            files = [(csv_file, schema_id, header) for csv_file, schema_id, header, _ in reader.headers(new_files) if header]
+            for text, _ in reader.normalized_rows(files, columns):
+                f.write(text)
+        csv_wall = time.perf_counter() - start
+
+        store = ListingStore(Path(tmp) / 'store')
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            store.add_files(reader, history, data_dir)
+        before = time.time_ns()
+        start = time.perf_counter()
+        store.add_files(reader, new_files, data_dir)
+        store_wall = time.perf_counter() - start
+        written, written_bytes = _tree_bytes(store.root, since=before)
+        total, total_bytes = _tree_bytes(store.root)
+        print(f"  {'combined CSV':13}: {csv_wall:6.2f} s, 1 file of {combined_file.stat().st_size / 1e6:6.1f} MB to commit")
+        print(f"  {'segment store':13}: {store_wall:6.2f} s, {written} files of {written_bytes / 1e6:6.1f} MB to commit "
+              f"(store: {total} files, {total_bytes / 1e6:.1f} MB)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    combine = subparsers.add_parser('combine', help='data/ CSV combiner, rows held in memory vs streamed (wall time and peak RSS)')
+    combine.add_argument('--data-dir', default='data', help='root of the <property type>/*.csv folders')
+    combine.set_defaults(run=bench_combine)
+
+    ingest = subparsers.add_parser('ingest', help='full rebuild of the combined CSV with 1, 2, 4, ... worker processes')
+    ingest.add_argument('--data-dir', default='data', help='root of the <property type>/*.csv folders')
+    ingest.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8], help='worker counts to compare')
+    ingest.set_defaults(run=bench_ingest)
+
+    schemas = subparsers.add_parser('schemas', help='header pass with csv.Sniffer vs the schema registry, rows remapped by dict vs by index')
+    schemas.add_argument('--data-dir', default='data', help='root of the <property type>/*.csv folders')
+    schemas.set_defaults(run=bench_schemas)
+
+    dataset = subparsers.add_parser('dataset', help='one quarter of one city loaded from the daily CSVs vs the Parquet dataset')
+    dataset.add_argument('--data-dir', default='data', help='root of the <property type>/*.csv folders')
+    dataset.add_argument('--property-type', default='Apartments', help='data/ folder to load')
+    dataset.add_argument('--city', default='medellin', help='metrocuadrado city slug of the CSV names')
+    dataset.add_argument('--quarter', default='2025-2', help='quarter to load, YYYY-Q')
+    dataset.set_defaults(run=bench_dataset)
+
+    store = subparsers.add_parser('store', help='weekly update, appending to the combined CSV vs writing store segments')
+    store.add_argument('--data-dir', default='data', help='root of the <property type>/*.csv folders')
+    store.add_argument('--days', type=int, default=7, help='most recent extraction dates treated as the new week')
+    store.set_defaults(run=bench_store)
+
+    args = parser.parse_args()
+    args.run(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Headless Chrome creation and a pool of reusable browsers.
+
+Starting Chrome is the most expensive fixed cost of a metrocuadrado run. The pool starts each
+browser once and hands it out to successive city/type jobs instead of paying that cost per job.
+
+Browsers are started with one of the PROFILES. The scrapers only read the DOM and the embedded
+JSON, so the lean profiles skip what a person would look at (images, fonts, optionally CSS),
+block analytics and ad requests through the DevTools protocol, and hand the page back once the
+DOM is ready instead of waiting for every asset.
+"""
+
+import logging
+import queue
+import random
+import threading
+from contextlib import contextmanager
+
+from selenium import webdriver
+
+from http_client import USER_AGENTS
+
+# Third-party requests the pages make that never carry listing data (Network.setBlockedURLs patterns)
+TRACKER_URLS = [
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*', '*googlesyndication.com*',
+    '*googleadservices.com*', '*adservice.google.*', '*facebook.net*', '*connect.facebook.com*',
+    '*hotjar.com*', '*clarity.ms*', '*tiktok.com*', '*nr-data.net*', '*newrelic.com*', '*segment.io*',
+    '*criteo.com*', '*taboola.com*', '*outbrain.com*', '*adsrvr.org*',
+]
+FONT_URLS = ['*.woff', '*.woff2', '*.ttf', '*.otf', '*fonts.googleapis.com*', '*fonts.gstatic.com*']
+CSS_URLS = ['*.css']
+
+# Browser profile name -> how Chrome loads pages. Sources pick one, see MetrocuadradoSource.browser_profile
+PROFILES = {
+    'full': {'page_load_strategy': 'normal', 'images': True, 'blocked_urls': []},  # Everything, like a regular visit
+    'lean': {'page_load_strategy': 'eager', 'images': False, 'blocked_urls': TRACKER_URLS + FONT_URLS},
+    'minimal': {'page_load_strategy': 'eager', 'images': False, 'blocked_urls': TRACKER_URLS + FONT_URLS + CSS_URLS},
+}
+
+def create_driver(user_agent=None, profile='full'):
+    """Starts a headless Chrome.
+
+    Args:
+        user_agent (str): User agent to use. A random one from USER_AGENTS is used if None.
+        profile (str): One of PROFILES.
+
+    Returns:
+        selenium.webdriver.Chrome: The started browser.
+    """
+    settings = PROFILES[profile]
+    options = webdriver.ChromeOptions()
+    options.add_argument('--headless=new')  # Run Chrome in headless mode (no browser window)
+    options.add_argument(f"user-agent={user_agent or random.choice(USER_AGENTS)}")
+    options.page_load_strategy = settings['page_load_strategy']  # "eager" returns from get() once the DOM is parsed
+    if not settings['images']:
+        options.add_argument('--blink-settings=imagesEnabled=false')
+        options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+    driver = webdriver.Chrome(options=options)
+    if settings['blocked_urls']:
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': settings['blocked_urls']})
+        except Exception:
+            driver.quit()
+            raise
+    return driver
+
+class BrowserPool:
+    """Pool of up to `size` headless Chrome instances shared by concurrent jobs.
+
+    Browsers are started lazily on first use and reused until close() is called. A browser that
+    stops responding is discarded and replaced when it is handed back.
+
+    Args:
+        size (int): Maximum number of browsers.
+        profile (str): One of PROFILES, used for every browser of the pool.
+    """
+
+    def __init__(self, size, profile='full'):
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown browser profile {profile!r}, expected one of {list(PROFILES)}")
+        self.size = size
+        self.profile = profile
+        self._idle = queue.Queue()
+        self._started = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def browser(self):
+        """Context manager lending a browser for the duration of a job."""
+        driver = self.acquire()
+        try:
+            yield driver
+        finally:
+            self.release(driver)
+
+    def acquire(self):
+        """Returns an idle browser, starting a new one while the pool is below its size."""
+        with self._lock:
+            start_new = self._idle.empty() and self._started < self.size
+            if start_new:
+                self._started += 1
+        if start_new:
+            try:
+                return create_driver(profile=self.profile)
+            except Exception:
+                with self._lock:
+                    self._started -= 1
+                raise
+        return self._idle.get()  # Wait for another job to hand its browser back
+
+    def release(self, driver):
+        """Hands a browser back to the pool, or discards it if it no longer responds."""
+        try:
+            driver.current_url  # Cheap round trip to check the session is still alive
+        except Exception as e:
+            logging.warning(f"Discarding unresponsive browser: {e}")
+            try:
+                driver.quit()
+            except Exception:
+                pass
+            try:
+                driver = create_driver(profile=self.profile)  # Replace it right away so jobs waiting in acquire() wake up
+            except Exception as e:
+                logging.error(f"Could not start a replacement browser: {e}")
+                with self._lock:
+                    self._started -= 1
+                return
+        self._idle.put(driver)
+
+    def close(self):
+        """Quits every idle browser."""
+        while not self._idle.empty():
+            driver = self._idle.get_nowait()
+            try:
+                driver.quit()
+            except Exception:
+                pass
+            with self._lock:
+                self._started -= 1
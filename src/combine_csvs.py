@@ -2,78 +2,88 @@
 """
 Script to combine all CSV files from data/ subfolders into a single CSV file.
 Handles different headers by taking the union of all columns and filling missing values with empty strings.
-Also adds a temporary source_folder column to infer missing propertyType, then removes it.
+Missing propertyType values are inferred from the source folder of each file.
+
+The files are read in two passes so that memory stays bounded, however many daily CSVs
+accumulate: the first pass only reads the header of each file to build the column union, the
+second streams the normalized rows straight into the output. Both passes are spread over worker
+processes (see csv_ingest.py) and merged in file order, so the output does not depend on the
+number of workers. The header of each file is cached in a schema registry (see
+schema_registry.py), so the first pass only reads the files that are new or changed.
+
+The Parquet dataset read by the analyses has a single writer, update_combined_csv.py, which
+appends the new files of each week (see listing_dataset.py to rebuild it from scratch).
+
+The weekly pipeline keeps the combined listings in the segment store of update_combined_csv.py
+(see listing_store.py); this script exports them as one CSV, e.g. for a spreadsheet.
+
+Usage:
+    python src/combine_csvs.py [--workers N] [--schema-cache FILE | --no-schema-cache]
 """
 
-import os
+import argparse
 import csv
 from pathlib import Path
 
-def combine_csv_files():
-    data_dir = Path('data')
-    output_file = Path('data/combined_listings.csv')
-    
+from csv_ingest import CsvTreeReader, data_files
+from schema_registry import DEFAULT_PATH as SCHEMA_CACHE_PATH, SchemaRegistry
+
+def combine_csv_files(data_dir='data', output_file=None, workers=None, schema_cache=SCHEMA_CACHE_PATH):
+    data_dir = Path(data_dir)
+    output_file = Path(output_file or data_dir / 'combined_listings.csv')
+
     # Find all CSV files in subdirectories
-    csv_files = list(data_dir.glob('*/*.csv'))
+    csv_files = data_files(data_dir)
     print(f"Found {len(csv_files)} CSV files to combine")
-    
-    # Collect all unique column names
-    all_columns = set()
-    file_data = []  # List of (filename, rows, source_folder) tuples
-    
-    for csv_file in csv_files:
-        # Determine source folder from the parent directory name
-        source_folder = csv_file.parent.name  # Apartments, Houses, or Offices
-        try:
-            with open(csv_file, 'r', encoding='utf-8') as f:
-                # Try to detect dialect
-                sample = f.read(1024)
-                f.seek(0)
-                sniffer = csv.Sniffer()
-                dialect = sniffer.sniff(sample)
-                f.seek(0)
-                
-                reader = csv.DictReader(f, dialect=dialect)
-                if reader.fieldnames:
-                    all_columns.update(reader.fieldnames)
-                    rows = list(reader)
-                    file_data.append((csv_file.name, rows, source_folder))
-                    print(f"  {csv_file.name}: {len(rows)} rows, columns: {reader.fieldnames}")
-                else:
-                    print(f"  {csv_file.name}: No headers found or empty file")
-        except Exception as e:
-            print(f"  Error reading {csv_file.name}: {e}")
-    
-    if not all_columns:
-        print("No columns found in any CSV files")
-        return
-    
-    # Convert to sorted list for consistent column order
-    all_columns = sorted(list(all_columns))
-    print(f"\nCombined columns ({len(all_columns)}): {all_columns}")
-    
-    # Write combined CSV
-    with open(output_file, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=all_columns)
-        writer.writeheader()
-        
-        total_rows = 0
-        for filename, rows, source_folder in file_data:
-            for row in rows:
-                # Fill missing columns with empty strings
-                complete_row = {col: row.get(col, '') for col in all_columns}
-                # If propertyType is missing or empty, infer from source_folder
-                if not complete_row.get('propertyType', '').strip():
-                    if source_folder == 'Apartments':
-                        complete_row['propertyType'] = "{'id': '1', 'nombre': 'Apartamento'}"
-                    elif source_folder == 'Houses':
-                        complete_row['propertyType'] = "{'id': '2', 'nombre': 'Casa'}"
-                    elif source_folder == 'Offices':
-                        complete_row['propertyType'] = "{'id': '3', 'nombre': 'Oficina'}"
-                writer.writerow(complete_row)
-                total_rows += 1
-    
+
+    registry = SchemaRegistry(schema_cache) if schema_cache else None
+    with CsvTreeReader(workers, registry=registry) as reader:
+        # First pass: collect all unique column names from the headers only
+        all_columns = set()
+        file_headers = []  # List of (path, schema id, header) tuples
+
+        for csv_file, schema_id, fieldnames, error in reader.headers(csv_files):
+            if error:
+                print(f"  Error reading {csv_file.name}: {error}")
+            elif fieldnames:
+                all_columns.update(fieldnames)
+                file_headers.append((csv_file, schema_id, fieldnames))
+            else:
+                print(f"  {csv_file.name}: No headers found or empty file")
+        if registry:
+            print(f"Schema registry: {registry.stats()}")
+            registry.close()
+
+        if not all_columns:
+            print("No columns found in any CSV files")
+            return
+
+        # Convert to sorted list for consistent column order
+        all_columns = sorted(all_columns)
+        print(f"\nCombined columns ({len(all_columns)}): {all_columns}")
+
+        # Second pass: stream the normalized rows of each file into the combined CSV
+        with open(output_file, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerow(all_columns)
+
+            total_rows = 0
+            for text, report in reader.normalized_rows(file_headers, all_columns):
+                f.write(text)
+                for csv_file, rows, error in report:
+                    if error:
+                        print(f"  Error reading {csv_file.name}, skipped: {error}")
+                    else:
+                        print(f"  {csv_file.name}: {rows} rows")
+                        total_rows += rows
+
     print(f"\nSuccessfully combined {total_rows} rows into {output_file}")
 
 if __name__ == '__main__':
-    combine_csv_files()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, help='worker processes reading the files (default: one per core)')
+    schema_cache = parser.add_mutually_exclusive_group()
+    schema_cache.add_argument('--schema-cache', default=SCHEMA_CACHE_PATH, help='file of the header schema registry')
+    schema_cache.add_argument('--no-schema-cache', dest='schema_cache', action='store_const', const=None,
+                              help='read the header of every file')
+    args = parser.parse_args()
+    combine_csv_files(workers=args.workers, schema_cache=args.schema_cache)
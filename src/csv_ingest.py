@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Parallel ingestion of the data/<property type>/*.csv tree.
+
+The per-city daily CSVs are split into shards of files that a ProcessPoolExecutor reads in
+parallel: a first stage collects the header of every file not already known to the schema
+registry (see schema_registry.py), a second reads the rows, remaps them by index to a unified
+column layout (missing columns empty, missing propertyType filled from the source folder) and
+serializes them back to CSV text. The shards are handed back in input order, whatever order the
+workers finish in, so the merged output is deterministic; only a few shards are in flight at a
+time, so memory stays bounded however many files there are.
+"""
+
+import csv
+import io
+import itertools
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from schema_registry import column_mapping, file_key, fingerprint, remap
+
+# propertyType of the rows of each data/ subfolder, for the sources whose CSVs lack the column
+PROPERTY_TYPE_BY_FOLDER = {
+    'Apartments': "{'id': '1', 'nombre': 'Apartamento'}",
+    'Houses': "{'id': '2', 'nombre': 'Casa'}",
+    'Offices': "{'id': '3', 'nombre': 'Oficina'}",
+}
+
+SHARD_SIZE = 64  # Files per task sent to a worker
+
+def data_files(data_dir='data'):
+    """Lists the daily CSVs of data/<property type>/, sorted.
+
+    Editor leftovers are skipped: hidden files and folders (e.g. Jupyter's .ipynb_checkpoints) and
+    the *-checkpoint.csv copies Jupyter saves next to a file.
+    """
+    return sorted(
+        csv_file for csv_file in Path(data_dir).glob('*/*.csv')
+        if not csv_file.parent.name.startswith('.') and not csv_file.name.startswith('.')
+        and not csv_file.stem.endswith('-checkpoint')
+    )
+
+def default_workers():
+    """Returns the number of worker processes used when none is given: one per core."""
+    return os.cpu_count() or 1
+
+def read_header(csv_file):
+    """Reads the header of a CSV file without reading the rows; None if the file is empty."""
+    with open(csv_file, 'r', newline='', encoding='utf-8') as f:
+        return next(csv.reader(f), None)
+
+def _read_headers(csv_files):
+    """Worker task: (path, header, error message) of each file of a shard."""
+    headers = []
+    for csv_file in csv_files:
+        try:
+            headers.append((csv_file, read_header(csv_file), None))
+        except Exception as e:
+            headers.append((csv_file, None, str(e)))
+    return headers
+
+def _normalize_rows(files, mappings, property_type_index):
+    """Worker task: the rows of a shard of files in the unified layout, as CSV text.
+
+    Args:
+        files: (path, schema id) of each file.
+        mappings (dict): Schema id -> (column_mapping to the unified layout, number of columns of the schema).
+        property_type_index (int): Position of propertyType in the unified layout, None if absent.
+
+    Returns:
+        tuple: (CSV text without header, list of (path, rows, error message or None)). The rows
+        of a file that could not be read to the end are left out of the text.
+    """
+    output = io.StringIO()
+    writer = csv.writer(output)
+    report = []
+    for csv_file, schema_id in files:
+        mapping, width = mappings[schema_id]
+        property_type = PROPERTY_TYPE_BY_FOLDER.get(Path(csv_file).parent.name) if property_type_index is not None else None
+        rows = 0
+        start = output.tell()
+        try:
+            with open(csv_file, 'r', newline='', encoding='utf-8') as f:
+                reader = csv.reader(f)
+                next(reader)  # Header
+                for row in reader:
+                    if not row:
+                        continue  # Blank line
+                    # Missing columns come out as empty strings
+                    values = remap(row, mapping, width)
+                    # If propertyType is missing or empty, infer from the source folder
+                    if property_type and not values[property_type_index].strip():
+                        values[property_type_index] = property_type
+                    writer.writerow(values)
+                    rows += 1
+            report.append((csv_file, rows, None))
+        except Exception as e:
+            output.seek(start)
+            output.truncate()
+            report.append((csv_file, rows, str(e)))
+    return output.getvalue(), report
+
+def _shards(items, size=SHARD_SIZE):
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+def _run_ordered(executor, max_in_flight, function, shards, *args):
+    """Yields function(shard, *args) for every shard in order, with at most max_in_flight shards submitted at a time.
+
+    Without an executor the shards are processed inline, one after the other.
+    """
+    if executor is None:
+        for shard in shards:
+            yield function(shard, *args)
+        return
+    in_flight = deque()
+    for shard in shards:
+        in_flight.append(executor.submit(function, shard, *args))
+        if len(in_flight) >= max_in_flight:
+            yield in_flight.popleft().result()
+    while in_flight:
+        yield in_flight.popleft().result()
+
+class CsvTreeReader:
+    """Reads CSV files with a pool of worker processes. Use as a context manager.
+
+    Args:
+        workers (int): Worker processes; 1 reads in the current process. One per core if None.
+        shard_size (int): Files per task sent to a worker.
+        registry (SchemaRegistry): Optional registry caching the header of each file. Every header is read if None.
+    """
+
+    def __init__(self, workers=None, shard_size=SHARD_SIZE, registry=None):
+        self.workers = workers or default_workers()
+        self.shard_size = shard_size
+        self.registry = registry
+        self._max_in_flight = 4 * self.workers  # Enough to keep the workers busy, few enough to bound memory
+        self._executor = ProcessPoolExecutor(self.workers) if self.workers > 1 else None
+
+    def headers(self, csv_files):
+        """Returns (path, schema id, header, error message) for every file, in the order given.
+
+        Headers known to the registry for the file's current mtime and size are not read again.
+        Schema id and header are None for an empty or unreadable file.
+        """
+        csv_files = list(csv_files)
+        found, keys, unknown = {}, {}, []
+        for csv_file in csv_files:
+            try:
+                keys[csv_file] = file_key(csv_file)
+            except OSError as e:
+                found[csv_file] = (None, None, str(e))
+                continue
+            schema_id = self.registry.cached(csv_file, keys[csv_file]) if self.registry else None
+            if schema_id is None:
+                unknown.append(csv_file)
+            else:
+                found[csv_file] = (schema_id, self.registry.columns(schema_id), None)
+        read = []
+        for headers in _run_ordered(self._executor, self._max_in_flight, _read_headers, _shards(unknown, self.shard_size)):
+            read.extend(entry for entry in headers if entry[1])
+            for csv_file, header, error in headers:
+                found[csv_file] = (fingerprint(header) if header else None, header, error)
+        if self.registry:
+            self.registry.add((csv_file, keys[csv_file], header) for csv_file, header, _ in read)
+        return [(csv_file, *found[csv_file]) for csv_file in csv_files]
+
+    def map_files(self, function, files, columns, *args, group=None):
+        """Yields function(shard, mappings, *args) per shard of files, in the order given.
+
+        Args:
+            function: Module-level worker task taking the (path, schema id) of each file of a shard
+                and the schema id -> (column_mapping, number of columns) of the unified layout.
+            files: (path, schema id, header) of each file, e.g. from headers().
+            columns (list): Unified column layout the mappings are computed for; pass it in args too
+                if the task needs it.
+            group (callable): Key of a file's group, from its path. If given, each run of consecutive
+                files with the same key makes one shard, whatever its size, instead of shard_size files.
+        """
+        files = list(files)
+        # One index mapping per schema, computed here once instead of a dict built per row
+        mappings = {schema_id: (column_mapping(header, columns), len(header)) for _, schema_id, header in files}
+        items = [(csv_file, schema_id) for csv_file, schema_id, _ in files]
+        if group is None:
+            shards = _shards(items, self.shard_size)
+        else:
+            shards = [list(shard) for _, shard in itertools.groupby(items, key=lambda item: group(item[0]))]
+        yield from _run_ordered(self._executor, self._max_in_flight, function, shards, mappings, *args)
+
+    def normalized_rows(self, files, columns):
+        """Yields (CSV text, report) per shard of files, in the order given; see _normalize_rows.
+
+        Args:
+            files: (path, schema id, header) of each file, e.g. from headers().
+            columns (list): Unified column layout of the output.
+        """
+        columns = list(columns)
+        property_type_index = columns.index('propertyType') if 'propertyType' in columns else None
+        yield from self.map_files(_normalize_rows, files, columns, property_type_index)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
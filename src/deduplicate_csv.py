@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 """
-Script to deduplicate the combined CSV file by grouping on all columns except 'Extraction Date',
+Script to deduplicate the combined listings by grouping on all columns except 'Extraction Date',
 and adding two new columns: 'First Extraction Date' and 'Last Extraction Date'.
 Also cleans numeric fields and dates, and merges specified column pairs (keeping the second).
 Handles city and Municipio: merge Municipio into city, keeping city in dictionary format.
@@ -8,6 +8,8 @@ Sets neighborhood to empty if it is "NA".
 Merges Barrio into commonNeighborhood, keeping commonNeighborhood.
 Merges code into propertyId, keeping propertyId.
 Transforms builtTime into two columns: builtTime_min_year and builtTime_max_year based on the last extraction date.
+
+The combined listings are read from the segment store written by update_combined_csv.py (see listing_store.py).
 """
 
 import csv
@@ -15,6 +17,8 @@ import re
 from collections import defaultdict
 from pathlib import Path
 
+from listing_store import DEFAULT_DIR as STORE_DIR, ListingStore
+
 def clean_price(val):
     """Remove $ and commas, convert to float. If empty or invalid, return empty string."""
     if not val:
@@ -270,36 +274,34 @@ def clean_numeric_fields(row):
         cleaned['neighborhood'] = clean_neighborhood(cleaned['neighborhood'])
     return cleaned
 
-def deduplicate_csv():
-    input_file = Path('data/combined_listings.csv')
+def deduplicate_csv(store_dir=STORE_DIR):
+    store = ListingStore(store_dir)
     output_file = Path('data/combined_listings_deduplicated.csv')
     
-    # Read the input CSV
-    with open(input_file, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        fieldnames = reader.fieldnames
-        if fieldnames is None:
-            print("Error: No headers found in the input CSV.")
-            return
-        
-        # Check if 'Extraction Date' column exists
-        if 'Extraction Date' not in fieldnames:
-            print("Error: 'Extraction Date' column not found in the input CSV.")
-            return
-        
-        # Prepare grouping: key is tuple of values for all columns except 'Extraction Date' (after cleaning)
-        # We will exclude the columns that we plan to remove (the first of each pair) from the key.
-        # Columns to remove: Baños, Garajes, Habitaciones, Precio, Área, Municipio, Barrio, code
-        columns_to_remove = {'Baños', 'Garajes', 'Habitaciones', 'Precio', 'Área', 'Municipio', 'Barrio', 'code'}
-        groups = defaultdict(list)  # key -> list of (original row, cleaned Extraction Date)
-        
-        for row in reader:
-            cleaned_row = clean_numeric_fields(row)
-            # Create a key from all columns except 'Extraction Date' and the columns we remove (using cleaned values)
-            key_cols = [col for col in fieldnames if col != 'Extraction Date' and col not in columns_to_remove]
-            key = tuple(cleaned_row[col] for col in key_cols)
-            extraction_date = cleaned_row['Extraction Date']
-            groups[key].append((row, extraction_date))  # store original row for reference? We'll use cleaned values for output.
+    # Read the combined listings, segment by segment
+    fieldnames = store.columns()
+    if not fieldnames:
+        print(f"Error: No listings found in {store.root}.")
+        return
+    
+    # Check if 'Extraction Date' column exists
+    if 'Extraction Date' not in fieldnames:
+        print(f"Error: 'Extraction Date' column not found in {store.root}.")
+        return
+    
+    # Prepare grouping: key is tuple of values for all columns except 'Extraction Date' (after cleaning)
+    # We will exclude the columns that we plan to remove (the first of each pair) from the key.
+    # Columns to remove: Baños, Garajes, Habitaciones, Precio, Área, Municipio, Barrio, code
+    columns_to_remove = {'Baños', 'Garajes', 'Habitaciones', 'Precio', 'Área', 'Municipio', 'Barrio', 'code'}
+    groups = defaultdict(list)  # key -> list of (original row, cleaned Extraction Date)
+    
+    for row in store.iter_rows():
+        cleaned_row = clean_numeric_fields(row)
+        # Create a key from all columns except 'Extraction Date' and the columns we remove (using cleaned values)
+        key_cols = [col for col in fieldnames if col != 'Extraction Date' and col not in columns_to_remove]
+        key = tuple(cleaned_row[col] for col in key_cols)
+        extraction_date = cleaned_row['Extraction Date']
+        groups[key].append((row, extraction_date))  # store original row for reference? We'll use cleaned values for output.
     
     # Prepare output fieldnames: original columns except 'Extraction Date' and the columns we remove, plus the two new date columns
     # We also remove builtTime and add two new columns: builtTime_min_year and builtTime_max_year
@@ -359,7 +361,7 @@ def deduplicate_csv():
             row['builtTime_max_year'] = builtTime_max_year
             writer.writerow(row)
     
-    print(f"Successfully deduplicated {len(groups)} unique rows from {input_file} to {output_file}")
+    print(f"Successfully deduplicated {len(groups)} unique rows from {store.root} to {output_file}")
 
 if __name__ == '__main__':
     deduplicate_csv()
\ No newline at end of file
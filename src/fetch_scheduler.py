@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Shared fetch scheduler for the scrapers.
+
+Fetches run on a bounded thread pool, and every request first takes a token from the bucket of
+its host. A run's duration then depends on the per-host politeness budget, not on the sum of
+serial round trips. Throughput and queue-depth counters are available through stats().
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+class TokenBucket:
+    """Thread-safe token bucket allowing `rate` acquisitions per second with bursts of up to `burst`."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available and takes it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)  # Sleep outside the lock so other threads can refill and check
+
+class FetchScheduler:
+    """Runs fetch functions on a bounded worker pool with a token-bucket rate limit per host.
+
+    Args:
+        concurrency (int): Maximum number of fetches in flight.
+        rate_per_host (float): Requests per second allowed for each host. None disables the limit.
+        burst (int): Number of requests a host may receive back to back after being idle.
+    """
+
+    def __init__(self, concurrency=4, rate_per_host=1.0, burst=1):
+        self.concurrency = concurrency
+        self.rate_per_host = rate_per_host
+        self.burst = burst
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="fetch")
+        self._buckets = {}  # host -> TokenBucket
+        self._lock = threading.Lock()
+        self._submitted = 0
+        self._started = 0
+        self._completed = 0
+        self._failed = 0
+        self._created = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    def _bucket(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.rate_per_host, self.burst)
+            return self._buckets[host]
+
+    def _run(self, url, function, args, kwargs):
+        if self.rate_per_host:
+            self._bucket(url).acquire()
+        with self._lock:
+            self._started += 1
+        try:
+            result = function(*args, **kwargs)
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+        with self._lock:
+            self._completed += 1
+        return result
+
+    def submit(self, url, function, *args, **kwargs):
+        """Schedules `function(*args, **kwargs)`, rate limited against the host of `url`.
+
+        Returns:
+            concurrent.futures.Future: Future holding the result of the call.
+        """
+        with self._lock:
+            self._submitted += 1
+        return self._executor.submit(self._run, url, function, args, kwargs)
+
+    def map(self, function, items, url=None):
+        """Calls `function(item)` for every item and yields the results in input order.
+
+        Args:
+            function (callable): Fetch function taking a single item.
+            items (iterable): URLs, or any objects from which `url` extracts one.
+            url (callable): Maps an item to the URL used for rate limiting. Defaults to the item itself.
+
+        Yields:
+            The result of each call. Exceptions raised by a call are re-raised here.
+        """
+        futures = [self.submit(url(item) if url else item, function, item) for item in items]
+        for future in futures:
+            yield future.result()
+
+    def stats(self):
+        """Returns counters describing the work done so far.
+
+        Returns:
+            dict: submitted, completed, failed, in_flight and queue_depth (submitted but not yet
+            started) task counts, plus throughput in completed tasks per second.
+        """
+        with self._lock:
+            elapsed = time.monotonic() - self._created
+            finished = self._completed + self._failed
+            return {
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "in_flight": self._started - finished,
+                "queue_depth": self._submitted - self._started,
+                "throughput": self._completed / elapsed if elapsed else 0.0,
+            }
+
+    def shutdown(self, wait=True):
+        """Stops accepting work and, by default, waits for the pending fetches."""
+        self._executor.shutdown(wait=wait)
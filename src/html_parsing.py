@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+HTML parser backend shared by every scraper.
+
+lxml is used when it is installed, with the pure-Python "html.parser" as the fallback. The
+SoupStrainers below restrict parsing to the nodes a caller actually reads, so most of a page
+is never turned into Python objects.
+"""
+
+import logging
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml  # noqa: F401  (only checks that the backend is available)
+    DEFAULT_PARSER = "lxml"
+except ImportError:
+    DEFAULT_PARSER = "html.parser"
+
+PARSERS = ("lxml", "html.parser")
+
+# Parts of a page some callers need, see make_soup(parse_only=...)
+LISTING_LINKS = SoupStrainer(id="ruta32")  # lalonja result cards
+PAGINATION = SoupStrainer(class_="pagination")  # lalonja pagination
+SCRIPTS = SoupStrainer("script")  # metrocuadrado embedded JSON
+
+_parser = DEFAULT_PARSER
+
+def set_parser(name):
+    """Selects the parser backend used by make_soup, falling back to html.parser if lxml is missing.
+
+    Args:
+        name (str): One of PARSERS.
+    """
+    global _parser
+    if name not in PARSERS:
+        raise ValueError(f"Unknown HTML parser {name!r}, expected one of {PARSERS}")
+    if name == "lxml" and DEFAULT_PARSER != "lxml":
+        logging.warning("lxml is not installed, using html.parser")
+        name = "html.parser"
+    _parser = name
+
+def get_parser():
+    """Returns the name of the parser backend in use."""
+    return _parser
+
+def make_soup(markup, parse_only=None):
+    """Parses HTML with the selected backend.
+
+    Args:
+        markup (str or bytes): The page HTML.
+        parse_only (SoupStrainer): Only build the nodes it matches (and their descendants).
+
+    Returns:
+        BeautifulSoup: The parsed document.
+    """
+    return BeautifulSoup(markup, _parser, parse_only=parse_only)
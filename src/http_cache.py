@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+On-disk conditional GET cache of parsed pages.
+
+For every URL the cache keeps the ETag and Last-Modified validators of the last response, a
+hash of its body and the result parsed from it (a row, a list of links, ...). The next fetch of
+the URL sends If-None-Match/If-Modified-Since; when the server answers 304 Not Modified, or sends
+a body with the same hash, the stored result is reused and the page is not parsed again.
+
+Only results of a successful parse are stored: a page whose parse fails or yields nothing is
+fetched and parsed in full the next time. Each entry also records the version of the parser that
+produced it, and an entry of another version is ignored, so bumping a parser's version makes
+every page be parsed again.
+
+The results are the only bulky part of an entry, and the cache is bounded by their total size:
+once it is exceeded, the least recently used entries are evicted.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from http_client import DEFAULT_TIMEOUT
+
+DEFAULT_PATH = Path('.scraper_cache/http_cache.sqlite')
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+def body_hash(content):
+    """Returns a stable hash of a response body (bytes)."""
+    return hashlib.sha1(content).hexdigest()
+
+class HttpCache:
+    """SQLite-backed map of URL -> (validators, body hash, parsed result) with LRU eviction. Safe to share between threads.
+
+    Args:
+        path (str or Path): Database file, created if missing.
+        max_bytes (int): Total size of the stored results above which the least recently used entries are evicted.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS pages ('
+            'url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body_hash TEXT NOT NULL, '
+            'result TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL, version INTEGER NOT NULL DEFAULT 0)'
+        )
+        if 'version' not in [column for _, column, *_ in self._connection.execute('PRAGMA table_info(pages)')]:
+            # Cache written before results were versioned: its entries never match a parser version
+            self._connection.execute('ALTER TABLE pages ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS pages_last_access ON pages (last_access)')
+        self._connection.commit()
+        self._size = self._connection.execute('SELECT COALESCE(SUM(size), 0) FROM pages').fetchone()[0]
+        self.hits = 0  # Fetches answered from the cache: 304s and unchanged bodies
+        self.misses = 0  # Fetches that had to be parsed
+
+    def get(self, url, version=1):
+        """Returns (etag, last_modified, body_hash, result) of a URL, None if it is not cached by this parser version."""
+        with self._lock:
+            found = self._connection.execute(
+                'SELECT etag, last_modified, body_hash, result FROM pages WHERE url = ? AND version = ?', (url, version)
+            ).fetchone()
+        if found is None:
+            return None
+        etag, last_modified, stored_hash, result = found
+        return etag, last_modified, stored_hash, json.loads(result)
+
+    def touch(self, url, response=None):
+        """Marks an entry as reused, taking the new validators of `response` if it carries any."""
+        with self._lock:
+            self.hits += 1
+            self._connection.execute('UPDATE pages SET last_access = ? WHERE url = ?', (time.time(), url))
+            if response is not None and (response.headers.get('ETag') or response.headers.get('Last-Modified')):
+                self._connection.execute(
+                    'UPDATE pages SET etag = ?, last_modified = ? WHERE url = ?',
+                    (response.headers.get('ETag'), response.headers.get('Last-Modified'), url),
+                )
+            self._connection.commit()
+
+    def store(self, url, response, result, version=1):
+        """Stores the result parsed from a 200 response, then evicts entries while the cache is too large.
+
+        Args:
+            url (str): Requested URL (the key, which can differ from response.url after redirects).
+            response (requests.Response): The response the result was parsed from.
+            result: JSON-serializable result. None (nothing could be parsed) is not stored, and
+                drops the previous entry of the URL, so the page is parsed again on the next fetch.
+            version (int): Version of the parser that produced the result.
+        """
+        with self._lock:
+            self.misses += 1
+            previous = self._connection.execute('SELECT size FROM pages WHERE url = ?', (url,)).fetchone()
+            if result is None:
+                self._connection.execute('DELETE FROM pages WHERE url = ?', (url,))
+                self._size -= previous[0] if previous else 0
+                self._connection.commit()
+                return
+            result = json.dumps(result, ensure_ascii=False)
+            self._connection.execute(
+                'INSERT OR REPLACE INTO pages (url, etag, last_modified, body_hash, result, size, last_access, version) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (url, response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                 body_hash(response.content), result, len(result), time.time(), version),
+            )
+            self._size += len(result) - (previous[0] if previous else 0)
+            if self._size > self.max_bytes:
+                self._evict()
+            self._connection.commit()
+
+    def _evict(self):
+        """Deletes least recently used entries until the results fit in max_bytes. Call with the lock held."""
+        freed, evicted = 0, []
+        for url, size in self._connection.execute('SELECT url, size FROM pages ORDER BY last_access'):
+            if self._size - freed <= self.max_bytes:
+                break
+            evicted.append((url,))
+            freed += size
+        self._connection.executemany('DELETE FROM pages WHERE url = ?', evicted)
+        self._size -= freed
+
+    def stats(self):
+        """Returns the hit/miss counts of this run and the size of the stored results."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'bytes': self._size}
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+def conditional_get(session, url, parse, cache, timeout=DEFAULT_TIMEOUT, version=1):
+    """Fetches a URL with the validators of its cache entry and parses it only if it changed.
+
+    Args:
+        session (requests.Session): Session to fetch with.
+        url (str): Page URL.
+        parse: Called with the response of a new or changed page; returns the result to cache,
+            or None if the page yields nothing (not cached). Exceptions propagate, nothing is cached.
+        cache (HttpCache): The cache.
+        timeout: Connect/read timeout in seconds passed to the request.
+        version (int): Version of `parse`. Entries stored by another version are ignored; bump it
+            whenever the parser's output changes.
+
+    Returns:
+        tuple: (result, reused). reused is True when the page was unchanged (304 or same body
+            hash) and result is the stored one.
+
+    Raises:
+        requests.exceptions.RequestException: The request failed or returned an error status.
+    """
+    entry = cache.get(url, version)
+    headers = {}
+    if entry is not None:
+        etag, last_modified, stored_hash, result = entry
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+    response = session.get(url, headers=headers, timeout=timeout)
+    if entry is not None and response.status_code == 304:
+        cache.touch(url, response)
+        return result, True
+    response.raise_for_status()
+    if entry is not None and body_hash(response.content) == stored_hash:  # Server without validators, same page
+        cache.touch(url, response)
+        return result, True
+    result = parse(response)
+    cache.store(url, response, result, version)
+    return result, False
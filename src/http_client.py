@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP client for the scrapers.
+
+A single pooled requests.Session keeps connections alive between requests to the same host
+and negotiates gzip, instead of paying a new TCP+TLS handshake for every page. Throttling (429)
+and transient server errors (5xx) are retried with exponential backoff by the session itself.
+"""
+
+import random
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_TIMEOUT = (5, 30)  # Seconds to connect, seconds to wait for the response
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+PERMANENT_STATUSES = range(400, 500)  # Client errors: the page is gone or refused, retrying does not change it
+TRANSIENT_CLIENT_STATUSES = (408, 425, 429)  # Client errors that do: request timeout, too early, throttled
+
+USER_AGENTS = [
+    # Chrome/Chromium on Ubuntu
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36", # Basic Chrome on Linux
+    "Mozilla/5.0 (X11; Ubuntu; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36", # More specific to Ubuntu
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chromium/114.0.0.0 Safari/537.36", # Chromium
+]
+
+class FetchError(Exception):
+    """A page could not be retrieved (network error, error status, browser failure).
+
+    A later retry may succeed, unless the error is permanent (see `permanent`).
+
+    Args:
+        error: Message, or the exception raised by requests; the status of its response is kept.
+        status (int): HTTP status of the failed response, if not taken from `error`.
+    """
+
+    def __init__(self, error, status=None):
+        super().__init__(error)
+        response = getattr(error, 'response', None)
+        self.status = status if status is not None else getattr(response, 'status_code', None)
+
+    @property
+    def permanent(self):
+        """True when retrying cannot help: a 4xx status (404, 410, 403...) other than a timeout or throttling."""
+        return self.status in PERMANENT_STATUSES and self.status not in TRANSIENT_CLIENT_STATUSES
+
+def create_session(pool_size=10, user_agent=None, retries=3, backoff_factor=1.0):
+    """Creates a requests.Session with a connection pool, a retry policy and browser-like headers.
+
+    Args:
+        pool_size (int): Maximum number of connections kept open per host.
+        user_agent (str): User agent to send. A random one from USER_AGENTS is used if None.
+        retries (int): Retries for connection errors and RETRY_STATUSES responses.
+        backoff_factor (float): Base of the exponential backoff between retries, in seconds.
+            A Retry-After header sent with a 429 or 503 takes precedence.
+
+    Returns:
+        requests.Session: The configured session. Pass a timeout (e.g. DEFAULT_TIMEOUT) to each request.
+    """
+    session = requests.Session()
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=("GET", "HEAD"),
+        raise_on_status=False,  # Hand the last response back so raise_for_status reports it
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        "User-Agent": user_agent or random.choice(USER_AGENTS),
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+        "Accept-Encoding": "gzip, deflate",
+        "Accept-Language": "es-CO,es;q=0.9",
+    })
+    return session
+
+def response_text(response):
+    """Returns the decoded body of a response, assuming UTF-8 when the server does not declare a charset.
+
+    requests falls back to ISO-8859-1 for text/* responses without a charset, which garbles accents.
+    """
+    if "charset" not in response.headers.get("Content-Type", "").lower():
+        response.encoding = "utf-8"
+    return response.text
@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+"""
+lalonjapropiedadraiz.com source: result pages are walked through their /pagina/N links and each
+listing page's HTML is turned into one row.
+"""
+
+import requests
+from bs4 import NavigableString, Tag
+from urllib.parse import urljoin
+import re
+from functools import lru_cache
+from concurrent.futures import FIRST_COMPLETED, as_completed, wait
+from itertools import islice
+from fetch_scheduler import FetchScheduler
+from http_client import DEFAULT_TIMEOUT, FetchError, create_session, response_text
+from html_parsing import LISTING_LINKS, PAGINATION, make_soup
+from http_cache import conditional_get
+from listing_record import LalonjaListing, today
+
+LISTING_LABELS = ("Baños", "Área", "Habitaciones", "Garajes", "Closets")  # Labelled values of a listing page
+PARSER_VERSION = 1  # Version of the links and rows kept in the HTTP cache; bump when their parsing changes
+FIELD_CLASSES = {"property-price": "Precio", "listing-address": "location"}  # Class of an element -> field it holds
+
+def get_total_pages(url, session=None, timeout=DEFAULT_TIMEOUT):
+    """
+    Fetches the given URL and extracts the total number of pages from the pagination.
+
+    Args:
+        url (str): The URL of the website to scrape.
+        session (requests.Session): Session to fetch with. A one-off request is made if None.
+        timeout: Connect/read timeout in seconds passed to the request.
+
+    Returns:
+        int: The total number of pages if found, None otherwise.
+    """
+    try:
+        response = (session or requests).get(url, timeout=timeout)
+        response.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
+        soup = make_soup(response.content, parse_only=PAGINATION)  # Only the pagination is needed
+
+        last_page_link = soup.select_one(".pagination li:last-child a") #Selects the last page link
+
+        if last_page_link:
+            try:
+                last_page_text = last_page_link.text.strip()
+                if last_page_text == "»": #Handles the case where the last page is represented by »
+                    last_page_link = soup.select(".pagination li:nth-last-child(2) a") #Selects the second to last element
+                    if last_page_link:
+                        last_page_text = last_page_link[0].text.strip()
+                return int(last_page_text)
+            except ValueError:
+                return None  # Return None if the last page text is not a valid integer
+        else:
+            return None  # Return None if no pagination is found
+
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching URL: {e}")
+        return None
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+        return None
+
+def get_all_page_links(base_url, total_pages):
+    """
+    Creates a list of URLs for all pages based on the base URL and total number of pages.
+
+    Args:
+        base_url (str): The base URL of the website.
+        total_pages (int): The total number of pages.
+
+    Returns:
+        list: A list of URLs for all pages.
+    """
+    all_links = [base_url]  # Start with the base URL
+    for page_num in range(2, total_pages + 1):
+        page_url = f"{base_url}/pagina/{page_num}"
+        all_links.append(page_url)
+    return all_links
+
+def get_listing_links(page_url, base_url, session=None, timeout=DEFAULT_TIMEOUT, cache=None):
+    """
+    Extracts listing links and their codes from a given page, excluding those containing "Ambos".
+
+    Args:
+        page_url (str): The URL of the page to scrape.
+        base_url (str): The base URL of the website.
+        session (requests.Session): Session to fetch with. A one-off request is made if None.
+        timeout: Connect/read timeout in seconds passed to the request.
+        cache (HttpCache): Optional conditional GET cache. An unchanged page reuses its stored listings.
+
+    Returns:
+        list: A list of dictionaries, each containing 'link' and 'code' for a listing.
+    """
+    try:
+        if cache is not None:
+            listings, _ = conditional_get(session or requests, page_url, lambda response: parse_listing_links(response.content, base_url),
+                                          cache, timeout, PARSER_VERSION)
+            return listings
+        response = (session or requests).get(page_url, timeout=timeout)
+        response.raise_for_status()
+        return parse_listing_links(response.content, base_url)
+
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching URL: {e}")
+        return []
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+        return []
+
+def parse_listing_links(html, base_url):
+    """
+    Extracts the listing links and codes of a results page, see get_listing_links.
+
+    Args:
+        html (str or bytes): The results page HTML.
+        base_url (str): The base URL of the website.
+
+    Returns:
+        list: A list of dictionaries, each containing 'link' and 'code' for a listing.
+    """
+    soup = make_soup(html, parse_only=LISTING_LINKS)  # Only the listing anchors are needed
+
+    listing_elements = soup.find_all(id="ruta32") #Find all elements with the id ruta32
+    listings = []
+    for element in listing_elements:
+        relative_link = element.get('href') #Gets the href of the element
+        if relative_link:
+            full_link = urljoin(base_url, relative_link) #Joins the relative link with the base url
+            if "Ambos" not in full_link: #Checks that the link does not contain the word Ambos
+                match = re.search(r"/inmueble/(\d+)/", full_link) #Extracts the code using regex
+                property_code = match.group(1) if match else None #Gets the code from the regex match
+                listings.append({"link": full_link, "code": property_code}) #Appends a dictionary with the link and the code
+    return listings
+
+def get_listing_data(listing_info, session=None, timeout=DEFAULT_TIMEOUT, archive=None, cache=None, raise_errors=False, extraction_date=None):
+    """
+    Fetches data from a single listing page and adds the extraction date.
+
+    Args:
+        listing_info (dict): A dictionary containing the 'link' and 'code' of the listing.
+        session (requests.Session): Session to fetch with. A one-off request is made if None.
+        timeout: Connect/read timeout in seconds passed to the request.
+        archive (RawArchive): Optional archive the page HTML is appended to before it is parsed.
+        cache (HttpCache): Optional conditional GET cache. An unchanged page is not parsed again,
+            its previous row is returned with the new extraction date.
+        raise_errors (bool): Raise FetchError when the page cannot be fetched instead of returning None.
+        extraction_date (str): Value of the "Extraction Date" column, computed once per run. Today if None.
+
+    Returns:
+        LalonjaListing: The extracted data, or None if an error occurs or data is incomplete.
+    """
+    listing_url = listing_info["link"]
+
+    def parse(response):
+        if archive:
+            html = response_text(response)
+            archive.append(listing_url, html, kind='html', info=listing_info)
+            return parse_listing_page(listing_info, html, extraction_date)
+        return parse_listing_page(listing_info, response.content, extraction_date)
+
+    try:
+        if cache is None:
+            response = (session or requests).get(listing_url, timeout=timeout)
+            response.raise_for_status()
+            return parse(response)
+
+        def parse_to_row(response):
+            data = parse(response)
+            return data.to_row() if data else None  # Cached as JSON
+
+        data, reused = conditional_get(session or requests, listing_url, parse_to_row, cache, timeout, PARSER_VERSION)
+        if not data:
+            return None
+        data = LalonjaListing.from_row(data)
+        if reused:
+            data.extraction_date = extraction_date or today()
+            if archive:
+                archive.append(listing_url, data.to_row(), kind='row')  # Nothing was parsed, keep the row so a reparse still lists it
+        return data
+
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching listing URL: {e}")
+        if raise_errors:
+            raise FetchError(e) from e
+        return None
+    except Exception as e:
+        print(f"An unexpected error occurred while fetching: {e}")
+        return None
+
+def parse_listing_page(listing_info, html, extraction_date=None):
+    """
+    Turns the HTML of a listing page into a listing record.
+
+    Args:
+        listing_info (dict): A dictionary containing the 'link' and 'code' of the listing.
+        html (str or bytes): The listing page HTML.
+        extraction_date (str): Value of the "Extraction Date" column. Today if None.
+
+    Returns:
+        LalonjaListing: The extracted data, or None if the data is incomplete or cannot be parsed.
+    """
+    try:
+        soup = make_soup(html)
+
+        fields = extract_listing_fields(soup)  # One walk over the page for every field
+
+        # Extract and Split Location
+        location = fields["location"]
+        if location:
+            parts = location.split(",", 1)  # Split at the first comma only
+            municipality = parts[0].strip()
+            neighborhood = parts[1].strip() if len(parts) > 1 else None #Handles cases where there is no barrio
+        else:
+            municipality = neighborhood = None
+
+        # Every value is required, checked on the page text before the counts are parsed (a "0" is valid)
+        values = (listing_info["link"], listing_info["code"], fields["Precio"], *(fields[label] for label in LISTING_LABELS),
+                  municipality, neighborhood)
+        if all(values) and "-" not in fields["Precio"]:
+            return LalonjaListing(*values, extraction_date or today())
+        else:
+            return None
+
+    except Exception as e:
+        print(f"An unexpected error occurred while parsing: {e}")
+        return None
+
+@lru_cache(maxsize=None)
+def _label_patterns(label):
+    """Compiles, once per label, the patterns matching the label text and the class of a span holding its value."""
+    escaped = re.escape(label)
+    return re.compile(rf"\s*{escaped}\s*", re.IGNORECASE), re.compile(rf".*{escaped}.*", re.IGNORECASE)
+
+def extract_listing_fields(soup, labels=LISTING_LABELS):
+    """
+    Extracts the labelled values and the FIELD_CLASSES fields of a listing page in a single walk over the tree.
+
+    A label's value is the string that follows the first string containing the label. If no such
+    string exists, the text of the first span whose class contains the label is used instead.
+
+    Args:
+        soup (BeautifulSoup): The BeautifulSoup object representing the page HTML.
+        labels (tuple): The labels to search for.
+
+    Returns:
+        dict: The value of each label and of each FIELD_CLASSES field, None for the ones not found.
+    """
+    patterns = [(label, *_label_patterns(label)) for label in labels]
+    values = {}
+    span_values = {}
+    elements = {}
+    waiting = []  # Labels whose value is the next string
+    for node in soup.descendants:
+        if isinstance(node, NavigableString):
+            for label in waiting:
+                values[label] = node.strip()
+            waiting = []
+            for label, text_pattern, _ in patterns:
+                if label not in values and label not in waiting and text_pattern.search(node):
+                    waiting.append(label)
+        elif isinstance(node, Tag) and node.get("class"):
+            classes = node["class"]
+            for class_name in classes:
+                field = FIELD_CLASSES.get(class_name)
+                if field and field not in elements:
+                    elements[field] = node
+            if node.name == "span":
+                joined_classes = " ".join(classes)
+                for label, _, class_pattern in patterns:
+                    if label not in span_values and class_pattern.search(joined_classes):
+                        span_values[label] = node
+
+    fields = {}
+    for label in labels:
+        if label in values:
+            fields[label] = values[label]
+        else:
+            fields[label] = span_values[label].text.strip() if label in span_values else None
+    for field in FIELD_CLASSES.values():
+        fields[field] = elements[field].text.strip() if field in elements else None
+    return fields
+
+def extract_value(soup, label):
+    """
+    Extracts a value based on a label from the page HTML.
+
+    Args:
+        soup (BeautifulSoup): The BeautifulSoup object representing the page HTML.
+        label (str): The label to search for.
+
+    Returns:
+        str: The extracted value, or None if not found.
+    """
+    try:
+        return extract_listing_fields(soup, (label,))[label]
+    except (AttributeError, KeyError, TypeError):  # No page (soup is None) or a label that is not a string
+        return None
+
+class LalonjaSource:
+    """Source adapter for the scraper engine.
+
+    The site has no city filter, so a job covers every municipality for one property type.
+
+    Args:
+        concurrency (int): Number of pages fetched in parallel. Half of it, at least one, is the
+            number of result pages queued ahead of the listings.
+        rate_per_host (float): Requests per second allowed against the site.
+        timeout: Connect/read timeout in seconds of each request.
+        http_cache (HttpCache): Optional conditional GET cache for the result and listing pages.
+    """
+
+    name = 'lalonja'
+    base_url = 'https://www.lalonjapropiedadraiz.com/inmuebles/Venta'
+    filename_template = 'listings_data_{date}.csv'
+
+    def __init__(self, concurrency=4, rate_per_host=1.0, timeout=DEFAULT_TIMEOUT, http_cache=None):
+        self.parallel_jobs = 1  # Jobs share the scheduler, which already bounds the site's load
+        self.timeout = timeout
+        self.http_cache = http_cache
+        self.session = create_session(pool_size=concurrency)
+        self.scheduler = FetchScheduler(concurrency=concurrency, rate_per_host=rate_per_host)
+        self.page_window = max(1, concurrency // 2)  # Result pages fetched ahead of the listings, see iter_rows
+
+    def scrape(self, url_segment, city=None, archive=None, extraction_date=None):
+        """Scrapes every listing of one property type.
+
+        Args:
+            url_segment (str): Property class segment of the lalonja URL (e.g. "clases_Casa").
+            city: Unused, the site is not split by city.
+            archive (RawArchive): Optional archive the fetched listing pages are appended to.
+            extraction_date (str): Value of the "Extraction Date" column. Today if None.
+
+        Returns:
+            list: LalonjaListing records, empty if nothing could be extracted.
+        """
+        return [row for _, row in self.iter_rows(url_segment, city, archive, extraction_date=extraction_date)]
+
+    def iter_rows(self, url_segment, city=None, archive=None, skip=(), work_queue=None, extraction_date=None):
+        """Scrapes every listing of one property type, yielding each row as soon as it is extracted.
+
+        Args:
+            url_segment (str): Property class segment of the lalonja URL (e.g. "clases_Casa").
+            city: Unused, the site is not split by city.
+            archive (RawArchive): Optional archive the fetched listing pages are appended to.
+            skip: Links already processed (e.g. by an interrupted run), which are not fetched again.
+            work_queue (WorkQueue): Optional work queue of the job. Discovered listings are stored in it,
+                listings without a usable row are marked done and failed fetches failed. If an
+                earlier run walked every result page, only the listings it reports as due are fetched.
+            extraction_date (str): Value of the "Extraction Date" column, the same for every row of
+                the run. Today if None.
+
+        Yields:
+            tuple: (link, LalonjaListing) of each listing with all the required data, in the order they are fetched.
+        """
+        extraction_date = extraction_date or today()
+        listing_futures = {}  # future -> listing link
+        found = 0
+        if work_queue is not None and work_queue.discovered:
+            listings = [listing_info for link, listing_info in work_queue.due() if link not in skip]
+            print(f"Result pages already walked, fetching the {len(listings)} listings left")
+            for listing_info in listings:
+                self._submit_listing(listing_futures, listing_info, archive, extraction_date)
+            for link, row in self._finished(listing_futures, True, work_queue):
+                found += 1
+                yield link, row
+            return
+
+        base_url = f"{self.base_url}/{url_segment}"
+        total_pages = get_total_pages(base_url, self.session, self.timeout)
+        if not total_pages:
+            print("There are no pages" if total_pages == 0 else "Could not determine the total number of pages.")
+            return
+
+        all_page_links = get_all_page_links(base_url, total_pages)
+        # Only page_window result pages are queued at a time, and the next one is submitted after
+        # the listings of the page just parsed: the scheduler runs in submission order, so at
+        # rate_per_host the listings start with the first page instead of after every result page
+        next_pages = enumerate(all_page_links)
+        page_futures = {self._submit_page(page_link, base_url): page_number
+                        for page_number, page_link in islice(next_pages, self.page_window)}
+
+        # Stream each page's listings to the scheduler as soon as the page is parsed, and hand
+        # back the listings fetched meanwhile so no row waits for the whole crawl
+        seen_links = set(skip)
+        walked_pages = 0  # Result pages that listed something; the others failed or were empty
+        while page_futures:
+            for page_future in wait(page_futures, return_when=FIRST_COMPLETED).done:
+                page_number = page_futures.pop(page_future)
+                print(f"Scraped listings from: {all_page_links[page_number]}")
+                listings = []
+                for listing_info in page_future.result():
+                    if listing_info["link"] in seen_links:  # Listings can move between pages while crawling
+                        continue
+                    seen_links.add(listing_info["link"])
+                    listings.append(listing_info)
+                walked_pages += bool(page_future.result())
+                if work_queue is not None:
+                    listings = [listing_info for _, listing_info in work_queue.add((listing_info["link"], listing_info) for listing_info in listings)]
+                for listing_info in listings:
+                    self._submit_listing(listing_futures, listing_info, archive, extraction_date)
+                for page_number, page_link in islice(next_pages, 1):
+                    page_futures[self._submit_page(page_link, base_url)] = page_number
+            for link, row in self._finished(listing_futures, False, work_queue):
+                found += 1
+                yield link, row
+        if work_queue is not None and walked_pages == total_pages:
+            work_queue.finish_discovery()
+        for link, row in self._finished(listing_futures, True, work_queue):
+            found += 1
+            yield link, row
+        if not found:
+            print("No listings with all the required data and a valid price were found.")
+
+    def _submit_page(self, page_link, base_url):
+        return self.scheduler.submit(page_link, get_listing_links, page_link, base_url, self.session, self.timeout, self.http_cache)
+
+    def _submit_listing(self, listing_futures, listing_info, archive, extraction_date=None):
+        future = self.scheduler.submit(listing_info["link"], get_listing_data, listing_info, self.session, self.timeout, archive, self.http_cache, True,
+                                       extraction_date)
+        listing_futures[future] = listing_info["link"]
+
+    @staticmethod
+    def _finished(listing_futures, wait, work_queue=None):
+        """Yields (link, row) of the listings fetched so far, or of all of them if wait, and forgets their futures.
+
+        Listings without a usable row are marked done in the queue and failed fetches failed; the
+        ones yielded are left to the caller to mark done once their rows are saved.
+        """
+        futures = as_completed(list(listing_futures)) if wait else [future for future in list(listing_futures) if future.done()]
+        for future in futures:
+            link = listing_futures.pop(future)
+            try:
+                listing_data = future.result()
+            except FetchError as e:
+                if work_queue is not None:
+                    work_queue.mark_failed(link, e)
+                continue
+            print(f"Scraped data from: {link}")
+            if listing_data:
+                yield link, listing_data
+            elif work_queue is not None:
+                work_queue.mark_done([link])
+
+    def close(self):
+        self.scheduler.shutdown()
+        self.session.close()
+        print(f"Fetch stats: {self.scheduler.stats()}")
+        if self.http_cache:
+            print(f"HTTP cache stats: {self.http_cache.stats()}")
+            self.http_cache.close()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Columnar copy of the combined listings: a Parquet dataset partitioned by property type and
+extraction month.
+
+The combined listings are CSV text, so each analysis re-parses the whole history (or thousands
+of daily CSVs) to look at one city and one quarter. The dataset written here holds the same rows
+with typed columns (prices, areas and counts as numbers, "Extraction Date" as a date, the lalonja
+"$150,000,000" / "55m" texts parsed too) under hive-style directories:
+
+    data/combined_listings_parquet/property_type=Apartments/extraction_month=2025-04/part-....parquet
+
+so readers only open the partitions and columns they ask for. Each row also carries the source
+it was scraped from, the city slug of the metrocuadrado search (from the file name) and lon/lat
+parsed from the coordinates.
+
+The rows are typed by the csv_ingest worker pool, file by file in the order given, and streamed
+into the dataset, so memory stays bounded like the CSV combine. pyarrow is optional for the
+scrapers: without it, write_dataset and read_listings raise ImportError.
+
+Usage:
+    python src/listing_dataset.py [--data-dir DIR] [--dataset-dir DIR] [--workers N]
+"""
+
+import argparse
+import csv
+import re
+import shutil
+from datetime import date, datetime
+from pathlib import Path
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:
+    pa = ds = None
+
+from csv_ingest import PROPERTY_TYPE_BY_FOLDER, CsvTreeReader, data_files
+from listing_record import LalonjaListing, M2Listing
+from schema_registry import DEFAULT_PATH as SCHEMA_CACHE_PATH, SchemaRegistry, remap
+
+DEFAULT_DIR = Path('data/combined_listings_parquet')
+
+# Typed CSV columns; the others are kept as strings
+FLOAT_COLUMNS = ('salePrice', 'area', 'areac', 'adminPrice', 'Precio', 'Área')
+INT_COLUMNS = ('rooms', 'bathrooms', 'garages', 'stratum', 'Baños', 'Habitaciones', 'Garajes', 'Closets')
+DATE_COLUMNS = ('Extraction Date',)
+
+# Columns of every dataset, whatever the headers found: both record layouts, in the combined CSV order
+BASE_COLUMNS = sorted(set(M2Listing.columns()) | set(LalonjaListing.columns()))
+DERIVED_COLUMNS = ('source', 'search_city', 'lon', 'lat')  # Filled from the file name and the coordinates
+PARTITION_COLUMNS = ('property_type', 'extraction_month')
+
+ROWS_PER_GROUP = 1 << 16
+
+_NUMBER = re.compile(r'-?\d+(?:\.\d+)?')
+_LON = re.compile(r"'lon':\s*(-?[\d.]+)")
+_LAT = re.compile(r"'lat':\s*(-?[\d.]+)")
+_M2_FILE = re.compile(r'listings_data_m2_(.+)_\d{4}-\d{2}-\d{2}\.csv$')
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("pyarrow is required for the Parquet dataset: pip install pyarrow")
+
+def to_float(value):
+    """Parses the first number of a scraped value ("76.5", "$150,000,000", "55m"); None if there is none."""
+    if not value:
+        return None
+    match = _NUMBER.search(value.replace(',', ''))
+    return float(match.group()) if match else None
+
+def to_int(value):
+    """Like to_float, for the counts; None unless the number is whole."""
+    number = to_float(value)
+    return int(number) if number is not None and number.is_integer() else None
+
+def to_date(value):
+    """Parses a "YYYY-MM-DD" extraction date; None if it is not one."""
+    try:
+        return date.fromisoformat(value[:10])
+    except (TypeError, ValueError):
+        return None
+
+def file_source(file_name):
+    """Returns the (source, metrocuadrado search city slug or None) of a data/ CSV from its name."""
+    match = _M2_FILE.match(file_name)
+    return ('metrocuadrado', match.group(1)) if match else ('lalonja', None)
+
+def dataset_columns(headers):
+    """Returns the CSV columns of the dataset: BASE_COLUMNS, then any other column of the headers, sorted."""
+    extra = set().union(*headers) - set(BASE_COLUMNS) if headers else set()
+    return BASE_COLUMNS + sorted(extra)
+
+def dataset_schema(columns):
+    """Returns the Arrow schema of a dataset with the given CSV columns."""
+    _require_pyarrow()
+    types = {**{c: pa.float64() for c in FLOAT_COLUMNS}, **{c: pa.int64() for c in INT_COLUMNS},
+             **{c: pa.date32() for c in DATE_COLUMNS}}
+    return pa.schema(
+        [pa.field(column, types.get(column, pa.string())) for column in columns]
+        + [pa.field(column, pa.float64() if column in ('lon', 'lat') else pa.string()) for column in DERIVED_COLUMNS]
+        + [pa.field(column, pa.string()) for column in PARTITION_COLUMNS]
+    )
+
+def partitioning():
+    """Returns the hive partitioning of the dataset; both keys are read back as strings."""
+    _require_pyarrow()
+    return ds.partitioning(pa.schema([(column, pa.string()) for column in PARTITION_COLUMNS]), flavor='hive')
+
+def _typed_batch(files, mappings, schema):
+    """Worker task: the rows of a shard of files in the unified layout, as a typed RecordBatch.
+
+    Args:
+        files: (path, schema id) of each file.
+        mappings (dict): Schema id -> (column_mapping to the unified layout, number of columns of the schema).
+        schema (pa.Schema): See dataset_schema.
+
+    Returns:
+        tuple: (RecordBatch, list of (path, rows, error message or None)). A file that could not
+        be read to the end is left out of the batch.
+    """
+    columns = schema.names[:len(schema.names) - len(DERIVED_COLUMNS) - len(PARTITION_COLUMNS)]
+    property_type_index = columns.index('propertyType')
+    date_index = columns.index('Extraction Date')
+    coordinates_index = columns.index('coordinates')
+    rows, derived, report = [], [], []
+    for csv_file, schema_id in files:
+        mapping, width = mappings[schema_id]
+        csv_file = Path(csv_file)
+        folder = csv_file.parent.name
+        property_type = PROPERTY_TYPE_BY_FOLDER.get(folder)
+        source, search_city = file_source(csv_file.name)
+        try:
+            with open(csv_file, 'r', newline='', encoding='utf-8') as f:
+                reader = csv.reader(f)
+                next(reader)  # Header
+                file_rows = [remap(row, mapping, width) for row in reader if row]
+        except Exception as e:
+            report.append((csv_file, 0, str(e)))
+            continue
+        for values in file_rows:
+            if property_type and not values[property_type_index].strip():
+                values[property_type_index] = property_type
+            coordinates = values[coordinates_index]
+            lon, lat = _LON.search(coordinates), _LAT.search(coordinates)
+            extraction_date = values[date_index]
+            derived.append((source, search_city, float(lon.group(1)) if lon else None, float(lat.group(1)) if lat else None,
+                            folder, extraction_date[:7] if to_date(extraction_date) else None))
+        rows.extend(file_rows)
+        report.append((csv_file, len(file_rows), None))
+
+    converters = {**{c: to_float for c in FLOAT_COLUMNS}, **{c: to_int for c in INT_COLUMNS},
+                  **{c: to_date for c in DATE_COLUMNS}}
+    arrays = []
+    for index, column in enumerate(columns):
+        convert = converters.get(column)
+        if convert:
+            values = [convert(row[index]) for row in rows]
+        else:
+            values = [row[index] or None for row in rows]  # Empty text -> null
+        arrays.append(pa.array(values, type=schema.field(column).type))
+    for index, column in enumerate(schema.names[len(columns):]):
+        arrays.append(pa.array([row[index] for row in derived], type=schema.field(column).type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema), report
+
+def write_dataset(csv_files, dataset_dir=DEFAULT_DIR, workers=None, registry=None, append=False):
+    """Writes the rows of data/ CSV files to the Parquet dataset.
+
+    Args:
+        csv_files (list): data/<property type>/*.csv files, in the order their rows are written.
+        dataset_dir (str or Path): Root directory of the dataset.
+        workers (int): Worker processes typing the rows; one per core if None.
+        registry (SchemaRegistry): Optional header cache, see CsvTreeReader.
+        append (bool): Add new files to the dataset instead of replacing it.
+
+    Returns:
+        list: (path, rows, error message or None) of every file with a header.
+    """
+    _require_pyarrow()
+    dataset_dir = Path(dataset_dir)
+    with CsvTreeReader(workers, registry=registry) as reader:
+        files = [(csv_file, schema_id, header) for csv_file, schema_id, header, _ in reader.headers(csv_files) if header]
+        columns = dataset_columns([header for _, _, header in files])
+        schema = dataset_schema(columns)
+        report = []
+
+        def batches():
+            for batch, shard_report in reader.map_files(_typed_batch, files, columns, schema):
+                report.extend(shard_report)
+                yield batch
+
+        # A rebuild is written next to the dataset and swapped in once complete
+        target = dataset_dir if append else dataset_dir.with_name(dataset_dir.name + '.tmp')
+        if not append and target.exists():
+            shutil.rmtree(target)
+        target.mkdir(parents=True, exist_ok=True)  # Even if there are no rows
+        stamp = datetime.now().strftime('%Y%m%dT%H%M%S%f')
+        ds.write_dataset(
+            batches(), target, schema=schema, format='parquet', partitioning=partitioning(),
+            basename_template=f'part-{stamp}-{{i}}.parquet',  # New names on every append
+            existing_data_behavior='overwrite_or_ignore',
+            file_options=ds.ParquetFileFormat().make_write_options(compression='zstd'),
+            min_rows_per_group=ROWS_PER_GROUP, max_rows_per_group=ROWS_PER_GROUP * 16,
+        )
+    if not append:
+        if dataset_dir.exists():
+            shutil.rmtree(dataset_dir)
+        target.rename(dataset_dir)
+    return report
+
+def _as_date(value):
+    return value if isinstance(value, date) else date.fromisoformat(str(value))
+
+def read_listings(columns=None, property_types=None, start=None, end=None, filter=None, dataset_dir=DEFAULT_DIR):
+    """Reads listings from the Parquet dataset, opening only the partitions and columns needed.
+
+    Args:
+        columns (list): Columns to read; all if None.
+        property_types (list): data/ folders to read ('Apartments', 'Houses', 'Offices'); all if None.
+        start (str or date): First extraction date (inclusive), "YYYY-MM-DD".
+        end (str or date): Last extraction date (inclusive), "YYYY-MM-DD".
+        filter (pyarrow.dataset.Expression): Further row filter, e.g. ds.field('search_city') == 'medellin'.
+        dataset_dir (str or Path): Root directory of the dataset.
+
+    Returns:
+        pd.DataFrame: The listings, "Extraction Date" as datetime64.
+    """
+    _require_pyarrow()
+    dataset = ds.dataset(dataset_dir, format='parquet', partitioning=partitioning())
+    conditions = [] if filter is None else [filter]
+    if property_types is not None:
+        conditions.append(ds.field('property_type').isin(list(property_types)))
+    # The month bounds prune partitions, the date bounds filter the rows within the boundary months
+    if start is not None:
+        start = _as_date(start)
+        conditions += [ds.field('extraction_month') >= start.strftime('%Y-%m'), ds.field('Extraction Date') >= start]
+    if end is not None:
+        end = _as_date(end)
+        conditions += [ds.field('extraction_month') <= end.strftime('%Y-%m'), ds.field('Extraction Date') <= end]
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    table = dataset.to_table(columns=columns, filter=expression)
+    return table.to_pandas(date_as_object=False)
+
+def build_dataset(data_dir='data', dataset_dir=None, workers=None, schema_cache=SCHEMA_CACHE_PATH):
+    """Rebuilds the dataset from every CSV of data/<property type>/."""
+    data_dir = Path(data_dir)
+    dataset_dir = Path(dataset_dir or data_dir / DEFAULT_DIR.name)
+    csv_files = data_files(data_dir)
+    print(f"Found {len(csv_files)} CSV files")
+    registry = SchemaRegistry(schema_cache) if schema_cache else None
+    try:
+        report = write_dataset(csv_files, dataset_dir, workers=workers, registry=registry)
+    finally:
+        if registry:
+            registry.close()
+    for csv_file, rows, error in report:
+        if error:
+            print(f"  Error reading {csv_file.name}, skipped: {error}")
+    print(f"Wrote {sum(rows for _, rows, error in report if not error)} rows to {dataset_dir}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data-dir', default='data', help='root of the <property type>/*.csv tree')
+    parser.add_argument('--dataset-dir', help=f'dataset root (default: <data dir>/{DEFAULT_DIR.name})')
+    parser.add_argument('--workers', type=int, help='worker processes reading the files (default: one per core)')
+    schema_cache = parser.add_mutually_exclusive_group()
+    schema_cache.add_argument('--schema-cache', default=SCHEMA_CACHE_PATH, help='file of the header schema registry')
+    schema_cache.add_argument('--no-schema-cache', dest='schema_cache', action='store_const', const=None,
+                              help='read the header of every file')
+    args = parser.parse_args()
+    build_dataset(args.data_dir, args.dataset_dir, args.workers, args.schema_cache)
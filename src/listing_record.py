@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Typed listing records emitted by the scrapers.
+
+Each scraper family has its own record, a dataclass with slots, instead of a dict per row: the
+numeric fields are parsed once, when the listing is extracted, and a record knows the CSV column
+of each of its fields, so the row writer serializes it straight to a CSV line in the column order
+of the existing files. Rows coming back from JSON (seen index, HTTP cache, raw archive) are turned
+into records again with from_row.
+"""
+
+import math
+from dataclasses import dataclass, fields
+from datetime import datetime
+from functools import cache
+from typing import ClassVar
+
+def today():
+    """Returns today's date as written in the "Extraction Date" column."""
+    return datetime.now().strftime("%Y-%m-%d")
+
+def to_number(value):
+    """Parses a scraped value such as 3, "3" or "76.5" into an int or a float.
+
+    Values that are not numbers (None, "3+", "") are returned unchanged, so nothing is lost.
+    """
+    if not isinstance(value, str):
+        return value
+    text = value.strip()
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        number = float(text)
+    except ValueError:
+        return value
+    return number if math.isfinite(number) else value  # Not "nan" or "inf"
+
+@cache
+def _layout(record_type):
+    """Returns the (field names, CSV columns) of a record type, in column order."""
+    names = tuple(field.name for field in fields(record_type))
+    return names, tuple(record_type.COLUMNS.get(name, name) for name in names)
+
+@dataclass(slots=True)
+class ListingRecord:
+    """Base of the listing records.
+
+    Subclasses declare their fields in CSV column order, map the fields whose column is not a
+    valid identifier in COLUMNS and list the fields parsed with to_number in NUMERIC.
+    """
+
+    COLUMNS: ClassVar[dict] = {}  # Field name -> CSV column, for the fields named differently
+    NUMERIC: ClassVar[tuple] = ()
+
+    def __post_init__(self):
+        for name in self.NUMERIC:
+            setattr(self, name, to_number(getattr(self, name)))
+
+    @classmethod
+    def columns(cls):
+        """Returns the CSV columns of the record, in order."""
+        return _layout(cls)[1]
+
+    @classmethod
+    def from_row(cls, row):
+        """Builds a record from a row dict keyed by CSV column; missing columns are None."""
+        names, columns = _layout(cls)
+        return cls(**{name: row.get(column) for name, column in zip(names, columns)})
+
+    def values(self):
+        """Returns the field values in column order."""
+        return tuple(getattr(self, name) for name in _layout(type(self))[0])
+
+    def to_row(self):
+        """Returns the record as a dict keyed by CSV column, e.g. to store it as JSON."""
+        return dict(zip(self.columns(), self.values()))
+
+@dataclass(slots=True)
+class M2Listing(ListingRecord):
+    """A metrocuadrado listing; the fields keep the names of the detail page payload."""
+
+    propertyId: str = None
+    propertyType: dict = None
+    salePrice: int = None
+    area: float = None
+    areac: float = None
+    rooms: int = None
+    bathrooms: int = None
+    garages: int = None
+    city: dict = None
+    zone: dict = None
+    neighborhood: str = None
+    commonNeighborhood: str = None
+    adminPrice: int = None
+    companyName: str = None
+    propertyState: str = None
+    coordinates: dict = None
+    link: str = None
+    builtTime: str = None
+    stratum: int = None
+    extraction_date: str = None
+
+    COLUMNS: ClassVar[dict] = {'extraction_date': 'Extraction Date'}
+    NUMERIC: ClassVar[tuple] = ('salePrice', 'area', 'areac', 'rooms', 'bathrooms', 'garages', 'adminPrice', 'stratum')
+
+@dataclass(slots=True)
+class LalonjaListing(ListingRecord):
+    """A lalonja listing. Price and area keep the text shown on the page ("$150,000,000", "55m"),
+    like the CSVs written so far; the counts are parsed."""
+
+    link: str = None
+    code: str = None
+    price: str = None
+    bathrooms: int = None
+    area: str = None
+    rooms: int = None
+    garages: int = None
+    closets: int = None
+    municipality: str = None
+    neighborhood: str = None
+    extraction_date: str = None
+
+    COLUMNS: ClassVar[dict] = {
+        'price': 'Precio', 'bathrooms': 'Baños', 'area': 'Área', 'rooms': 'Habitaciones', 'garages': 'Garajes',
+        'closets': 'Closets', 'municipality': 'Municipio', 'neighborhood': 'Barrio', 'extraction_date': 'Extraction Date',
+    }
+    NUMERIC: ClassVar[tuple] = ('bathrooms', 'rooms', 'garages', 'closets')
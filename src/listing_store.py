@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Append-only store of the combined listings: one gzip-compressed CSV segment per property type and
+extraction date, plus a manifest.
+
+data/combined_listings.csv grew with every daily file and had to be reopened, rewritten and
+committed whole every week. The store keeps the same rows, in the same column layout, split by the
+date of the daily files they come from:
+
+    data/combined_listings/manifest.json
+    data/combined_listings/Apartments/2025-01-02.csv.gz
+    data/combined_listings/Houses/2025-01-02.csv.gz
+
+The manifest lists, for every segment, the data/ files it was built from and its row count, so it
+also records which files have been processed. An update only writes the segments of the dates that
+got new files (a file arriving late rewrites its date's segment together with the files already
+listed), so the I/O and the git changes follow the new data, not the history. Segments are
+compressed with a fixed gzip header, so rewriting one with the same rows gives the same bytes, and
+the manifest is saved last: an interrupted update is simply redone by the next one.
+
+Readers pick the segments by property type and date from the manifest before opening any file.
+"""
+
+import csv
+import gzip
+import io
+import json
+import os
+import re
+from collections import defaultdict
+from pathlib import Path
+
+from csv_ingest import _normalize_rows
+
+DEFAULT_DIR = Path('data/combined_listings')
+MANIFEST = 'manifest.json'
+
+_FILE_DATE = re.compile(r'_(\d{4}-\d{2}-\d{2})\.csv$')
+
+def segment_of(csv_file):
+    """Returns the segment name ('<property type>/<YYYY-MM-DD>.csv.gz') of a data/ CSV, None if its name has no date."""
+    csv_file = Path(csv_file)
+    match = _FILE_DATE.search(csv_file.name)
+    return f'{csv_file.parent.name}/{match.group(1)}.csv.gz' if match else None
+
+def _write_segment(files, mappings, property_type_index, root, columns):
+    """Worker task: writes the segment of a shard of files, all of the same segment.
+
+    Args:
+        files: (path, schema id) of each file.
+        mappings (dict): Schema id -> (column_mapping to the store layout, number of columns of the schema).
+        property_type_index (int): Position of propertyType in the layout, None if absent.
+        root (str): Store directory.
+        columns (list): Column layout of the store, written as the header.
+
+    Returns:
+        tuple: (segment name, list of (path, rows, error message or None)). The rows of a file
+        that could not be read to the end are left out of the segment.
+    """
+    name = segment_of(files[0][0])
+    text, report = _normalize_rows(files, mappings, property_type_index)
+    segment_file = Path(root) / name
+    segment_file.parent.mkdir(parents=True, exist_ok=True)
+    partial_file = segment_file.with_name(segment_file.name + '.tmp')
+    # No file name or time in the gzip header: same rows, same bytes
+    with open(partial_file, 'wb') as raw, gzip.GzipFile(filename='', mode='wb', fileobj=raw, mtime=0) as compressed:
+        with io.TextIOWrapper(compressed, encoding='utf-8', newline='') as f:
+            csv.writer(f).writerow(columns)
+            f.write(text)
+    os.replace(partial_file, segment_file)
+    return name, report
+
+class ListingStore:
+    """The segments and manifest under a directory. Only one process should update a store at a time.
+
+    Args:
+        root (str or Path): Store directory, created by the first update.
+    """
+
+    def __init__(self, root=DEFAULT_DIR):
+        self.root = Path(root)
+        self.manifest_file = self.root / MANIFEST
+        if self.manifest_file.exists():
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        else:
+            manifest = {'columns': [], 'segments': {}}
+        self._columns = manifest['columns']
+        self._segments = manifest['segments']
+
+    def columns(self):
+        """Returns the column layout of the store; segments written before a column appeared lack it."""
+        return list(self._columns)
+
+    def processed_files(self):
+        """Returns the data/ files (relative to the data directory) already in the store."""
+        return {rel_path for entry in self._segments.values() for rel_path in entry['files']}
+
+    def segments(self, property_types=None, start=None, end=None):
+        """Returns (segment name, manifest entry) of the segments selected, by name.
+
+        Args:
+            property_types (list): data/ folders to keep ('Apartments', 'Houses', 'Offices'); all if None.
+            start (str): First extraction date (inclusive), "YYYY-MM-DD".
+            end (str): Last extraction date (inclusive), "YYYY-MM-DD".
+        """
+        return [
+            (name, entry) for name, entry in sorted(self._segments.items())
+            if (property_types is None or entry['property_type'] in property_types)
+            and (start is None or entry['date'] >= str(start))
+            and (end is None or entry['date'] <= str(end))
+        ]
+
+    def iter_rows(self, property_types=None, start=None, end=None):
+        """Yields the rows of the segments selected (see segments) as dicts with every column of the store.
+
+        Columns missing from an older segment come out as empty strings, like in the combined CSV.
+        """
+        for name, entry in self.segments(property_types, start, end):
+            if not entry['rows']:
+                continue  # Only empty files, nothing written
+            with gzip.open(self.root / name, 'rt', encoding='utf-8', newline='') as f:
+                reader = csv.DictReader(f, restval='')
+                if reader.fieldnames == self._columns:
+                    yield from reader
+                    continue
+                for row in reader:
+                    yield {column: row.get(column, '') for column in self._columns}
+
+    def add_files(self, reader, csv_files, data_dir='data'):
+        """Adds new data/ files to the store, rewriting the segments of their dates, and saves the manifest.
+
+        Args:
+            reader (CsvTreeReader): Reader whose worker pool (and schema registry) is used.
+            csv_files (list): New files under data_dir/<property type>/.
+            data_dir (str or Path): Data directory the manifest paths are relative to.
+
+        Returns:
+            list: (path, rows, error message or None) of every file read, the files of the
+            segments rewritten included. Files with an error are left out of the manifest, so
+            the next update retries them.
+        """
+        data_dir = Path(data_dir)
+        report = []
+        members = defaultdict(set)  # Segment name -> relative paths of its files
+        for csv_file in csv_files:
+            name = segment_of(csv_file)
+            if name is None:
+                report.append((csv_file, 0, 'no extraction date in the file name'))
+                continue
+            members[name].add(str(Path(csv_file).relative_to(data_dir)))
+        for name in members:
+            members[name].update(self._segments.get(name, {}).get('files', ()))
+        files = [data_dir / rel_path for name in sorted(members) for rel_path in sorted(members[name])]
+
+        readable, empty = [], defaultdict(list)
+        for csv_file, schema_id, header, error in reader.headers(files):
+            if error:
+                report.append((csv_file, 0, error))
+            elif header:
+                readable.append((csv_file, schema_id, header))
+            else:
+                empty[segment_of(csv_file)].append(str(csv_file.relative_to(data_dir)))
+                report.append((csv_file, 0, None))
+
+        # Keep the layout of the store; a new column is added at the end, older segments just lack it
+        new_columns = {column for _, _, header in readable for column in header} - set(self._columns)
+        self._columns += sorted(new_columns)
+        property_type_index = self._columns.index('propertyType') if 'propertyType' in self._columns else None
+
+        written = {}
+        for name, segment_report in reader.map_files(_write_segment, readable, self._columns, property_type_index,
+                                                     str(self.root), self._columns, group=segment_of):
+            written[name] = segment_report
+            report.extend(segment_report)
+        for name in members:
+            read = [(str(Path(csv_file).relative_to(data_dir)), rows) for csv_file, rows, error in written.get(name, ()) if not error]
+            property_type, extraction_date = name[:-len('.csv.gz')].split('/')
+            self._segments[name] = {
+                'property_type': property_type,
+                'date': extraction_date,
+                'rows': sum(rows for _, rows in read),
+                'files': sorted([rel_path for rel_path, _ in read] + empty[name]),
+            }
+        self._save()
+        return report
+
+    def _save(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        partial_file = self.manifest_file.with_name(MANIFEST + '.tmp')
+        with open(partial_file, 'w', encoding='utf-8') as f:
+            # One entry per line, in a stable order, so a weekly update only adds lines to the diff
+            json.dump({'columns': self._columns, 'segments': dict(sorted(self._segments.items()))}, f,
+                      ensure_ascii=False, indent=1)
+            f.write('\n')
+        os.replace(partial_file, self.manifest_file)
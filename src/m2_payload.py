@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Helpers to locate and decode the listing JSON payload embedded in metrocuadrado detail pages.
+
+The payload is shipped inside a Next.js <script> as an escaped JavaScript string literal
+(`{\"data\":{...}}`). Instead of counting braces character by character and stripping every
+backslash, the string literal is unescaped once and the object is decoded in a single pass
+with json.JSONDecoder.raw_decode, which also copes with braces and quotes inside string values.
+"""
+
+import json
+import re
+
+DATA_MARKER = '{\\"data\\"'  # How the start of the payload looks inside the escaped script text
+
+# Remainder of a double quoted JavaScript string literal (unrolled loop, so the scan stays linear)
+_STRING_LITERAL_BODY = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.DOTALL)
+_string_decoder = json.JSONDecoder(strict=False)  # Tolerates raw control characters inside the literal
+_object_decoder = json.JSONDecoder()
+
+def extract_payload(script_text):
+    """Decodes the `{"data": ...}` object embedded in the text of a script tag.
+
+    Args:
+        script_text (str): Text content of a <script> tag.
+
+    Returns:
+        dict: Parsed JSON payload, or None if the script does not contain it.
+
+    Raises:
+        ValueError: If the marker is present but the payload cannot be decoded.
+    """
+    start_index = script_text.find(DATA_MARKER)
+    if start_index == -1:
+        return None
+    return _decode_payload_at(script_text, start_index)
+
+def find_payload_in_html(html):
+    """Scans the raw page source for the payload script without building a DOM.
+
+    Args:
+        html (str): The page source as returned by the browser or the HTTP response.
+
+    Returns:
+        dict: Parsed JSON payload, or None if no <script> contains it.
+
+    Raises:
+        ValueError: If the marker is present but the payload cannot be decoded.
+    """
+    start_index = html.find(DATA_MARKER)
+    while start_index != -1:
+        # Only accept the marker when it sits inside an open <script> element
+        script_start = html.rfind('<script', 0, start_index)
+        if script_start != -1 and html.find('</script', script_start, start_index) == -1:
+            return _decode_payload_at(html, start_index)
+        start_index = html.find(DATA_MARKER, start_index + len(DATA_MARKER))
+    return None
+
+def _decode_payload_at(text, start_index):
+    """Unescapes the string literal starting at `start_index` and decodes the object it begins with."""
+    # Everything from the marker up to the closing quote of the surrounding string literal
+    literal_body = _STRING_LITERAL_BODY.match(text, start_index).group()
+    unescaped = _string_decoder.decode(f'"{literal_body}"')
+    json_data, _ = _object_decoder.raw_decode(unescaped)  # Ignores whatever follows the object
+    return json_data
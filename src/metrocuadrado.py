@@ -0,0 +1,737 @@
+#!/usr/bin/env python3
+"""
+metrocuadrado.com source: listing links are collected with Selenium from the result pages and
+each detail page's embedded JSON payload is turned into one row.
+"""
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from m2_payload import DATA_MARKER, extract_payload, find_payload_in_html
+from http_client import DEFAULT_TIMEOUT, FetchError, create_session, response_text
+from http_cache import conditional_get
+from fetch_scheduler import FetchScheduler
+from concurrent.futures import as_completed
+from browser_pool import BrowserPool, create_driver
+from html_parsing import SCRIPTS, make_soup
+from seen_index import card_hash
+from listing_record import M2Listing, today
+import requests
+import logging
+import queue
+import threading
+import time
+import pandas as pd
+
+CARD_CLASS = "property-card__content"  # Result card holding the listing link, price and area
+# "Next page" control of the results pagination; only enabled controls are matched
+NEXT_PAGE_SELECTOR = 'a[rel="next"], li.ant-pagination-next:not(.ant-pagination-disabled) button, button[aria-label="Siguiente"]:not([disabled])'
+READY_POLL = 0.05  # Seconds between two checks for the payload script of a detail page
+DETAILS_VERSION = 1  # Version of the detail rows kept in the HTTP cache; bump when parse_property_details changes
+# Text of the first script holding the payload as {text}; {text: null} once the page finished loading without it; null while waiting
+PAYLOAD_SCRIPT_JS = """
+const marker = arguments[0];
+for (const script of document.scripts) {
+    if (script.textContent.includes(marker)) return {text: script.textContent};
+}
+return document.readyState === 'complete' ? {text: null} : null;
+"""
+# Payload fields picked out of the Next.js flight data the page already holds, see wait_for_payload_fields.
+# Returns {payload}; {payload: null} once the page finished loading without it; null while waiting
+PAYLOAD_FIELDS_JS = """
+const fields = arguments[0];
+const complete = document.readyState === 'complete';
+const text = (self.__next_f || []).filter(chunk => chunk[0] === 1).map(chunk => chunk[1]).join('');
+const at = text.indexOf('{"data"');
+let end = text.indexOf('\\n', at);
+if (at === -1 || (end === -1 && !complete)) return complete ? {payload: null} : null;
+if (end === -1) end = text.length;
+const row = text.slice(text.lastIndexOf('\\n', at) + 1, end);  // A flight row is "<id>:<JSON value>"
+let value;
+try {
+    value = JSON.parse(row.slice(row.indexOf(':') + 1));
+} catch (error) {
+    return {payload: null};
+}
+const findData = node => {
+    if (!node || typeof node !== 'object') return null;
+    if (!Array.isArray(node) && node.data && typeof node.data === 'object') return node.data;
+    for (const key in node) {
+        const found = findData(node[key]);
+        if (found) return found;
+    }
+    return null;
+};
+const data = findData(value);
+if (!data) return {payload: null};
+const picked = {};
+for (const field of fields) {
+    const path = field.split('.');
+    let source = data, target = picked;
+    for (const key of path.slice(0, -1)) {
+        source = source[key];
+        if (!source || typeof source !== 'object') break;
+        target = target[key] = target[key] || {};
+    }
+    const last = path[path.length - 1];
+    if (source && typeof source === 'object' && last in source) target[last] = source[last];
+}
+return {payload: {data: picked}};
+"""
+
+def extract_json_data(driver, url, timeout=10, session=None, raise_errors=False, fields=None):
+    """Extracts JSON data from a <script type="application/json"> tag.
+
+    Args:
+        driver: Selenium WebDriver instance.
+        url: URL of the page.
+        timeout: Timeout in seconds for waiting for the page to load.
+        session: Optional requests.Session. If given, the page is fetched over plain HTTP and the driver is not used.
+        raise_errors: Raise FetchError when the page cannot be loaded instead of returning None.
+        fields: Optional payload fields (dotted paths, e.g. PAYLOAD_FIELDS) to pick inside the page
+            with the driver; only those are returned. The whole payload if None or over HTTP.
+
+    Returns:
+        dict: Parsed JSON data, or None if not found or on error.
+    """
+    try:
+        if session is not None:
+            response = session.get(url, timeout=timeout)
+            response.raise_for_status()
+            page_source = response_text(response)
+        else:
+            start = time.perf_counter()
+            driver.get(url)
+            loaded = time.perf_counter()
+            json_data = wait_for_payload_fields(driver, fields, timeout) if fields else None
+            # Without fields, or when the flight data could not be read, decode the script text instead
+            script_text = wait_for_payload_script(driver, timeout) if json_data is None else None
+            logging.info(f"Page timing {url}: get {loaded - start:.2f}s, payload ready {time.perf_counter() - loaded:.2f}s")
+            if json_data is not None:
+                return json_data
+            if script_text is not None:
+                return extract_payload(script_text)
+            page_source = driver.page_source  # Loaded without the script: last look at the whole source
+
+        return payload_from_source(page_source)
+
+    except (TimeoutException, requests.exceptions.Timeout) as e:
+        logging.error(f"Timeout on {url}")
+        if raise_errors:
+            raise FetchError(f"Timeout on {url}") from e
+        return None
+    except (requests.exceptions.RequestException, WebDriverException) as e:
+        logging.error(f"Error fetching {url}: {e}")
+        if raise_errors:
+            raise FetchError(e) from e
+        return None
+    except Exception as e:
+        logging.exception(f"Error extracting JSON on {url}: {e}")
+        return None
+
+def wait_for_payload_script(driver, timeout=10):
+    """Waits until the payload script of the page being loaded is in the DOM and returns its text.
+
+    The DOM is polled through execute_script, so this returns as soon as the script is parsed,
+    without waiting for the rest of the page, and only the script text crosses over from the browser.
+
+    Args:
+        driver: Selenium WebDriver instance, right after driver.get.
+        timeout: Seconds to wait for the script.
+
+    Returns:
+        str: Text of the script holding the payload, or None if the page finished loading without it.
+
+    Raises:
+        TimeoutException: Neither the script nor the end of the page load came within timeout.
+    """
+    found = WebDriverWait(driver, timeout, poll_frequency=READY_POLL).until(
+        lambda d: d.execute_script(PAYLOAD_SCRIPT_JS, DATA_MARKER)
+    )
+    return found['text']
+
+def wait_for_payload_fields(driver, fields, timeout=10):
+    """Waits until the payload of the page being loaded is available and returns some of its fields.
+
+    The payload is located and decoded by the page itself, in the Next.js flight data it already
+    parsed (self.__next_f), and only the requested fields are sent back over the WebDriver protocol.
+
+    Args:
+        driver: Selenium WebDriver instance, right after driver.get.
+        fields: Dotted paths of the fields inside "data", e.g. ('salePrice', 'detail.adminPrice').
+        timeout: Seconds to wait for the payload.
+
+    Returns:
+        dict: {"data": {...}} with the fields found, shaped like the full payload, or None if the
+        page finished loading without flight data holding the payload.
+
+    Raises:
+        TimeoutException: Neither the payload nor the end of the page load came within timeout.
+    """
+    found = WebDriverWait(driver, timeout, poll_frequency=READY_POLL).until(
+        lambda d: d.execute_script(PAYLOAD_FIELDS_JS, list(fields))
+    )
+    return found['payload']
+
+def payload_from_source(page_source):
+    """Decodes the JSON payload embedded in the HTML of a detail page.
+
+    Args:
+        page_source (str): The page HTML.
+
+    Returns:
+        dict: Parsed JSON data, or None if the page has no payload.
+
+    Raises:
+        ValueError: The payload script was found but could not be decoded.
+    """
+    # Fast path: scan the raw source for the payload script, no DOM needed
+    json_data = find_payload_in_html(page_source)
+    if json_data is not None:
+        return json_data
+
+    # Fallback: let BeautifulSoup split the page into script tags
+    soup = make_soup(page_source, parse_only=SCRIPTS)
+
+    script_tags = soup.find_all("script")
+    if script_tags:
+        for script_tag in script_tags:
+            if script_tag.string and DATA_MARKER in script_tag.string:
+                return extract_payload(script_tag.string)
+    return None  # No script tag found
+
+def extract_property_details(driver, url, timeout=10, session=None, archive=None, cache=None, raise_errors=False, in_page=False,
+                             extraction_date=None):
+    """Extracts specific property details from the JSON data.
+
+    Args:
+        driver: Selenium WebDriver instance.
+        url: URL of the property page.
+        timeout: Timeout in seconds.
+        session: Optional requests.Session to fetch the page over plain HTTP instead of the driver.
+        archive: Optional RawArchive the extracted JSON is appended to.
+        cache: Optional HttpCache used with `session`. An unchanged page is not parsed again, its
+            previous details are returned with the new extraction date.
+        raise_errors: Raise FetchError when the page cannot be loaded instead of returning None.
+        in_page: With the driver, pick the PAYLOAD_FIELDS inside the page instead of transferring and
+            decoding the whole payload script. The archive then holds only those fields. If they do not
+            make a listing, the payload is decoded from the page source instead.
+        extraction_date (str): Value of the "Extraction Date" column, computed once per run. Today if None.
+
+    Returns:
+        M2Listing: Extracted property details, or None if not found or on error.
+    """
+    if cache is not None and session is not None:
+        return _cached_property_details(url, timeout, session, archive, cache, raise_errors, extraction_date)
+    in_page = in_page and session is None
+    json_data = extract_json_data(driver, url, timeout, session, raise_errors, PAYLOAD_FIELDS if in_page else None)
+    details = parse_property_details(json_data, url, extraction_date)
+    if details is None and in_page and json_data is not None:
+        # The fields picked in the page did not make a listing (e.g. the flight data changed shape)
+        logging.warning(f"Fields picked in the page of {url} did not parse, decoding the page source instead")
+        try:
+            json_data = payload_from_source(driver.page_source)
+        except (ValueError, WebDriverException) as e:
+            logging.error(f"Error extracting JSON on {url}: {e}")
+            json_data = None
+        details = parse_property_details(json_data, url, extraction_date)
+    if json_data and archive:
+        archive.append(url, json_data, kind='json')
+    return details
+
+def _cached_property_details(url, timeout, session, archive, cache, raise_errors=False, extraction_date=None):
+    """extract_property_details over HTTP through the conditional GET cache."""
+    def parse(response):
+        try:
+            json_data = payload_from_source(response_text(response))
+        except Exception as e:
+            logging.exception(f"Error extracting JSON on {url}: {e}")
+            return None  # Not cached: the page is parsed again on the next fetch
+        if json_data and archive:
+            archive.append(url, json_data, kind='json')
+        details = parse_property_details(json_data, url, extraction_date)
+        return details.to_row() if details else None  # Cached as JSON
+
+    try:
+        details, reused = conditional_get(session, url, parse, cache, timeout, DETAILS_VERSION)
+    except requests.exceptions.Timeout as e:
+        logging.error(f"Timeout on {url}")
+        if raise_errors:
+            raise FetchError(f"Timeout on {url}") from e
+        return None
+    except requests.exceptions.RequestException as e:
+        logging.error(f"Error fetching {url}: {e}")
+        if raise_errors:
+            raise FetchError(e) from e
+        return None
+    if not details:
+        return None
+    details = M2Listing.from_row(details)
+    if reused:
+        details.extraction_date = extraction_date or today()
+        if archive:
+            archive.append(url, details.to_row(), kind='row')  # Nothing was parsed, keep the row so a reparse still lists it
+    return details
+
+# Fields of the payload's "data" read by parse_property_details
+PAYLOAD_FIELDS = ('propertyId', 'propertyType', 'salePrice', 'area', 'areac', 'rooms', 'bathrooms', 'garages', 'city', 'zone',
+                  'neighborhood', 'commonNeighborhood', 'detail.adminPrice', 'companyName', 'propertyState', 'coordinates',
+                  'link', 'builtTime', 'stratum')
+
+def parse_property_details(json_data, url, extraction_date=None):
+    """Turns the JSON payload of a detail page into a listing record.
+
+    Args:
+        json_data (dict): Payload returned by extract_json_data.
+        url (str): URL of the property page, for error messages.
+        extraction_date (str): Value of the "Extraction Date" column. Today if None.
+
+    Returns:
+        M2Listing: Extracted property details, or None if the payload lacks them.
+    """
+    if json_data:
+        json_data = json_data.get('data', None)
+        try:
+            return M2Listing(
+                propertyId=json_data.get('propertyId'),
+                propertyType=json_data.get('propertyType'),
+                # businessType=real_estate.get('businessType'),
+                salePrice=json_data.get('salePrice'),
+                area=json_data.get('area'),
+                areac=json_data.get('areac'),
+                rooms=json_data.get('rooms'),
+                bathrooms=json_data.get('bathrooms'),
+                garages=json_data.get('garages'),
+                city=json_data.get('city'),
+                zone=json_data.get('zone'),
+                # sector=real_estate.get('sector'),
+                neighborhood=json_data.get('neighborhood'),
+                commonNeighborhood=json_data.get('commonNeighborhood'),
+                adminPrice=json_data['detail'].get('adminPrice'),
+                companyName=json_data.get('companyName'),
+                propertyState=json_data.get('propertyState'),
+                coordinates=json_data.get('coordinates'),
+                link=json_data.get('link'),
+                builtTime=json_data.get('builtTime'),
+                stratum=json_data.get('stratum'),
+                extraction_date=extraction_date or today(),
+            )
+
+        except (KeyError, TypeError, AttributeError) as e:
+            logging.error(f"Error extracting specific data from {url}: {e}")
+            return None
+
+    return None
+
+def _card_links(card_headers, seen_links):
+    """Returns (link, card hash) tuples of the cards whose links are not in seen_links yet, excluding "proyecto" links."""
+    cards = []
+    for card_header in card_headers:
+        a_tags = card_header.find_elements(By.TAG_NAME, "a")
+        card_text_hash = card_hash(card_header.text)
+        for a_tag in a_tags:
+            href = a_tag.get_attribute("href")
+            # Exclude links containing "proyecto" (project/new development properties)
+            if href and "proyecto" not in href.lower() and href not in seen_links:
+                seen_links.add(href)
+                cards.append((href, card_text_hash))
+    return cards
+
+def _scroll_until_stable(driver, scroll_timeout, max_scrolls=20):
+    """Scrolls to the bottom until the number of lazily loaded cards stops growing, at most `max_scrolls` times."""
+    count = len(driver.find_elements(By.CLASS_NAME, CARD_CLASS))
+    for _ in range(max_scrolls):
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        try:
+            WebDriverWait(driver, scroll_timeout).until(lambda d: len(d.find_elements(By.CLASS_NAME, CARD_CLASS)) > count)
+        except TimeoutException:
+            return  # Nothing new showed up after the last scroll
+        count = len(driver.find_elements(By.CLASS_NAME, CARD_CLASS))
+    logging.warning(f"Cards still loading after {max_scrolls} scrolls, keeping the {count} loaded so far")
+
+def iter_result_pages(driver, url_main, timeout=10, scroll_timeout=2, max_pages=100, max_scrolls=20):
+    """Walks the result pages, yielding the new property cards of each one.
+
+    Every page is scrolled until its card count stops growing, then the "next page" control is
+    followed until it is missing or disabled. Links already seen on earlier pages are skipped.
+
+    Args:
+        driver: Selenium WebDriver instance.
+        url_main: URL of the first results page.
+        timeout: Timeout for Selenium waits.
+        scroll_timeout: Seconds to wait for more cards after each scroll.
+        max_pages: Safety cap on the number of pages walked.
+        max_scrolls: Safety cap on the number of scrolls per page.
+
+    Yields:
+        list: (link, card hash) tuples of one page. The hash covers the card text (price, area, ...)
+        so unchanged listings can be recognized without opening them.
+
+    Returns:
+        bool: True if the pagination ended (no "next page" control, or a page without new cards),
+        False if it was cut short by a page that did not load or by max_pages. Use walk_result_pages
+        to get it.
+
+    Raises:
+        TimeoutException: If no property card shows up on the first page within `timeout` seconds.
+    """
+    driver.get(url_main)
+    wait = WebDriverWait(driver, timeout)
+    seen_links = set()
+    for page in range(1, max_pages + 1):
+        # Find all card headers that contain the property links
+        wait.until(EC.presence_of_all_elements_located((By.CLASS_NAME, CARD_CLASS)))
+        _scroll_until_stable(driver, scroll_timeout, max_scrolls)
+        card_headers = driver.find_elements(By.CLASS_NAME, CARD_CLASS)
+        cards = _card_links(card_headers, seen_links)
+        logging.info(f"Result page {page}: {len(card_headers)} cards, {len(cards)} new links")
+        if not cards:
+            return True  # The pagination went round in a circle or stopped changing
+        yield cards
+
+        next_controls = driver.find_elements(By.CSS_SELECTOR, NEXT_PAGE_SELECTOR)
+        if not next_controls:
+            return True
+        last_link = cards[-1][0]
+        driver.execute_script("arguments[0].click();", next_controls[0])
+        try:
+            # The page is replaced in place, so wait until the last link seen is gone
+            wait.until(lambda d: all(a.get_attribute("href") != last_link
+                                     for a in d.find_elements(By.CSS_SELECTOR, f".{CARD_CLASS} a")))
+        except TimeoutException:
+            logging.warning(f"Result page {page + 1} did not load, stopping the pagination")
+            return False
+    logging.warning(f"Stopped the pagination of {url_main} after {max_pages} pages")
+    return False
+
+def walk_result_pages(driver, url_main, on_page, timeout=10):
+    """Walks the result pages with iter_result_pages, passing the new cards of each one to on_page.
+
+    Args:
+        driver: Selenium WebDriver instance.
+        url_main: URL of the first results page.
+        on_page: Called with the (link, card hash) tuples of each page.
+        timeout: Timeout for Selenium waits.
+
+    Returns:
+        bool: True if every result page was walked, False if the pagination was cut short.
+    """
+    pages = iter_result_pages(driver, url_main, timeout)
+    while True:
+        try:
+            cards = next(pages)
+        except StopIteration as end:
+            return end.value
+        on_page(cards)
+
+def collect_property_cards(driver, url_main, timeout=10):
+    """Collects the property links of every result page, excluding "proyecto" links.
+
+    Args:
+        driver: Selenium WebDriver instance.
+        url_main: URL of the first results page.
+        timeout: Timeout for Selenium waits.
+
+    Returns:
+        list: (link, card hash) tuples, without duplicates.
+    """
+    cards = []
+    walk_result_pages(driver, url_main, cards.extend, timeout)
+    return cards
+
+def iter_property_details(links, driver=None, http_mode=False, concurrency=4, rate_per_host=2.0, archive=None):
+    """Extracts the details of every property link.
+
+    Args:
+        links: Property detail page URLs.
+        driver: Selenium WebDriver used to load the pages when not in http_mode.
+        http_mode: If True, the pages are fetched concurrently with a pooled requests.Session instead of the driver.
+        concurrency: Number of detail pages fetched in parallel in http_mode.
+        rate_per_host: Requests per second allowed against the site in http_mode.
+        archive: Optional RawArchive every fetched payload is appended to.
+
+    Yields:
+        tuple: (link, M2Listing or None) in the order of `links`.
+    """
+    extraction_date = today()
+    if http_mode:
+        session = create_session(pool_size=concurrency)
+
+        def fetch_details(link):
+            logging.info(f"Extracting data from link: {link}")
+            return extract_property_details(None, link, session=session, archive=archive, extraction_date=extraction_date)
+
+        with FetchScheduler(concurrency=concurrency, rate_per_host=rate_per_host) as scheduler:
+            yield from zip(links, scheduler.map(fetch_details, links))
+            logging.info(f"Fetch stats: {scheduler.stats()}")
+    else:
+        for i, link in enumerate(links):
+            logging.info(f"Extracting data from link {i+1}/{len(links)}: {link}")
+            yield link, extract_property_details(driver, link, archive=archive, extraction_date=extraction_date)
+
+def scrape_property_details(links, driver=None, http_mode=False, concurrency=4, rate_per_host=2.0):
+    """Same as iter_property_details, but returns the list of successfully extracted details."""
+    return [data for _, data in iter_property_details(links, driver, http_mode, concurrency, rate_per_host) if data]
+
+def get_property_links_selenium(url_main, timeout=10, limit=None, http_mode=False, concurrency=4, rate_per_host=2.0, driver=None):
+    """Extracts property links and details, excluding "proyecto" links, and returns a pandas DataFrame.
+
+    Args:
+        url_main: Main URL to start scraping.
+        timeout: Timeout for Selenium waits.
+        limit: Maximum number of links to process.
+        http_mode: If True, Chrome is only used to collect the links and is closed before the
+            detail pages are fetched with a pooled requests.Session.
+        concurrency: Number of detail pages fetched in parallel in http_mode.
+        rate_per_host: Requests per second allowed against the site in http_mode.
+        driver: Optional Selenium WebDriver to reuse, e.g. from a BrowserPool. It is left open;
+            a browser is started and quit by this function only when none is given.
+
+    Returns:
+        pandas.DataFrame: DataFrame containing property details, or None on error.
+    """
+    owns_driver = driver is None
+    try:
+        if owns_driver:
+            driver = create_driver()
+        links = [link for link, _ in collect_property_cards(driver, url_main, timeout)]
+        if limit:
+            links = links[:limit]  # Stop once the limit is reached
+
+        if http_mode and owns_driver:
+            # The detail pages embed their data as JSON, so the browser is not needed from here on
+            driver.quit()
+            driver = None
+        extracted_data = scrape_property_details(links, driver, http_mode, concurrency, rate_per_host)
+
+        if extracted_data:  # Create a pandas DataFrame if data was extracted
+            df = pd.DataFrame([data.to_row() for data in extracted_data])
+            return df
+        else:
+            logging.info("No property details extracted.")
+            return None
+
+    except TimeoutException:
+        logging.error(f"Timed out waiting for elements after {timeout} seconds.")
+        return None
+    except Exception as e:
+        logging.exception(f"An error occurred: {e}")
+        return None
+    finally:
+        if owns_driver and driver is not None:
+            driver.quit()
+
+class MetrocuadradoSource:
+    """Source adapter for the scraper engine.
+
+    Args:
+        browsers: Number of headless Chrome instances shared by the jobs of a run.
+        http_mode: Fetch detail pages over plain HTTP instead of the browser.
+        concurrency: Number of detail pages fetched in parallel in http_mode.
+        rate_per_host: Requests per second allowed against the site in http_mode.
+        timeout: Timeout for Selenium waits.
+        http_timeout: Connect/read timeout in seconds of each detail request in http_mode.
+        seen_index: Optional SeenIndex. Listings whose card is unchanged since a fetch younger
+            than its TTL are carried forward from it instead of being fetched again.
+        http_cache: Optional HttpCache for the detail pages fetched in http_mode.
+        browser_profile: browser_pool.PROFILES entry the browsers are started with. The class
+            default is used if None.
+        in_page: Pick the fields of each detail payload inside the browser, see extract_property_details.
+            Off by default until it has been checked on more live pages than the saved fixture.
+    """
+
+    name = 'metrocuadrado'
+    base_url = 'https://www.metrocuadrado.com'
+    filename_template = 'listings_data_m2_{city}_{date}.csv'
+    # Cards and payloads are in the DOM, so 'lean' should do, but it has not been checked against the
+    # live site yet: stay on 'full' until a run with --browser-profile lean gives the same rows
+    browser_profile = 'full'
+
+    def __init__(self, browsers=1, http_mode=False, concurrency=4, rate_per_host=2.0, timeout=120, http_timeout=DEFAULT_TIMEOUT, seen_index=None, http_cache=None, browser_profile=None, in_page=False):
+        self.parallel_jobs = browsers  # One job per browser at a time
+        self.http_mode = http_mode
+        self.concurrency = concurrency
+        self.rate_per_host = rate_per_host
+        self.timeout = timeout
+        self.http_timeout = http_timeout
+        self.seen_index = seen_index
+        self.http_cache = http_cache
+        self.in_page = in_page
+        self.pool = BrowserPool(browsers, browser_profile or self.browser_profile)
+
+    def scrape(self, url_segment, city, archive=None, extraction_date=None):
+        """Scrapes one property type in one city.
+
+        Args:
+            url_segment: Property type segment of the metrocuadrado URL (e.g. "casa").
+            city: City segment of the metrocuadrado URL.
+            archive: Optional RawArchive the fetched payloads and carried forward rows are appended to.
+            extraction_date (str): Value of the "Extraction Date" column. Today if None.
+
+        Returns:
+            list: M2Listing records, empty if nothing could be extracted.
+        """
+        return [row for _, row in self.iter_rows(url_segment, city, archive, extraction_date=extraction_date)]
+
+    def iter_rows(self, url_segment, city, archive=None, skip=(), work_queue=None, extraction_date=None):
+        """Scrapes one property type in one city, yielding each row as soon as it is extracted.
+
+        Args:
+            url_segment: Property type segment of the metrocuadrado URL (e.g. "casa").
+            city: City segment of the metrocuadrado URL.
+            archive: Optional RawArchive the fetched payloads and carried forward rows are appended to.
+            skip: Links already processed (e.g. by an interrupted run), which are not fetched again.
+            work_queue: Optional WorkQueue of the job. Discovered links are stored in it, links without
+                details are marked done and failed fetches failed. If an earlier run walked every
+                result page, only the links it reports as due are fetched.
+            extraction_date (str): Value of the "Extraction Date" column, the same for every row of
+                the run. Today if None.
+
+        Yields:
+            tuple: (link, M2Listing) of each listing whose details could be extracted.
+        """
+        extraction_date = extraction_date or today()
+        url_main = f"{self.base_url}/{url_segment}/venta/{city}/"
+        resumed = None
+        if work_queue is not None and work_queue.discovered:
+            resumed = [(link, card_text_hash) for link, card_text_hash in work_queue.due() if link not in skip]
+            logging.info(f"Result pages of {url_main} already walked, fetching the {len(resumed)} links left")
+        if self.http_mode:
+            yield from self._scrape_overlapped(url_main, archive, skip, work_queue, resumed, extraction_date)
+            return
+        try:
+            with self.pool.browser() as driver:
+                # A single browser can either walk the result pages or open listings, not both at once
+                if resumed is None:
+                    cards = []
+                    complete = walk_result_pages(driver, url_main, cards.extend, self.timeout)
+                    cards = self._due_cards(cards, skip, work_queue)
+                    if work_queue is not None and complete:
+                        work_queue.finish_discovery()  # A rerun after a cut short walk walks the pages again
+                else:
+                    cards = resumed
+                carried, pending = self._carry_forward(cards, archive, extraction_date)
+                yield from carried
+                yield from self._fetch(pending, driver, archive, work_queue, extraction_date)
+        except TimeoutException:
+            logging.error(f"Timed out waiting for elements on {url_main} after {self.timeout} seconds.")
+
+    @staticmethod
+    def _due_cards(cards, skip, work_queue):
+        """Drops the skipped cards and, with a work queue, stores the others and keeps the ones due."""
+        cards = [card for card in cards if card[0] not in skip]
+        return work_queue.add(cards) if work_queue is not None else cards
+
+    def _scrape_overlapped(self, url_main, archive=None, skip=(), work_queue=None, resumed=None, extraction_date=None):
+        """Walks the result pages in a producer thread while the detail pages found so far are fetched over HTTP.
+
+        With `resumed` (the due cards of a job whose pages were already walked) no page is walked.
+        """
+        pages = queue.Queue()
+
+        def produce():
+            try:
+                with self.pool.browser() as driver:
+                    complete = walk_result_pages(driver, url_main, pages.put, self.timeout)
+                if work_queue is not None and complete:
+                    work_queue.finish_discovery()  # A rerun after a cut short walk walks the pages again
+            except TimeoutException:
+                logging.error(f"Timed out waiting for elements on {url_main} after {self.timeout} seconds.")
+            except Exception as e:
+                logging.exception(f"An error occurred while walking {url_main}: {e}")
+            finally:
+                pages.put(None)  # Tells the consumer there are no more pages
+
+        if resumed is None:
+            producer = threading.Thread(target=produce, name="result-pages")
+            producer.start()
+        else:
+            producer = None
+            pages.put(resumed)
+            pages.put(None)
+        session = create_session(pool_size=self.concurrency)
+        submitted = {}  # future -> (link, card hash)
+        with FetchScheduler(concurrency=self.concurrency, rate_per_host=self.rate_per_host) as scheduler:
+            while (cards := pages.get()) is not None:
+                if producer is not None:
+                    cards = self._due_cards(cards, skip, work_queue)
+                carried, pending = self._carry_forward(cards, archive, extraction_date)
+                yield from carried
+                for link, card_text_hash in pending.items():
+                    future = scheduler.submit(link, extract_property_details, None, link, self.http_timeout, session, archive, self.http_cache, True,
+                                              extraction_date=extraction_date)
+                    submitted[future] = (link, card_text_hash)
+                yield from self._finished(submitted, False, work_queue)  # Hand back what was fetched while the page loaded
+            if producer is not None:
+                producer.join()
+            yield from self._finished(submitted, True, work_queue)
+            logging.info(f"Fetch stats: {scheduler.stats()}")
+
+    def _finished(self, submitted, wait, work_queue=None):
+        """Yields (link, row) of the detail fetches done so far, or of all of them if wait, recording them in the seen index.
+
+        Links without details are marked done in the queue and failed fetches failed; the ones
+        yielded are left to the caller to mark done once their rows are saved.
+        """
+        futures = as_completed(list(submitted)) if wait else [future for future in list(submitted) if future.done()]
+        for future in futures:
+            link, card_text_hash = submitted.pop(future)
+            try:
+                data = future.result()
+            except FetchError as e:
+                if work_queue is not None:
+                    work_queue.mark_failed(link, e)
+                continue
+            if data:
+                if self.seen_index:
+                    self.seen_index.record(link, card_text_hash, data.to_row())
+                yield link, data
+            elif work_queue is not None:
+                work_queue.mark_done([link])
+
+    def _carry_forward(self, cards, archive=None, extraction_date=None):
+        """Splits the cards into (link, M2Listing) reused from the seen index and {link: card hash} still to fetch."""
+        rows, pending = [], {}
+        for link, card_text_hash in cards:
+            row = self.seen_index.lookup(link, card_text_hash) if self.seen_index else None
+            if row is not None:
+                row['Extraction Date'] = extraction_date or today()
+                rows.append((link, M2Listing.from_row(row)))
+                if archive:
+                    archive.append(link, row, kind='row')  # Nothing was fetched, keep the row so a reparse still lists it
+            else:
+                pending[link] = card_text_hash
+        if self.seen_index:
+            logging.info(f"Carried forward {len(rows)} unchanged listings, {len(pending)} to fetch")
+        return rows, pending
+
+    def _fetch(self, pending, driver, archive=None, work_queue=None, extraction_date=None):
+        """Fetches the details of the pending links with the browser, recording them in the seen index.
+
+        Yields:
+            tuple: (link, row) of each link whose details could be extracted.
+        """
+        for i, link in enumerate(pending):
+            logging.info(f"Extracting data from link {i+1}/{len(pending)}: {link}")
+            try:
+                data = extract_property_details(driver, link, archive=archive, raise_errors=True, in_page=self.in_page,
+                                                extraction_date=extraction_date)
+            except FetchError as e:
+                if work_queue is not None:
+                    work_queue.mark_failed(link, e)
+                continue
+            if data:
+                if self.seen_index:
+                    self.seen_index.record(link, pending[link], data.to_row())
+                yield link, data
+            elif work_queue is not None:
+                work_queue.mark_done([link])
+
+    def close(self):
+        self.pool.close()
+        if self.seen_index:
+            self.seen_index.close()
+        if self.http_cache:
+            logging.info(f"HTTP cache stats: {self.http_cache.stats()}")
+            self.http_cache.close()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Append-only archive of the raw responses of a run, and the offline "reparse" command.
+
+Every detail page a job fetches is appended as one JSON line to a gzip file per job,
+archive/<source>/<property type>/<city>_<date>.jsonl.gz, before it is parsed. Records hold the
+URL, the fetch time, the kind of payload and the payload itself:
+    json  the JSON embedded in a metrocuadrado detail page
+    html  the HTML of a lalonja listing page (with the link/code found on the results page)
+    row   a row carried forward from the seen index, for which nothing was fetched
+Opening an existing archive appends a new gzip member, which gzip readers see as one stream, so
+a rerun of the same job never rewrites what was already stored.
+
+"reparse" rebuilds the CSVs of a run from its archives with the current parsers, without any
+network access. Each archive is parsed in its own process.
+
+Usage:
+    python src/raw_archive.py reparse archive/ [archive/lalonja/Houses/all_2025-01-06.jsonl.gz ...]
+                                      [--output-dir data] [--workers N]
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from lalonja import parse_listing_page
+from metrocuadrado import parse_property_details
+from row_writer import write_rows
+
+DEFAULT_DIR = Path('archive')
+SUFFIX = '.jsonl.gz'
+
+def archive_path(archive_dir, source_name, property_type, city, date):
+    """Returns the archive file of one job; sources not split by city use "all" as the city."""
+    return Path(archive_dir) / source_name / property_type / f"{city or 'all'}_{date}{SUFFIX}"
+
+def parse_archive_path(path):
+    """Inverse of archive_path.
+
+    Returns:
+        tuple: (source name, property type, city or None, date).
+    """
+    path = Path(path)
+    city, date = path.name[:-len(SUFFIX)].rsplit('_', 1)
+    return path.parent.parent.name, path.parent.name, None if city == 'all' else city, date
+
+class RawArchive:
+    """Append-only gzip JSON-lines file of raw responses. Safe to share between threads.
+
+    Args:
+        path (str or Path): Archive file, created with its folders if missing.
+        flush_every (int): Records written between two flushes of the compressor, so that a
+            crashed run loses at most that many records.
+    """
+
+    def __init__(self, path, flush_every=50):
+        self.path = Path(path)
+        self.flush_every = flush_every
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._file = gzip.open(self.path, 'at', encoding='utf-8')
+        self._unflushed = 0
+
+    def append(self, url, payload, kind, info=None):
+        """Appends one raw response.
+
+        Args:
+            url (str): URL the payload was fetched from.
+            payload: JSON-serializable payload (dict for "json" and "row", str for "html").
+            kind (str): "json", "html" or "row", see the module docstring.
+            info (dict): Extra data the parser needs besides the payload.
+        """
+        record = {'url': url, 'fetched': datetime.now().isoformat(timespec='seconds'), 'kind': kind, 'payload': payload}
+        if info is not None:
+            record['info'] = info
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._unflushed += 1
+            if self._unflushed >= self.flush_every:
+                self._file.flush()
+                self._unflushed = 0
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+def read_archive(path):
+    """Yields the records of an archive, stopping quietly at a truncated tail left by a crashed run."""
+    with gzip.open(path, 'rt', encoding='utf-8') as file:
+        try:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    logging.warning(f"Skipping a truncated record in {path}")
+        except (EOFError, gzip.BadGzipFile) as e:
+            logging.warning(f"{path} ends early ({e}), using the records before it")
+
+def parse_record(record):
+    """Parses one archived record into a row with the current parsers, None if it yields no row."""
+    extraction_date = record['fetched'][:10]
+    if record['kind'] == 'json':
+        return parse_property_details(record['payload'], record['url'], extraction_date)
+    if record['kind'] == 'html':
+        return parse_listing_page(record['info'], record['payload'], extraction_date)
+    if record['kind'] == 'row':
+        return dict(record['payload'], **{'Extraction Date': extraction_date})
+    raise ValueError(f"Unknown record kind {record['kind']!r}")
+
+def reparse_file(path, output_dir='data'):
+    """Rebuilds the CSV of one archived job.
+
+    Rows follow the order the pages were fetched in, which can differ from the order of the
+    original CSV. A URL archived more than once (e.g. by a rerun) keeps its position of first
+    appearance and its latest payload.
+
+    Args:
+        path (str or Path): Archive file named as by archive_path.
+        output_dir (str or Path): Root of the data/<property type>/ folders.
+
+    Returns:
+        tuple: (CSV filename or None if no row could be parsed, number of rows).
+    """
+    from scraper_engine import SOURCES  # Imported here, the engine imports this module
+
+    source_name, property_type, city, date = parse_archive_path(path)
+    records = {}
+    for record in read_archive(path):
+        records[record['url']] = record
+    rows = [row for row in map(parse_record, records.values()) if row]
+    if not rows:
+        return None, 0
+    filename = Path(output_dir) / property_type / SOURCES[source_name].filename_template.format(city=city, date=date)
+    write_rows(rows, filename)
+    return str(filename), len(rows)
+
+def find_archives(paths):
+    """Expands folders to the archive files they contain, in a stable order."""
+    found = []
+    for path in map(Path, paths):
+        found.extend(sorted(path.rglob(f'*{SUFFIX}')) if path.is_dir() else [path])
+    return found
+
+def reparse(paths, output_dir='data', workers=None):
+    """Rebuilds the CSVs of the given archives (or folders of archives) in parallel processes.
+
+    Returns:
+        list: (CSV filename or None, number of rows) per archive.
+    """
+    archives = find_archives(paths)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(reparse_file, archives, [output_dir] * len(archives)))
+    for archive, (filename, count) in zip(archives, results):
+        if filename:
+            logging.info(f"{archive}: {count} rows written to {filename}")
+        else:
+            logging.warning(f"{archive}: no rows")
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    reparse_parser = commands.add_parser('reparse', help='rebuild CSVs from archives without network access')
+    reparse_parser.add_argument('paths', nargs='+', help='archive files or folders holding them')
+    reparse_parser.add_argument('--output-dir', default='data', help='root of the data/<property type>/ folders')
+    reparse_parser.add_argument('--workers', type=int, default=os.cpu_count(), help='parallel processes')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    results = reparse(args.paths, args.output_dir, args.workers)
+    return 0 if results and any(filename for filename, _ in results) else 1
+
+if __name__ == '__main__':
+    raise SystemExit(main())
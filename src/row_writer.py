@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Crash-safe CSV output of the scrapers.
+
+Rows are appended to the job's CSV as they are produced instead of being collected for a
+DataFrame at the end, so memory stays flat and a crash only loses the rows not yet synced. A
+checkpoint per CSV, under .scraper_cache/checkpoints, lists the links whose rows were written;
+both files are fsynced every few rows, the checkpoint after the rows it lists. Reopening the CSV
+resumes it: a truncated last line is cut off, and the links in the checkpoint (or in the CSV's
+link column) are reported as processed so the job can skip them.
+"""
+
+import csv
+import logging
+import os
+import time
+from pathlib import Path
+
+from listing_record import ListingRecord
+
+CHECKPOINT_DIR = Path('.scraper_cache/checkpoints')
+
+def checkpoint_path(filename, checkpoint_dir=CHECKPOINT_DIR):
+    """Returns the checkpoint file of a CSV; kept out of data/ so it is never committed with it."""
+    filename = Path(filename)
+    return Path(checkpoint_dir) / filename.parent.name / (filename.name + '.links')
+
+def prune_checkpoints(checkpoint_dir=CHECKPOINT_DIR, max_age_days=7):
+    """Deletes the checkpoints not written to for max_age_days; their runs are not resumed anymore."""
+    cutoff = time.time() - max_age_days * 86400
+    for path in Path(checkpoint_dir).glob('*/*.links'):
+        if path.stat().st_mtime < cutoff:
+            path.unlink()
+
+def _drop_partial_line(filename, chunk_size=65536):
+    """Truncates a file after its last newline, removing a row cut off by a crash."""
+    with open(filename, 'rb+') as file:
+        end = file.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            position = max(0, position - chunk_size)
+            file.seek(position)
+            newline = file.read(min(chunk_size, end - position)).rfind(b'\n')
+            if newline >= 0:
+                position += newline + 1
+                break
+        if position < end:
+            logging.warning(f"Dropping a truncated row at the end of {filename}")
+            file.truncate(position)
+
+class RowWriter:
+    """Appends rows (dicts or listing records) to a CSV file, resuming it if it exists.
+
+    The columns are the ones of the existing file, or the keys (record columns) of the first row
+    written. Records whose columns match the file are written as plain value tuples, without
+    building a dict per row. The file is only created once a row is written.
+
+    Args:
+        filename (str or Path): Output CSV.
+        resume (bool): Continue an existing file and its checkpoint. Both are overwritten if False.
+        fsync_every (int): Rows written between two fsyncs of the CSV and its checkpoint.
+        checkpoint_dir (str or Path): Folder of the checkpoints; None writes no checkpoint.
+        on_sync: Optional function called with the links of the rows each sync made durable,
+            e.g. WorkQueue.mark_done.
+    """
+
+    def __init__(self, filename, resume=True, fsync_every=50, checkpoint_dir=CHECKPOINT_DIR, on_sync=None):
+        self.filename = Path(filename)
+        self.fsync_every = fsync_every
+        self.on_sync = on_sync
+        self.checkpoint = checkpoint_path(filename, checkpoint_dir) if checkpoint_dir else None
+        self.processed = set()  # Links whose rows are already in the file
+        self.fieldnames = None
+        self.rows_written = 0
+        self._file = self._writer = self._values_writer = self._checkpoint_file = None
+        self._record_types = {}  # Record type -> whether its columns are the file's, in order
+        self._unsynced = 0
+        self._unsynced_links = []
+        if resume:
+            self._resume()
+        else:
+            for path in (self.filename, self.checkpoint):
+                if path and path.exists():
+                    path.unlink()
+
+    def _resume(self):
+        if self.filename.exists():
+            _drop_partial_line(self.filename)
+            with open(self.filename, newline='', encoding='utf-8') as file:
+                reader = csv.DictReader(file)
+                self.fieldnames = reader.fieldnames
+                for row in reader:
+                    self.processed.add(row.get('link'))
+        if self.checkpoint and self.checkpoint.exists():
+            self.processed.update(self.checkpoint.read_text(encoding='utf-8').splitlines())
+        self.processed.discard(None)
+        if self.processed:
+            logging.info(f"Resuming {self.filename}: {len(self.processed)} links already processed")
+
+    def _open(self, row):
+        self.filename.parent.mkdir(parents=True, exist_ok=True)
+        new_file = self.fieldnames is None
+        if new_file:
+            self.fieldnames = list(row.columns() if isinstance(row, ListingRecord) else row)
+        self._file = open(self.filename, 'a', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames, extrasaction='ignore')
+        self._values_writer = csv.writer(self._file)
+        if new_file:
+            self._writer.writeheader()
+        if self.checkpoint:
+            self.checkpoint.parent.mkdir(parents=True, exist_ok=True)
+            self._checkpoint_file = open(self.checkpoint, 'a', encoding='utf-8')
+
+    def write(self, row, link=None):
+        """Appends a row.
+
+        Args:
+            row (dict or ListingRecord): The row.
+            link (str): URL the row was fetched from, recorded in the checkpoint. The row's link if None.
+        """
+        if self._file is None:
+            self._open(row)
+        if isinstance(row, ListingRecord):
+            record_type = type(row)
+            if record_type not in self._record_types:
+                self._record_types[record_type] = tuple(self.fieldnames) == record_type.columns()
+            if self._record_types[record_type]:
+                self._values_writer.writerow(row.values())
+            else:
+                self._writer.writerow(row.to_row())  # Older file with other columns, map them by name
+            link = link or row.link
+        else:
+            self._writer.writerow(row)
+            link = link or row.get('link')
+        self.processed.add(link)
+        self.rows_written += 1
+        if link:
+            self._unsynced_links.append(link)
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every:
+            self.sync()
+
+    def sync(self):
+        """Forces the rows written so far to disk, then adds their links to the checkpoint.
+
+        A link is only checkpointed once its row is durable, so a crash can never skip a row on
+        resume; rows synced but not checkpointed yet are still found through the link column.
+        """
+        if self._file:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        if self._checkpoint_file and self._unsynced_links:
+            self._checkpoint_file.write(''.join(link + '\n' for link in self._unsynced_links))
+            self._checkpoint_file.flush()
+            os.fsync(self._checkpoint_file.fileno())
+        if self.on_sync and self._unsynced_links:
+            self.on_sync(self._unsynced_links)
+        self._unsynced_links = []
+        self._unsynced = 0
+
+    def close(self):
+        if self._file:
+            self.sync()
+            self._file.close()
+        if self._checkpoint_file:
+            self._checkpoint_file.close()
+        self._file = self._writer = self._values_writer = self._checkpoint_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def write_rows(rows, filename):
+    """Saves rows (dicts or listing records) to a new CSV file, columns in the order of the first row's."""
+    with RowWriter(filename, resume=False, checkpoint_dir=None) as writer:
+        for row in rows:
+            writer.write(row)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Registry of the header layouts (schemas) of the data/ CSVs.
+
+The ~17k daily CSVs share a handful of headers: the lalonja `link,code,Precio,...` one and the
+metrocuadrado `propertyId,propertyType,salePrice,...` one. Each distinct header is stored once
+under a fingerprint, and every file is mapped to its schema id, keyed by path, mtime and size, so
+an unchanged file never has its header read again. All the files are written by the scrapers
+with the csv module defaults, so no dialect sniffing is needed.
+
+column_mapping precomputes, once per schema, where each column of a unified layout sits in the
+schema's rows, so rows are remapped by index instead of through a dict per row.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+DEFAULT_PATH = Path('.scraper_cache/csv_schemas.sqlite')
+
+def fingerprint(header):
+    """Returns the schema id of a header (list of column names)."""
+    return hashlib.sha1('\x1f'.join(header).encode('utf-8')).hexdigest()[:16]
+
+def file_key(csv_file):
+    """Returns the (mtime in ns, size) a file's cached schema is valid for."""
+    stat = os.stat(csv_file)
+    return stat.st_mtime_ns, stat.st_size
+
+def column_mapping(header, columns):
+    """Returns, for each column of `columns`, its index in rows with `header`, or len(header) if absent.
+
+    Rows padded with one empty value (see remap) then yield '' for the absent columns.
+    """
+    index = {column: i for i, column in enumerate(header)}
+    return tuple(index.get(column, len(header)) for column in columns)
+
+def remap(row, mapping, width):
+    """Returns the values of a row (list) of a `width`-column schema in the order given by column_mapping.
+
+    Short rows are padded and extra values ignored, as csv.DictReader does.
+    """
+    if len(row) != width:
+        row = (row + [''] * width)[:width]
+    row.append('')
+    return [row[i] for i in mapping]
+
+class SchemaRegistry:
+    """SQLite-backed map of file -> schema id and schema id -> header. Safe to share between threads.
+
+    The whole registry is loaded in memory when opened; it holds one small row per file.
+
+    Args:
+        path (str or Path): Database file, created if missing.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.executescript(
+            'CREATE TABLE IF NOT EXISTS schemas (schema_id TEXT PRIMARY KEY, columns TEXT NOT NULL);'
+            'CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, '
+            'schema_id TEXT NOT NULL);'
+        )
+        self._schemas = {schema_id: json.loads(columns) for schema_id, columns in self._connection.execute('SELECT schema_id, columns FROM schemas')}
+        self._files = {path: ((mtime_ns, size), schema_id) for path, mtime_ns, size, schema_id in self._connection.execute('SELECT * FROM files')}
+        self.hits = 0  # Files whose schema was known
+        self.misses = 0  # Files whose header had to be read
+
+    def cached(self, csv_file, key):
+        """Returns the schema id of a file if it is known for its current `key` (see file_key), else None."""
+        with self._lock:
+            found = self._files.get(str(csv_file))
+            if found is not None and found[0] == tuple(key):
+                self.hits += 1
+                return found[1]
+            self.misses += 1
+            return None
+
+    def add(self, entries):
+        """Records the headers read from files.
+
+        Args:
+            entries: (path, key, header) tuples, key as returned by file_key before the header was read.
+
+        Returns:
+            list: Schema id of each entry.
+        """
+        schema_ids, new_schemas, files = [], [], []
+        with self._lock:
+            for csv_file, key, header in entries:
+                schema_id = fingerprint(header)
+                if schema_id not in self._schemas:
+                    self._schemas[schema_id] = list(header)
+                    new_schemas.append((schema_id, json.dumps(list(header), ensure_ascii=False)))
+                self._files[str(csv_file)] = (tuple(key), schema_id)
+                files.append((str(csv_file), *key, schema_id))
+                schema_ids.append(schema_id)
+            self._connection.executemany('INSERT OR REPLACE INTO schemas VALUES (?, ?)', new_schemas)
+            self._connection.executemany('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)', files)
+            self._connection.commit()
+        return schema_ids
+
+    def columns(self, schema_id):
+        """Returns the header of a schema."""
+        with self._lock:
+            return self._schemas[schema_id]
+
+    def stats(self):
+        """Returns the hit/miss counts of this run and the number of schemas and files known."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'schemas': len(self._schemas), 'files': len(self._files)}
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
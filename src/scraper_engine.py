@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Single scraping engine for every source, property type and city.
+
+What to scrape is declared in PROPERTY_TYPES and CITIES; how to scrape it lives in the source
+adapters (metrocuadrado JSON, lalonja HTML). One run opens a source once (browser pool or HTTP
+session) and pushes every requested property type/city job through it, writing one CSV per job
+in the same data/<folder>/ layout the per-type scripts always used.
+
+Usage:
+    python src/scraper_engine.py metrocuadrado [--types Apartments Houses ...] [--cities medellin ...]
+                                               [--browsers N] [--browser-profile P] [--in-page] [--http] [--concurrency N] [--rate R]
+                                               [--http-timeout S] [--parser P] [--seen-ttl DAYS] [--seen-index FILE]
+                                               [--archive-dir DIR | --no-archive] [--http-cache FILE] [--http-cache-size MB]
+                                               [--restart] [--queue FILE]
+    python src/scraper_engine.py lalonja [--types Apartments Houses] [--concurrency N] [--rate R] [--http-timeout S]
+                                         [--parser P] [--archive-dir DIR | --no-archive] [--http-cache FILE]
+                                         [--http-cache-size MB] [--restart] [--queue FILE]
+
+Rows are written to the CSVs as they are scraped, and rerunning an interrupted run on the same
+date resumes it (see row_writer.py and work_queue.py) unless --restart is given: only the links
+left pending or failed are fetched. The exit code is 1 if a job produced no data, 2 if every job
+saved rows but some links are left for a rerun, 0 otherwise. The raw detail pages of every job
+are archived under --archive-dir; see raw_archive.py to rebuild the CSVs from them offline.
+"""
+
+import argparse
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from lalonja import LalonjaSource
+from metrocuadrado import MetrocuadradoSource
+from seen_index import DEFAULT_PATH, SeenIndex
+from http_client import DEFAULT_TIMEOUT
+from browser_pool import PROFILES as BROWSER_PROFILES
+from html_parsing import DEFAULT_PARSER, PARSERS, set_parser
+from http_cache import DEFAULT_MAX_BYTES, DEFAULT_PATH as HTTP_CACHE_PATH, HttpCache
+from raw_archive import DEFAULT_DIR as ARCHIVE_DIR, RawArchive, archive_path
+from row_writer import RowWriter, prune_checkpoints
+from work_queue import DEFAULT_PATH as QUEUE_PATH, WorkQueue, job_key, prune_jobs
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Property type (= output folder under data/) -> URL segment used by each source that lists it
+PROPERTY_TYPES = {
+    'Apartments': {'metrocuadrado': 'apartaestudio-apartamento', 'lalonja': 'clases_Apartamento'},
+    'Houses': {'metrocuadrado': 'casa', 'lalonja': 'clases_Casa'},
+    'Offices': {'metrocuadrado': 'oficina'},
+}
+
+# Cities each source is scraped for. None means the source is not split by city.
+CITIES = {
+    'metrocuadrado': ['bogota', 'medellin', 'la-estrella', 'caldas', 'sabaneta', 'envigado', 'itagui',
+                      'bello', 'copacabana', 'girardota', 'barbosa'],
+    'lalonja': [None],
+}
+
+SOURCES = {
+    'metrocuadrado': MetrocuadradoSource,
+    'lalonja': LalonjaSource,
+}
+
+def plan_jobs(source_name, property_types=None, cities=None):
+    """Lists the (property type, URL segment, city) jobs of a run.
+
+    Args:
+        source_name (str): Key of SOURCES.
+        property_types (list): Property types to scrape. All the ones the source lists if None.
+        cities (list): Cities to scrape. All of CITIES[source_name] if None; ignored for sources not split by city.
+
+    Returns:
+        list: (property_type, url_segment, city) tuples.
+    """
+    property_types = property_types or [name for name, segments in PROPERTY_TYPES.items() if source_name in segments]
+    if CITIES[source_name] == [None]:
+        cities = [None]
+    jobs = []
+    for property_type in property_types:
+        url_segment = PROPERTY_TYPES[property_type].get(source_name)
+        if url_segment is None:
+            logging.warning(f"{source_name} does not list {property_type}, skipping it")
+            continue
+        for city in cities or CITIES[source_name]:
+            jobs.append((property_type, url_segment, city))
+    return jobs
+
+def run(source, jobs, extraction_date=None, archive_dir=None, resume=True, queue_path=None):
+    """Runs the jobs through an opened source and saves one CSV per job.
+
+    Rows are appended to the job's CSV as the source produces them. With resume, a CSV left by
+    an interrupted run of the same date is continued and the listings already in it are skipped.
+    With a work queue, a rerun of a job whose result pages were all walked only fetches the links
+    left pending or failed, instead of walking the pages again.
+
+    Args:
+        source: Source adapter instance (e.g. MetrocuadradoSource).
+        jobs (list): (property_type, url_segment, city) tuples from plan_jobs.
+        extraction_date (str): Date used in the filenames and the "Extraction Date" column. Today if None.
+        archive_dir (str or Path): Folder the raw responses of each job are archived in. Not archived if None.
+        resume (bool): Continue the CSVs of interrupted runs instead of starting them over.
+        queue_path (str or Path): Database of the work queue. The jobs are not queued if None.
+
+    Returns:
+        list: (saved filename or None if the job produced no data, failed links to retry) per job.
+    """
+    extraction_date = extraction_date or datetime.now().strftime("%Y-%m-%d")
+
+    def run_job(job):
+        property_type, url_segment, city = job
+        logging.info(f"Scraping {source.name} {property_type}" + (f" in {city}" if city else ""))
+        filename = f"data/{property_type}/" + source.filename_template.format(city=city, date=extraction_date)
+        archive = RawArchive(archive_path(archive_dir, source.name, property_type, city, extraction_date)) if archive_dir else None
+        work_queue = WorkQueue(job_key(source.name, property_type, city, extraction_date), queue_path) if queue_path else None
+        if work_queue and not resume:
+            work_queue.reset()
+        writer = RowWriter(filename, resume=resume, on_sync=work_queue.mark_done if work_queue else None)
+        left = 0
+        try:
+            for link, row in source.iter_rows(url_segment, city, archive, skip=writer.processed, work_queue=work_queue,
+                                              extraction_date=extraction_date):
+                writer.write(row, link)
+        finally:
+            writer.close()
+            if archive:
+                archive.close()
+            if work_queue:
+                counts = work_queue.counts()
+                left = counts['pending'] + counts['retryable']
+                logging.info(f"Links of {work_queue.job}: {counts}")
+                work_queue.close()
+        if not writer.rows_written and not writer.processed:
+            logging.info(f"No data extracted for {source.name} {property_type} {city or ''}")
+            return None, left
+        logging.info(f"{writer.rows_written} rows saved to {filename}")
+        return filename, left
+
+    with ThreadPoolExecutor(max_workers=source.parallel_jobs) as executor:
+        return list(executor.map(run_job, jobs))
+
+def create_source(args):
+    """Instantiates the source adapter selected on the command line."""
+    uses_http = args.source != 'metrocuadrado' or args.http  # The browser path cannot send conditional requests
+    http_cache = HttpCache(args.http_cache, max_bytes=int(args.http_cache_size * 1024 * 1024)) if args.http_cache_size > 0 and uses_http else None
+    if args.source == 'metrocuadrado':
+        seen_index = SeenIndex(args.seen_index, ttl_days=args.seen_ttl) if args.seen_ttl > 0 else None
+        return MetrocuadradoSource(browsers=args.browsers, http_mode=args.http, concurrency=args.concurrency,
+                                   rate_per_host=args.rate or 2.0, http_timeout=args.http_timeout, seen_index=seen_index,
+                                   http_cache=http_cache, browser_profile=args.browser_profile, in_page=args.in_page)
+    return LalonjaSource(concurrency=args.concurrency, rate_per_host=args.rate or 1.0, timeout=args.http_timeout,
+                         http_cache=http_cache)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('source', choices=list(SOURCES))
+    parser.add_argument('--types', nargs='+', choices=list(PROPERTY_TYPES), help='property types (default: all the source lists)')
+    parser.add_argument('--cities', nargs='+', help='cities (default: all of CITIES for the source)')
+    parser.add_argument('--browsers', type=int, default=1, help='headless Chrome instances shared by the jobs (metrocuadrado)')
+    parser.add_argument('--http', action='store_true', help='fetch metrocuadrado detail pages without the browser')
+    parser.add_argument('--browser-profile', choices=list(BROWSER_PROFILES),
+                        help="what headless Chrome loads, see browser_pool.PROFILES (default: the source's own)")
+    parser.add_argument('--in-page', action='store_true',
+                        help='pick the metrocuadrado payload fields inside the browser instead of decoding the whole payload script in Python')
+    parser.add_argument('--concurrency', type=int, default=4, help='pages fetched in parallel over HTTP')
+    parser.add_argument('--rate', type=float, help='requests per second per host (default: 2 for metrocuadrado, 1 for lalonja)')
+    parser.add_argument('--http-timeout', type=float, default=DEFAULT_TIMEOUT[1], help='seconds to wait for each HTTP response')
+    parser.add_argument('--parser', choices=PARSERS, default=DEFAULT_PARSER, help='HTML parser backend')
+    parser.add_argument('--seen-ttl', type=int, default=7,
+                        help='days an unchanged listing is carried forward without a detail fetch, 0 disables it (metrocuadrado)')
+    parser.add_argument('--seen-index', default=DEFAULT_PATH, help='file of the seen listings index')
+    parser.add_argument('--http-cache', default=HTTP_CACHE_PATH, help='file of the conditional GET cache (lalonja, metrocuadrado --http)')
+    parser.add_argument('--http-cache-size', type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024),
+                        help='MB of parsed results the conditional GET cache keeps, 0 disables it')
+    parser.add_argument('--restart', action='store_true', help='overwrite the CSVs of interrupted runs of the same date instead of resuming them')
+    parser.add_argument('--queue', default=QUEUE_PATH, help='file of the work queue tracking the links of each job')
+    archiving = parser.add_mutually_exclusive_group()
+    archiving.add_argument('--archive-dir', default=ARCHIVE_DIR, help='folder the raw detail pages are archived in')
+    archiving.add_argument('--no-archive', dest='archive_dir', action='store_const', const=None, help='do not archive the raw detail pages')
+    args = parser.parse_args(argv)
+    set_parser(args.parser)
+
+    prune_checkpoints()
+    prune_jobs(args.queue)
+    jobs = plan_jobs(args.source, args.types, args.cities)
+    source = create_source(args)
+    try:
+        results = run(source, jobs, archive_dir=args.archive_dir, resume=not args.restart, queue_path=args.queue)
+    finally:
+        source.close()
+
+    names = [' '.join(filter(None, (property_type, city))) for property_type, _, city in jobs]
+    failed = [name for name, (filename, _) in zip(names, results) if filename is None]
+    unfinished = [f"{name} ({left} links)" for name, (filename, left) in zip(names, results) if filename and left]
+    logging.info(f"Finished {len(jobs) - len(failed)}/{len(jobs)} jobs")
+    if failed:
+        logging.error(f"Could not retrieve data for: {', '.join(failed)}")
+    if unfinished:
+        logging.warning(f"Links left to retry in a rerun: {', '.join(unfinished)}")
+    if failed:
+        return 1
+    return 2 if unfinished else 0  # 2 still saved rows; a rerun fetches only what is left
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Local index of the listings already scraped, used to skip unchanged detail pages.
+
+Each listing is stored under its link with the date of its last detail fetch, a hash of the data
+shown on its results-page card (price, area, ...) and the row extracted back then. While the card
+hash is unchanged and the fetch is younger than the TTL, the stored row is carried forward
+instead of downloading the detail page again.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+from datetime import date, timedelta
+from pathlib import Path
+
+DEFAULT_PATH = Path('.scraper_cache/seen_listings.sqlite')
+
+def card_hash(card_text):
+    """Returns a short stable hash of the text shown on a listing card."""
+    normalized = ' '.join(card_text.split())  # Layout whitespace does not count as a change
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+class SeenIndex:
+    """SQLite-backed map of link -> (last fetch date, card hash, row). Safe to share between threads.
+
+    Args:
+        path (str or Path): Database file, created if missing.
+        ttl_days (int): How long a fetched row may be carried forward without a new detail fetch.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, ttl_days=7):
+        self.path = Path(path)
+        self.ttl_days = ttl_days
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS listings ('
+            'link TEXT PRIMARY KEY, card_hash TEXT NOT NULL, last_fetched TEXT NOT NULL, row TEXT NOT NULL)'
+        )
+        self._connection.commit()
+
+    def lookup(self, link, card_hash, today=None):
+        """Returns the stored row of a listing if it can be carried forward, None if it must be fetched.
+
+        Args:
+            link (str): Listing link.
+            card_hash (str): Hash of the listing card as seen today.
+            today (date): Reference date for the TTL. Today if None.
+        """
+        today = today or date.today()
+        with self._lock:
+            found = self._connection.execute(
+                'SELECT card_hash, last_fetched, row FROM listings WHERE link = ?', (link,)
+            ).fetchone()
+        if found is None:
+            return None
+        stored_hash, last_fetched, row = found
+        if stored_hash != card_hash or date.fromisoformat(last_fetched) < today - timedelta(days=self.ttl_days):
+            return None
+        return json.loads(row)
+
+    def record(self, link, card_hash, row, today=None):
+        """Stores the row fetched today for a listing."""
+        today = today or date.today()
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO listings (link, card_hash, last_fetched, row) VALUES (?, ?, ?, ?)',
+                (link, card_hash, today.isoformat(), json.dumps(row, ensure_ascii=False)),
+            )
+            self._connection.commit()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
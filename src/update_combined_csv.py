@@ -1,73 +1,104 @@
 #!/usr/bin/env python3
 """
-Script to update the combined CSV file by appending new CSV files from the data/ subdirectories.
-Keeps track of processed files to avoid reprocessing.
+Script to update the combined listings with the new CSV files from the data/ subdirectories.
+
+The combined listings are kept in an append-only store of one compressed segment per property
+type and extraction date, plus a manifest of the files each segment was built from (see
+listing_store.py); it replaces the single data/combined_listings.csv. Only the segments of the
+dates with new files are written, so each update costs what the new data costs. The manifest
+also keeps track of the processed files, so files are never reprocessed; a missing store is built
+from every file.
+
+The files are read by worker processes (see csv_ingest.py) and their rows are normalized to the
+columns of the store, missing propertyType values inferred from the source folder, so
+metrocuadrado and lalonja rows line up whatever the header of each file. Headers are cached in the
+schema registry (see schema_registry.py).
+
+The rows of the new files are also appended, typed, to the Parquet dataset read by the analyses
+(see listing_dataset.py); a missing dataset is built from every processed file. This is the only
+writer of the dataset. It is not committed: the weekly workflow builds it and publishes it as an
+artifact. Skipped if pyarrow is missing or --no-parquet is given.
+
+Usage:
+    python src/update_combined_csv.py [--workers N] [--schema-cache FILE | --no-schema-cache]
+                                      [--store-dir DIR] [--parquet-dir DIR | --no-parquet]
 """
 
-import os
-import csv
+import argparse
 from pathlib import Path
 
-def update_combined_csv():
-    data_dir = Path('data')
-    combined_file = Path('data/combined_listings.csv')
-    processed_file = Path('data/processed_files.txt')
-    
-    # Read processed files list
-    processed = set()
-    if processed_file.exists():
-        with open(processed_file, 'r') as f:
-            for line in f:
-                processed.add(line.strip())
-    
+import listing_dataset
+from csv_ingest import CsvTreeReader, data_files
+from listing_store import DEFAULT_DIR as STORE_DIR, ListingStore, segment_of
+from schema_registry import DEFAULT_PATH as SCHEMA_CACHE_PATH, SchemaRegistry
+
+def update_combined_csv(data_dir='data', workers=None, schema_cache=SCHEMA_CACHE_PATH, store_dir=None, parquet=True,
+                        parquet_dir=None):
+    data_dir = Path(data_dir)
+    store = ListingStore(store_dir or data_dir / STORE_DIR.name)
+    parquet_dir = Path(parquet_dir or data_dir / listing_dataset.DEFAULT_DIR.name)
+    if parquet and listing_dataset.pa is None:
+        print("pyarrow is not installed, Parquet dataset not updated")
+        parquet = False
+
+    # Files already in a segment of the store
+    processed = store.processed_files()
+
     # Find all CSV files in data/ subdirectories
-    csv_files = list(data_dir.glob('*/*.csv'))
+    csv_files = data_files(data_dir)
     print(f"Found {len(csv_files)} CSV files in total")
-    
-    new_files = []
-    for csv_file in csv_files:
-        # Get the relative path from data_dir
-        rel_path = csv_file.relative_to(data_dir)
-        if str(rel_path) not in processed:
-            new_files.append((csv_file, rel_path))
-    
+
+    # Get the relative path from data_dir
+    new_files = [csv_file for csv_file in csv_files if str(csv_file.relative_to(data_dir)) not in processed]
+
     print(f"Found {len(new_files)} new CSV files to process")
-    
+
+    if parquet and not parquet_dir.exists():
+        # Build the dataset from the files already in the store, the new ones are appended below
+        done = [csv_file for csv_file in csv_files if str(csv_file.relative_to(data_dir)) in processed]
+        print(f"Building the Parquet dataset {parquet_dir} from {len(done)} processed files")
+        listing_dataset.write_dataset(done, parquet_dir, workers=workers)
+
     if not new_files:
         print("No new files to process.")
         return
-    
-    # Process each new file
-    for csv_file, rel_path in new_files:
-        print(f"Processing {rel_path}")
-        # Determine if we need to write header
-        write_header = not combined_file.exists()
-        
-        # Open the combined file in append mode
-        with open(combined_file, 'a', newline='', encoding='utf-8') as outfile:
-            # Read the new CSV file
-            with open(csv_file, 'r', encoding='utf-8') as infile:
-                reader = csv.reader(infile)
-                header = next(reader)  # read the header
-                if write_header:
-                    # Write the header to the combined file
-                    writer = csv.writer(outfile)
-                    writer.writerow(header)
-                # Write the rest of the rows
-                writer = csv.writer(outfile)
-                for row in reader:
-                    writer.writerow(row)
-        
-        # Mark this file as processed
-        processed.add(str(rel_path))
-    
-    # Update the processed files list
-    with open(processed_file, 'w') as f:
-        for rel_path in sorted(processed):
-            f.write(rel_path + '\n')
-    
-    print(f"Updated combined CSV: {combined_file}")
-    print(f"Updated processed files list: {processed_file}")
+
+    registry = SchemaRegistry(schema_cache) if schema_cache else None
+    try:
+        with CsvTreeReader(workers, registry=registry) as reader:
+            report = store.add_files(reader, new_files, data_dir)
+
+        new = set(new_files)
+        appended = []  # New files now in the store, for the Parquet dataset
+        for csv_file, rows, error in report:
+            rel_path = csv_file.relative_to(data_dir)
+            if error:
+                print(f"Error reading {rel_path}, left for the next update: {error}")
+            elif csv_file in new:
+                print(f"Processed {rel_path}: {rows} rows")
+                appended.append(csv_file)
+        segments = {segment_of(csv_file) for csv_file in new_files} - {None}
+        print(f"Updated {len(segments)} segments of {store.root}")
+
+        # After the store is settled; a failed append is repaired by rebuilding with listing_dataset.py
+        if parquet and appended:
+            listing_dataset.write_dataset(appended, parquet_dir, workers=workers, registry=registry, append=True)
+            print(f"Appended {len(appended)} files to the Parquet dataset {parquet_dir}")
+    finally:
+        if registry:
+            registry.close()
 
 if __name__ == '__main__':
-    update_combined_csv()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, help='worker processes reading the new files (default: one per core)')
+    schema_cache = parser.add_mutually_exclusive_group()
+    schema_cache.add_argument('--schema-cache', default=SCHEMA_CACHE_PATH, help='file of the header schema registry')
+    schema_cache.add_argument('--no-schema-cache', dest='schema_cache', action='store_const', const=None,
+                              help='read the header of every new file')
+    parser.add_argument('--store-dir', help=f'directory of the segment store (default: data/{STORE_DIR.name})')
+    parquet = parser.add_mutually_exclusive_group()
+    parquet.add_argument('--parquet-dir', help='root of the Parquet dataset (default: data/combined_listings_parquet)')
+    parquet.add_argument('--no-parquet', dest='parquet', action='store_false', help='only update the segment store')
+    args = parser.parse_args()
+    update_combined_csv(workers=args.workers, schema_cache=args.schema_cache, store_dir=args.store_dir,
+                        parquet=args.parquet, parquet_dir=args.parquet_dir)
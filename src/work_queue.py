@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Persistent work queue of the listing links of each scrape job.
+
+A job (source, property type, city, extraction date) stores every link it discovers on the
+result pages with a status: pending until it is processed, done once its row is safely written
+(or the page turned out to hold no usable row), failed when it could not be fetched. Failed links
+are retried with exponential backoff, up to a maximum number of attempts, when the failure may be
+transient (timeout, network error, throttling, 5xx). A link answering a permanent error (404, 410
+or another 4xx) is gone: it is never retried and does not leave the job unfinished.
+
+Once a job has walked all of its result pages, a rerun of the same job does not walk them again:
+it only processes the links still pending and the failed ones whose backoff has elapsed.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_PATH = Path('.scraper_cache/work_queue.sqlite')
+
+PENDING, DONE, FAILED, GONE = 'pending', 'done', 'failed', 'gone'
+
+def job_key(source_name, property_type, city, date):
+    """Returns the identifier of a job in the queue."""
+    return f"{source_name}/{property_type}/{city or 'all'}/{date}"
+
+class WorkQueue:
+    """SQLite-backed list of the links of one job and their status. Safe to share between threads.
+
+    Args:
+        job (str): Job identifier, see job_key.
+        path (str or Path): Database file, created if missing. Several jobs can share it.
+        retry_base (float): Seconds to wait before the first retry of a failed link, doubled on every further failure.
+        max_attempts (int): Failed fetches after which a link is given up.
+    """
+
+    def __init__(self, job, path=DEFAULT_PATH, retry_base=60, max_attempts=5):
+        self.job = job
+        self.path = Path(path)
+        self.retry_base = retry_base
+        self.max_attempts = max_attempts
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)  # Parallel jobs share the file
+        self._connection.executescript(
+            'CREATE TABLE IF NOT EXISTS jobs (job TEXT PRIMARY KEY, discovered INTEGER NOT NULL DEFAULT 0, created REAL NOT NULL);'
+            'CREATE TABLE IF NOT EXISTS links ('
+            'job TEXT NOT NULL, link TEXT NOT NULL, info TEXT, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, '
+            'next_attempt REAL NOT NULL DEFAULT 0, error TEXT, PRIMARY KEY (job, link));'
+        )
+        self._connection.execute('INSERT OR IGNORE INTO jobs (job, created) VALUES (?, ?)', (job, time.time()))
+        self._connection.commit()
+
+    @property
+    def discovered(self):
+        """True once every result page of the job has been walked."""
+        with self._lock:
+            return bool(self._connection.execute('SELECT discovered FROM jobs WHERE job = ?', (self.job,)).fetchone()[0])
+
+    def finish_discovery(self):
+        """Records that every result page was walked, so reruns only process the stored links."""
+        with self._lock:
+            self._connection.execute('UPDATE jobs SET discovered = 1 WHERE job = ?', (self.job,))
+            self._connection.commit()
+
+    def add(self, items):
+        """Stores newly discovered links and returns the ones to process now.
+
+        Args:
+            items: (link, info) pairs; info is any JSON-serializable data the source needs to
+                fetch the link later (e.g. the card hash or the listing code).
+
+        Returns:
+            list: The (link, info) pairs that are pending, or failed with their backoff elapsed.
+                Links already done, waiting for a retry or given up are left out.
+        """
+        items = list(items)
+        with self._lock:
+            self._connection.executemany(
+                'INSERT OR IGNORE INTO links (job, link, info, status) VALUES (?, ?, ?, ?)',
+                [(self.job, link, json.dumps(info, ensure_ascii=False), PENDING) for link, info in items],
+            )
+            self._connection.commit()
+            due = {link for link, in self._connection.execute(*self._due_query())}
+        return [(link, info) for link, info in items if link in due]
+
+    def due(self):
+        """Returns the (link, info) pairs of the stored links to process now, see add()."""
+        with self._lock:
+            found = self._connection.execute(*self._due_query('link, info')).fetchall()
+        return [(link, json.loads(info)) for link, info in found]
+
+    def _due_query(self, columns='link'):
+        return (f'SELECT {columns} FROM links WHERE job = ? AND (status = ? OR (status = ? AND attempts < ? AND next_attempt <= ?)) '
+                'ORDER BY rowid', (self.job, PENDING, FAILED, self.max_attempts, time.time()))
+
+    def mark_done(self, links):
+        """Marks links as processed, e.g. once their rows are synced to the output file."""
+        with self._lock:
+            self._connection.executemany(
+                'UPDATE links SET status = ?, error = NULL WHERE job = ? AND link = ?',
+                [(DONE, self.job, link) for link in links],
+            )
+            self._connection.commit()
+
+    def mark_failed(self, link, error):
+        """Records a failed fetch and schedules the next attempt after an exponential backoff.
+
+        A permanent error (FetchError.permanent, e.g. a 404) marks the link gone instead: it is not retried.
+        """
+        status = GONE if getattr(error, 'permanent', False) else FAILED
+        with self._lock:
+            self._connection.execute(
+                'UPDATE links SET status = ?, attempts = attempts + 1, error = ?, '
+                'next_attempt = ? * (1 << attempts) + ? WHERE job = ? AND link = ?',
+                (status, str(error), self.retry_base, time.time(), self.job, link),
+            )
+            self._connection.commit()
+
+    def counts(self):
+        """Returns the number of links of the job per status, plus the failed ones that will be retried.
+
+        Gone links are finished like done ones: only pending and retryable links leave the job to a rerun.
+        """
+        with self._lock:
+            counts = dict(self._connection.execute('SELECT status, COUNT(*) FROM links WHERE job = ? GROUP BY status', (self.job,)))
+            counts['retryable'] = self._connection.execute(
+                'SELECT COUNT(*) FROM links WHERE job = ? AND status = ? AND attempts < ?', (self.job, FAILED, self.max_attempts)
+            ).fetchone()[0]
+        return {status: counts.get(status, 0) for status in (PENDING, DONE, FAILED, GONE, 'retryable')}
+
+    def reset(self):
+        """Forgets the links and progress of the job, for a run that starts over."""
+        with self._lock:
+            self._connection.execute('DELETE FROM links WHERE job = ?', (self.job,))
+            self._connection.execute('UPDATE jobs SET discovered = 0 WHERE job = ?', (self.job,))
+            self._connection.commit()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+def prune_jobs(path=DEFAULT_PATH, max_age_days=7):
+    """Deletes the jobs created more than max_age_days ago, with their links."""
+    path = Path(path)
+    if not path.exists():
+        return
+    connection = sqlite3.connect(path, timeout=30)
+    try:
+        old = [job for job, in connection.execute('SELECT job FROM jobs WHERE created < ?', (time.time() - max_age_days * 86400,))]
+        connection.executemany('DELETE FROM links WHERE job = ?', [(job,) for job in old])
+        connection.executemany('DELETE FROM jobs WHERE job = ?', [(job,) for job in old])
+        connection.commit()
+    finally:
+        connection.close()
@@ -0,0 +1,46 @@
+"""
+Shared fixtures of the tests. The scripts of src/ import each other as top-level modules, as
+they do when run from the repository root, so src/ is put on the import path.
+"""
+
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+class QuietHandler(BaseHTTPRequestHandler):
+    """Request handler that does not log every request to stderr."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, body, status=200, headers=(), content_type='text/html; charset=utf-8'):
+        body = body.encode('utf-8') if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+@pytest.fixture
+def serve():
+    """Starts a local HTTP server for a handler class and returns its base URL; stopped after the test."""
+    servers = []
+
+    def start(handler):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f'http://127.0.0.1:{server.server_port}'
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,139 @@
+"""TokenBucket and FetchScheduler: per-host rate, bounded concurrency and the stats() counters."""
+
+import threading
+import time
+
+import pytest
+import requests
+
+import fetch_scheduler
+from conftest import QuietHandler
+from fetch_scheduler import FetchScheduler, TokenBucket
+
+class FakeClock:
+    """Replaces the time module of fetch_scheduler: sleep() advances monotonic() instead of waiting.
+
+    Like a real clock, a sleep lasts at least a microsecond, so a wait shortened by rounding errors
+    still moves time forward.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self._lock = threading.Lock()
+
+    def monotonic(self):
+        with self._lock:
+            return self.now
+
+    def sleep(self, seconds):
+        with self._lock:
+            self.now += max(seconds, 1e-6)
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(fetch_scheduler, 'time', clock)
+    return clock
+
+@pytest.fixture
+def server(serve):
+    """Local server whose pages take 20 ms; records the most requests it served at once."""
+    state = {'active': 0, 'max_active': 0, 'lock': threading.Lock()}
+
+    class Handler(QuietHandler):
+        def do_GET(self):
+            with state['lock']:
+                state['active'] += 1
+                state['max_active'] = max(state['max_active'], state['active'])
+            time.sleep(0.02)
+            with state['lock']:
+                state['active'] -= 1
+            self.send_body(self.path)
+
+    return serve(Handler), state
+
+def fetch(url):
+    return requests.get(url, timeout=5).text
+
+@pytest.mark.parametrize('rate, burst', [(2.0, 1), (5.0, 1), (4.0, 3)])
+def test_token_bucket_rate(clock, rate, burst):
+    bucket = TokenBucket(rate, burst)
+    for _ in range(20):
+        bucket.acquire()
+    # The first `burst` tokens are there from the start, the others come at `rate` per second
+    assert clock.now == pytest.approx((20 - burst) / rate, abs=1e-4)
+
+def test_token_bucket_refills_while_idle(clock):
+    bucket = TokenBucket(2.0, burst=2)
+    bucket.acquire()
+    bucket.acquire()
+    clock.sleep(10)  # Idle: refilled up to the burst, not beyond
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.now == pytest.approx(10.5, abs=1e-4)
+
+def test_requests_to_one_host_follow_the_rate(server):
+    base_url, _ = server
+    with FetchScheduler(concurrency=4, rate_per_host=20.0) as scheduler:
+        start = time.monotonic()
+        pages = list(scheduler.map(fetch, [f'{base_url}/page/{i}' for i in range(10)]))
+        elapsed = time.monotonic() - start
+    assert pages == [f'/page/{i}' for i in range(10)]
+    # Ten requests at 20 per second: the first goes at once, the last 9 / 20 s later
+    assert 0.45 <= elapsed < 0.45 + 0.4
+
+def test_hosts_have_separate_buckets(server):
+    base_url, _ = server
+    other_url = base_url.replace('127.0.0.1', 'localhost')  # Same server, another host name
+    urls = [f'{url}/page/{i}' for i in range(10) for url in (base_url, other_url)]
+    with FetchScheduler(concurrency=4, rate_per_host=20.0) as scheduler:
+        start = time.monotonic()
+        list(scheduler.map(fetch, urls))
+        elapsed = time.monotonic() - start
+    # Twenty requests in the time of ten: each host gets its own 20 per second
+    assert 0.45 <= elapsed < 0.45 + 0.4
+
+def test_in_flight_never_exceeds_concurrency(server):
+    base_url, state = server
+    peak = 0
+    with FetchScheduler(concurrency=3, rate_per_host=None) as scheduler:
+        futures = [scheduler.submit(base_url, fetch, f'{base_url}/page/{i}') for i in range(24)]
+        while not all(future.done() for future in futures):
+            peak = max(peak, scheduler.stats()['in_flight'])
+            time.sleep(0.001)
+        assert [future.result() for future in futures] == [f'/page/{i}' for i in range(24)]
+    assert state['max_active'] == 3
+    assert 1 <= peak <= 3
+
+def test_stats_counters(clock):
+    release = threading.Event()
+    started = threading.Semaphore(0)
+
+    def work(fail):
+        started.release()
+        release.wait(5)
+        if fail:
+            raise ValueError('page changed')
+        return 'row'
+
+    scheduler = FetchScheduler(concurrency=2, rate_per_host=None)
+    try:
+        futures = [scheduler.submit('http://example.test/', work, i == 4) for i in range(5)]
+        for _ in range(2):
+            assert started.acquire(timeout=5)
+        assert scheduler.stats() == {
+            'submitted': 5, 'completed': 0, 'failed': 0, 'in_flight': 2, 'queue_depth': 3, 'throughput': 0.0,
+        }
+
+        clock.sleep(2.0)
+        release.set()
+        for future in futures[:4]:
+            assert future.result(5) == 'row'
+        with pytest.raises(ValueError):
+            futures[4].result(5)
+        assert scheduler.stats() == {
+            'submitted': 5, 'completed': 4, 'failed': 1, 'in_flight': 0, 'queue_depth': 0, 'throughput': 2.0,
+        }
+    finally:
+        release.set()
+        scheduler.shutdown()
@@ -0,0 +1,141 @@
+"""conditional_get and HttpCache against a local server answering 304s."""
+
+import sqlite3
+
+import pytest
+import requests
+
+from conftest import QuietHandler
+from http_cache import HttpCache, conditional_get
+
+def page_server(serve, etag='"v1"'):
+    """Serves one page; answers 304 to a matching If-None-Match when `etag` is set. Returns (url, requests log)."""
+    state = {'body': '<html>listing 1</html>', 'etag': etag, 'requests': []}
+
+    class Handler(QuietHandler):
+        def do_GET(self):
+            if_none_match = self.headers.get('If-None-Match')
+            if state['etag'] and if_none_match == state['etag']:
+                state['requests'].append((if_none_match, 304))
+                self.send_response(304)
+                self.send_header('ETag', state['etag'])
+                self.end_headers()
+                return
+            state['requests'].append((if_none_match, 200))
+            self.send_body(state['body'], headers=[('ETag', state['etag'])] if state['etag'] else [])
+
+    return serve(Handler) + '/listing/1', state
+
+class Parser:
+    """Parse function counting its calls."""
+
+    def __init__(self, result=None, error=None):
+        self.calls = 0
+        self.result = result
+        self.error = error
+
+    def __call__(self, response):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return self.result if self.result is not None else {'body': response.text}
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = HttpCache(tmp_path / 'http_cache.sqlite')
+    yield cache
+    cache.close()
+
+def test_304_reuses_the_stored_result(serve, cache):
+    url, state = page_server(serve)
+    parse = Parser()
+    with requests.Session() as session:
+        first, reused = conditional_get(session, url, parse, cache)
+        assert (first, reused, parse.calls) == ({'body': '<html>listing 1</html>'}, False, 1)
+
+        second, reused = conditional_get(session, url, parse, cache)
+    assert second == first
+    assert reused
+    assert parse.calls == 1  # Not parsed again
+    assert state['requests'] == [(None, 200), ('"v1"', 304)]
+    assert cache.stats()['hits'] == 1
+
+def test_changed_page_is_parsed_again(serve, cache):
+    url, state = page_server(serve)
+    parse = Parser()
+    with requests.Session() as session:
+        conditional_get(session, url, parse, cache)
+        state['body'], state['etag'] = '<html>listing 1, new price</html>', '"v2"'
+        result, reused = conditional_get(session, url, parse, cache)
+    assert (result, reused, parse.calls) == ({'body': '<html>listing 1, new price</html>'}, False, 2)
+
+def test_same_body_without_validators_is_reused(serve, cache):
+    url, state = page_server(serve, etag=None)
+    parse = Parser()
+    with requests.Session() as session:
+        first, _ = conditional_get(session, url, parse, cache)
+        second, reused = conditional_get(session, url, parse, cache)
+        assert (second, reused, parse.calls) == (first, True, 1)
+        assert state['requests'] == [(None, 200), (None, 200)]
+
+        state['body'] = '<html>listing 1, sold</html>'
+        third, reused = conditional_get(session, url, parse, cache)
+    assert (third, reused, parse.calls) == ({'body': '<html>listing 1, sold</html>'}, False, 2)
+
+def test_failed_parse_is_not_cached(serve, cache):
+    url, state = page_server(serve)
+    with requests.Session() as session:
+        with pytest.raises(ValueError):
+            conditional_get(session, url, Parser(error=ValueError('payload changed')), cache)
+        # The fixed parser sees the page, although the server would answer 304 to the old validators
+        parse = Parser()
+        result, reused = conditional_get(session, url, parse, cache)
+    assert (result, reused, parse.calls) == ({'body': '<html>listing 1</html>'}, False, 1)
+    assert state['requests'] == [(None, 200), (None, 200)]
+
+def test_empty_result_is_not_cached(serve, cache):
+    url, state = page_server(serve)
+    calls = []
+
+    def no_row(response):
+        calls.append(response.status_code)
+        return None
+
+    with requests.Session() as session:
+        conditional_get(session, url, Parser(), cache)
+        # The page changes and its parse now yields nothing: the entry is dropped, not kept as None
+        state['body'], state['etag'] = '<html>listing 1, removed</html>', '"v2"'
+        assert conditional_get(session, url, no_row, cache) == (None, False)
+        assert conditional_get(session, url, no_row, cache) == (None, False)
+    assert calls == [200, 200]
+    assert cache.get(url) is None
+    assert state['requests'] == [(None, 200), ('"v1"', 200), (None, 200)]
+
+def test_parser_version_change_parses_again(serve, cache):
+    url, state = page_server(serve)
+    with requests.Session() as session:
+        conditional_get(session, url, Parser(result={'row': 'old'}), cache, version=1)
+        parse = Parser(result={'row': 'new'})
+        result, reused = conditional_get(session, url, parse, cache, version=2)
+        assert (result, reused, parse.calls) == ({'row': 'new'}, False, 1)
+        assert state['requests'][-1] == (None, 200)  # The old entry's validators are not sent
+        assert conditional_get(session, url, parse, cache, version=2) == ({'row': 'new'}, True)
+
+def test_entries_written_before_versioning_are_ignored(serve, tmp_path):
+    url, state = page_server(serve)
+    path = tmp_path / 'old_cache.sqlite'
+    connection = sqlite3.connect(path)
+    connection.execute(
+        'CREATE TABLE pages (url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body_hash TEXT NOT NULL, '
+        'result TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)'
+    )
+    connection.execute('INSERT INTO pages VALUES (?, ?, NULL, ?, ?, 4, 0)', (url, '"v1"', 'hash', 'null'))
+    connection.commit()
+    connection.close()
+
+    cache = HttpCache(path)
+    parse = Parser()
+    with requests.Session() as session:
+        result, reused = conditional_get(session, url, parse, cache)
+    cache.close()
+    assert (result, reused, parse.calls) == ({'body': '<html>listing 1</html>'}, False, 1)
@@ -0,0 +1,71 @@
+"""LalonjaSource against a local site: listing fetches interleave with the result pages."""
+
+import threading
+
+import pytest
+
+from conftest import QuietHandler
+from lalonja import LalonjaSource
+
+TOTAL_PAGES = 6
+LISTINGS_PER_PAGE = 3
+
+def results_page(page):
+    cards = ''.join(
+        f'<div class="card"><a id="ruta32" href="/inmueble/{page * 100 + i}/Venta/">Apartamento</a></div>'
+        for i in range(LISTINGS_PER_PAGE)
+    )
+    pagination = ''.join(f'<li><a href="/inmuebles/Venta/clases_Apartamento/pagina/{i}">{i}</a></li>'
+                         for i in range(1, TOTAL_PAGES + 1))
+    return f'<html><body><main>{cards}</main><ul class="pagination">{pagination}<li><a href="#">»</a></li></ul></body></html>'
+
+def listing_page(code):
+    features = ''.join(f'<li><strong>{label}:</strong><span>{value}</span></li>'
+                       for label, value in (('Baños', 2), ('Área', '60m'), ('Habitaciones', 3), ('Garajes', 1), ('Closets', 2)))
+    return (f'<html><body><h1>Apartamento en venta</h1><div class="property-price">$250,000,000</div>'
+            f'<div class="listing-address">Medellín, Barrio {code}</div><ul class="features">{features}</ul></body></html>')
+
+@pytest.fixture
+def site(serve):
+    """Local lalonja site; returns (base URL, paths requested in order)."""
+    requested = []
+    lock = threading.Lock()
+
+    class Handler(QuietHandler):
+        def do_GET(self):
+            with lock:
+                requested.append(self.path)
+            if self.path.startswith('/inmueble/'):
+                self.send_body(listing_page(self.path.split('/')[2]))
+            elif self.path.startswith('/inmuebles/Venta/clases_Apartamento'):
+                page = int(self.path.rsplit('/', 1)[1]) if '/pagina/' in self.path else 1
+                self.send_body(results_page(page))
+            else:
+                self.send_body('<html>No encontrado</html>', status=404)
+
+    return serve(Handler), requested
+
+@pytest.mark.parametrize('concurrency', [2, 4])
+def test_listings_interleave_with_result_pages(site, concurrency):
+    base_url, _ = site
+    source = LalonjaSource(concurrency=concurrency, rate_per_host=50.0)
+    source.base_url = f'{base_url}/inmuebles/Venta'
+    # Record the order fetches are handed to the scheduler; the order they reach the server
+    # also depends on which worker thread runs first
+    submitted = []
+    submit_page, submit_listing = source._submit_page, source._submit_listing
+    source._submit_page = lambda *args: submitted.append('page') or submit_page(*args)
+    source._submit_listing = lambda *args: submitted.append('listing') or submit_listing(*args)
+    try:
+        rows = source.scrape('clases_Apartamento')
+    finally:
+        source.close()
+
+    expected_codes = [str(page * 100 + i) for page in range(1, TOTAL_PAGES + 1) for i in range(LISTINGS_PER_PAGE)]
+    assert sorted(row.code for row in rows) == expected_codes
+
+    assert submitted.count('page') == TOTAL_PAGES
+    first_listing = submitted.index('listing')
+    # Only the window of result pages, not every one, is queued before the first listing
+    assert submitted[:first_listing] == ['page'] * source.page_window
+    assert len(submitted) - 1 - submitted[::-1].index('page') > first_listing
@@ -0,0 +1,186 @@
+"""The HTTP path of metrocuadrado detail pages gives the same listing as the browser path."""
+
+import json
+import re
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+import requests
+
+from conftest import QuietHandler
+from http_cache import HttpCache
+from http_client import FetchError, create_session
+from m2_payload import DATA_MARKER
+from metrocuadrado import (
+    PAYLOAD_FIELDS, PAYLOAD_FIELDS_JS, extract_json_data, extract_property_details, parse_property_details,
+)
+
+FIXTURE = Path(__file__).parent / 'fixtures' / 'm2_detail_21131-M6956108.html'
+EXTRACTION_DATE = '2025-06-01'
+
+def flight_chunks(page_source):
+    """The self.__next_f pushes of the page, which stand in for the flight data Next.js parsed."""
+    return [json.loads(push) for push in re.findall(r'self\.__next_f\.push\((.*?)\)</script>', page_source, re.S)]
+
+def pick_payload_fields(page_source, fields):
+    """What PAYLOAD_FIELDS_JS returns once the page is complete, step for step in Python."""
+    chunks = flight_chunks(page_source)
+    text = ''.join(chunk[1] for chunk in chunks if chunk[0] == 1)
+    at = text.find('{"data"')
+    if at == -1:
+        return {'payload': None}
+    end = text.find('\n', at)
+    row = text[text.rfind('\n', 0, at) + 1:end if end != -1 else len(text)]
+    try:
+        value = json.loads(row[row.index(':') + 1:])
+    except ValueError:
+        return {'payload': None}
+
+    def find_data(node):
+        if isinstance(node, dict) and isinstance(node.get('data'), (dict, list)):
+            return node['data']
+        for child in (node.values() if isinstance(node, dict) else node if isinstance(node, list) else ()):
+            found = find_data(child)
+            if found is not None:
+                return found
+        return None
+
+    data = find_data(value)
+    if data is None:
+        return {'payload': None}
+    picked = {}
+    for field in fields:
+        *parents, last = field.split('.')
+        source, target = data, picked
+        for key in parents:
+            source = source.get(key)
+            if not isinstance(source, dict):
+                break
+            target = target.setdefault(key, {})
+        if isinstance(source, dict) and last in source:
+            target[last] = source[last]
+    return {'payload': {'data': picked}}
+
+class FakeDriver:
+    """Stands in for a WebDriver that loaded a page: answers the payload queries and page_source.
+
+    Args:
+        page_source (str): HTML of the page.
+        in_dom (bool): Whether the payload script is found in the DOM; if not, the page completes
+            without it and extract_json_data falls back to page_source.
+        pick (callable): Answers PAYLOAD_FIELDS_JS as (page_source, fields) -> result.
+    """
+
+    def __init__(self, page_source, in_dom=True, pick=pick_payload_fields):
+        self.page_source = page_source
+        self.in_dom = in_dom
+        self.pick = pick
+        self.urls = []
+
+    def get(self, url):
+        self.urls.append(url)
+
+    def execute_script(self, script, argument):
+        if script == PAYLOAD_FIELDS_JS:
+            return self.pick(self.page_source, argument)
+        scripts = re.findall(r'<script[^>]*>(.*?)</script>', self.page_source, re.S) if self.in_dom else []
+        return {'text': next((text for text in scripts if argument in text), None)}
+
+@pytest.fixture(scope='module')
+def page():
+    return FIXTURE.read_text(encoding='utf-8')
+
+@pytest.fixture
+def detail_url(serve, page):
+    etag = '"21131-M6956108-1"'
+
+    class Handler(QuietHandler):
+        def do_GET(self):
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            # No charset declared, like the site: the accents must still decode as UTF-8
+            self.send_body(page, headers=[('ETag', etag)], content_type='text/html')
+
+    return serve(Handler) + '/inmueble/venta-apartaestudio-medellin-villa-carlota/21131-M6956108'
+
+def test_fixture_holds_the_payload(page):
+    assert DATA_MARKER in page
+
+@pytest.mark.parametrize('in_dom', [True, False], ids=['payload-script', 'page-source'])
+def test_http_details_match_the_browser(detail_url, page, in_dom):
+    driver = FakeDriver(page, in_dom)
+    browser_json = extract_json_data(driver, detail_url, timeout=5)
+    expected = parse_property_details(browser_json, detail_url, EXTRACTION_DATE)
+    assert expected is not None
+    assert expected.propertyId == '21131-M6956108'
+    assert expected.city == {'id': '3', 'nombre': 'Medellín'}
+    assert expected.adminPrice == 410000
+
+    with create_session() as session:
+        assert extract_json_data(None, detail_url, timeout=5, session=session) == browser_json
+        details = extract_property_details(None, detail_url, timeout=5, session=session, extraction_date=EXTRACTION_DATE)
+    assert details == expected
+
+def test_cached_http_details_match_the_browser(detail_url, page, tmp_path):
+    expected = parse_property_details(extract_json_data(FakeDriver(page), detail_url, timeout=5), detail_url, EXTRACTION_DATE)
+    cache = HttpCache(tmp_path / 'http_cache.sqlite')
+    try:
+        with create_session() as session:
+            first = extract_property_details(None, detail_url, timeout=5, session=session, cache=cache,
+                                             extraction_date=EXTRACTION_DATE)
+            # Answered 304: the row comes back from the cache, with the date of the new run
+            second = extract_property_details(None, detail_url, timeout=5, session=session, cache=cache,
+                                              extraction_date='2025-06-08')
+        assert first == expected
+        assert cache.stats()['hits'] == 1
+    finally:
+        cache.close()
+    expected.extraction_date = '2025-06-08'
+    assert second == expected
+
+def test_missing_page_raises_fetch_error(serve):
+    class Handler(QuietHandler):
+        def do_GET(self):
+            self.send_body('<html>No encontrado</html>', status=404)
+
+    url = serve(Handler) + '/inmueble/21131-M0000000'
+    with requests.Session() as session:
+        assert extract_property_details(None, url, timeout=5, session=session) is None
+        with pytest.raises(FetchError) as error:
+            extract_property_details(None, url, timeout=5, session=session, raise_errors=True)
+    assert error.value.status == 404
+    assert error.value.permanent  # Not retried by the work queue
+
+def test_fields_picked_in_the_page_give_the_same_listing(detail_url, page):
+    expected = extract_property_details(FakeDriver(page), detail_url, timeout=5, extraction_date=EXTRACTION_DATE)
+    picked = pick_payload_fields(page, PAYLOAD_FIELDS)['payload']
+    assert picked['data']['detail'] == {'adminPrice': 410000}
+    assert 'images' not in picked['data']
+    details = extract_property_details(FakeDriver(page), detail_url, timeout=5, in_page=True, extraction_date=EXTRACTION_DATE)
+    assert details == expected
+
+def test_picked_fields_that_do_not_parse_fall_back_to_the_page_source(detail_url, page):
+    expected = extract_property_details(FakeDriver(page), detail_url, timeout=5, extraction_date=EXTRACTION_DATE)
+    # The flight data changed shape: "detail" is no longer where the picked paths expect it
+    without_detail = lambda page_source, fields: pick_payload_fields(page_source, [f for f in fields if f != 'detail.adminPrice'])
+    driver = FakeDriver(page, pick=without_detail)
+    assert parse_property_details(extract_json_data(driver, detail_url, timeout=5, fields=PAYLOAD_FIELDS), detail_url) is None
+    details = extract_property_details(driver, detail_url, timeout=5, in_page=True, extraction_date=EXTRACTION_DATE)
+    assert details == expected
+
+@pytest.mark.skipif(shutil.which('node') is None, reason='needs Node.js to run the page script')
+def test_python_mirror_matches_the_page_script(page):
+    # Runs PAYLOAD_FIELDS_JS as the browser would, on a complete page holding the fixture's flight data
+    runner = """
+    const {script, chunks, fields} = JSON.parse(require('fs').readFileSync(0, 'utf8'));
+    globalThis.self = {__next_f: chunks};
+    globalThis.document = {readyState: 'complete'};
+    process.stdout.write(JSON.stringify(new Function(script)(fields)));
+    """
+    payload = {'script': PAYLOAD_FIELDS_JS, 'chunks': flight_chunks(page), 'fields': list(PAYLOAD_FIELDS)}
+    result = subprocess.run(['node', '-e', runner], input=json.dumps(payload), capture_output=True, text=True, check=True)
+    assert json.loads(result.stdout) == pick_payload_fields(page, PAYLOAD_FIELDS)
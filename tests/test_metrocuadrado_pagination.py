@@ -0,0 +1,153 @@
+"""iter_result_pages against a fake results page: lazy loading, the "next page" control, the caps
+and when a job's result pages count as walked."""
+
+import contextlib
+
+import pytest
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+
+import metrocuadrado
+from metrocuadrado import CARD_CLASS, NEXT_PAGE_SELECTOR, MetrocuadradoSource, iter_result_pages, walk_result_pages
+from work_queue import WorkQueue
+
+RESULTS_URL = 'https://www.metrocuadrado.com/apartaestudio-apartamento/venta/medellin/'
+
+class FastWait(WebDriverWait):
+    """WebDriverWait polling every 10 ms instead of 500, so the fake pages are walked quickly."""
+
+    def __init__(self, driver, timeout, poll_frequency=0.01, ignored_exceptions=None):
+        super().__init__(driver, timeout, poll_frequency, ignored_exceptions)
+
+@pytest.fixture(autouse=True)
+def fast_waits(monkeypatch):
+    monkeypatch.setattr(metrocuadrado, 'WebDriverWait', FastWait)
+    # The source walks with its own timeout (minutes); the fake pages answer at once or never
+    monkeypatch.setattr(metrocuadrado, 'iter_result_pages',
+                        lambda driver, url_main, timeout: iter_result_pages(driver, url_main, 0.2, scroll_timeout=0.05))
+
+class FakeLink:
+    def __init__(self, href):
+        self.href = href
+
+    def get_attribute(self, name):
+        return self.href if name == 'href' else None
+
+class FakeCard:
+    def __init__(self, href):
+        self.link = FakeLink(href)
+        self.text = f'Apartamento {href.rsplit("/", 1)[1]}\n$ 350.000.000\n60 m²'
+
+    def find_elements(self, by, value):
+        assert (by, value) == (By.TAG_NAME, 'a')
+        return [self.link]
+
+class ResultsDriver:
+    """Stands in for a WebDriver on the results pages: cards load `batch` at a time as the page is
+    scrolled, and clicking the "next page" control replaces the cards in place.
+
+    Args:
+        pages (list): Number of cards of each result page; None for a page that keeps loading cards forever.
+        batch (int): Cards shown on load and added by each scroll.
+        stuck (set): Pages (from 1) whose "next page" click does nothing, like a request that timed out.
+    """
+
+    def __init__(self, pages, batch=10, stuck=()):
+        self.pages = pages
+        self.batch = batch
+        self.stuck = set(stuck)
+        self.page = None
+        self.shown = 0
+        self.scrolls = 0
+        self.urls = []
+
+    def get(self, url):
+        self.urls.append(url)
+        self.page, self.shown = 1, self.batch
+
+    def cards(self):
+        total = self.pages[self.page - 1]
+        shown = self.shown if total is None else min(self.shown, total)
+        return [FakeCard(f'https://www.metrocuadrado.com/inmueble/venta-apartamento/{self.page}-M{i}') for i in range(shown)]
+
+    def find_elements(self, by, value):
+        if (by, value) == (By.CLASS_NAME, CARD_CLASS):
+            return self.cards()
+        if (by, value) == (By.CSS_SELECTOR, f'.{CARD_CLASS} a'):
+            return [card.link for card in self.cards()]
+        if (by, value) == (By.CSS_SELECTOR, NEXT_PAGE_SELECTOR):
+            return ['next'] if self.page < len(self.pages) else []
+        raise AssertionError(f'unexpected locator {by} {value}')
+
+    def execute_script(self, script, *args):
+        if 'scrollTo' in script:
+            self.scrolls += 1
+            self.shown += self.batch
+        elif 'click' in script and args == ('next',):
+            if self.page not in self.stuck:
+                self.page, self.shown = self.page + 1, self.batch
+        else:
+            raise AssertionError(f'unexpected script {script}')
+
+class FakePool:
+    """Hands out the given drivers in turn, like BrowserPool.browser()."""
+
+    def __init__(self, *drivers):
+        self.drivers = list(drivers)
+
+    @contextlib.contextmanager
+    def browser(self):
+        yield self.drivers.pop(0)
+
+    def close(self):
+        pass
+
+def walk(driver, **kwargs):
+    return list(iter_result_pages(driver, RESULTS_URL, timeout=0.2, scroll_timeout=0.05, **kwargs))
+
+def test_walks_every_page_once_its_cards_stop_loading():
+    driver = ResultsDriver([25, 25, 7])
+    pages = walk(driver)
+    assert [len(cards) for cards in pages] == [25, 25, 7]
+    links = [link for cards in pages for link, _ in cards]
+    assert len(set(links)) == len(links)
+    assert links[0] == 'https://www.metrocuadrado.com/inmueble/venta-apartamento/1-M0'
+    assert driver.urls == [RESULTS_URL]
+
+def test_scrolling_stops_at_max_scrolls():
+    driver = ResultsDriver([None], batch=10)
+    pages = walk(driver, max_scrolls=5)
+    assert driver.scrolls == 5
+    assert [len(cards) for cards in pages] == [60]
+
+def test_walk_stops_at_max_pages():
+    assert len(walk(ResultsDriver([10] * 6), max_pages=4)) == 4
+
+@pytest.mark.parametrize('driver, complete', [
+    (ResultsDriver([10, 10, 3]), True),
+    (ResultsDriver([10, 10, 3], stuck={1}), False),
+], ids=['last-page', 'page-timed-out'])
+def test_walk_reports_whether_the_pagination_ended(driver, complete):
+    cards = []
+    assert walk_result_pages(driver, RESULTS_URL, cards.extend) is complete
+    assert len(cards) == (23 if complete else 10)
+
+@pytest.mark.parametrize('http_mode', [False, True], ids=['browser', 'http'])
+def test_rerun_walks_the_pages_again_after_a_page_timed_out(monkeypatch, tmp_path, http_mode):
+    monkeypatch.setattr(metrocuadrado, 'extract_property_details', lambda *args, **kwargs: None)  # Every link done, no row
+    work_queue = WorkQueue('metrocuadrado/Apartments/medellin/2025-06-01', tmp_path / 'work_queue.sqlite')
+    first, rerun = ResultsDriver([10, 10, 3], stuck={1}), ResultsDriver([10, 10, 3])
+    source = MetrocuadradoSource(http_mode=http_mode, rate_per_host=None)
+    source.pool = FakePool(first, rerun)
+    try:
+        assert list(source.iter_rows('apartaestudio-apartamento', 'medellin', work_queue=work_queue)) == []
+        assert not work_queue.discovered  # Page 2 never loaded
+        assert work_queue.counts()['done'] == 10
+
+        list(source.iter_rows('apartaestudio-apartamento', 'medellin', work_queue=work_queue))
+        assert rerun.urls == [f'{MetrocuadradoSource.base_url}/apartaestudio-apartamento/venta/medellin/']
+        assert work_queue.discovered
+        assert work_queue.counts()['done'] == 23
+    finally:
+        source.close()
+        work_queue.close()
@@ -0,0 +1,23 @@
+"""The single-pass parsers return what the per-field searches they replaced did (see src/bench_scrape.py)."""
+
+import pytest
+from bs4 import BeautifulSoup
+
+from bench_scrape import (
+    legacy_extract_payload, legacy_listing_fields, synthetic_lalonja_listing_page, synthetic_m2_detail_page,
+)
+from lalonja import extract_listing_fields
+from m2_payload import DATA_MARKER, extract_payload
+
+def payload_scripts(html):
+    return [tag.string for tag in BeautifulSoup(html, 'html.parser').find_all('script') if tag.string and DATA_MARKER in tag.string]
+
+@pytest.mark.parametrize('index', range(20))
+def test_payload_locator_matches_the_brace_counter(index):
+    for script in payload_scripts(synthetic_m2_detail_page(index)):
+        assert extract_payload(script) == legacy_extract_payload(script)
+
+@pytest.mark.parametrize('index', range(20))
+def test_single_pass_labels_match_the_per_label_searches(index):
+    soup = BeautifulSoup(synthetic_lalonja_listing_page(index), 'html.parser')
+    assert extract_listing_fields(soup) == legacy_listing_fields(soup)
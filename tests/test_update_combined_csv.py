@@ -0,0 +1,41 @@
+"""update_combined_csv over a small data/ tree: only the daily CSVs reach the store, editor leftovers are skipped."""
+
+import csv
+
+from csv_ingest import data_files
+from listing_store import ListingStore
+from update_combined_csv import update_combined_csv
+
+HEADER = ['propertyId', 'salePrice', 'Extraction Date']
+
+def write_csv(path, rows):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+
+def test_checkpoints_are_not_data_files(tmp_path, capsys):
+    data_dir = tmp_path / 'data'
+    daily = [
+        data_dir / 'Apartments' / 'listings_data_m2_medellin_2025-06-01.csv',
+        data_dir / 'Apartments' / 'listings_data_m2_medellin_2025-06-02.csv',
+        data_dir / 'Houses' / 'listings_data_2025-06-01.csv',
+    ]
+    for i, path in enumerate(daily):
+        write_csv(path, [[f'{i}-M1', '350000000', path.stem[-10:]]])
+    # What Jupyter leaves behind when the CSVs are opened in a notebook
+    write_csv(data_dir / 'Apartments' / '.ipynb_checkpoints' / 'listings_data_2025-01-02-checkpoint.csv', [['x', '1', '']])
+    write_csv(data_dir / '.ipynb_checkpoints' / 'listings_data-checkpoint.csv', [['x', '1', '']])
+    write_csv(data_dir / 'Houses' / 'listings_data_2025-06-01-checkpoint.csv', [['x', '1', '']])
+
+    assert data_files(data_dir) == sorted(daily)
+
+    update_combined_csv(data_dir, workers=1, schema_cache=None, parquet=False)
+    output = capsys.readouterr().out
+    assert 'Error' not in output
+    store = ListingStore(data_dir / 'combined_listings')
+    assert store.processed_files() == {str(path.relative_to(data_dir)) for path in daily}
+
+    update_combined_csv(data_dir, workers=1, schema_cache=None, parquet=False)
+    assert 'Found 0 new CSV files to process' in capsys.readouterr().out
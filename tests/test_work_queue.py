@@ -0,0 +1,66 @@
+"""WorkQueue: transient failures are retried with backoff, permanent ones (404, 410, other 4xx) are not."""
+
+import pytest
+import requests
+
+from conftest import QuietHandler
+from http_client import FetchError
+from work_queue import WorkQueue
+
+@pytest.fixture
+def status_url(serve):
+    """URL of a local server answering the status in the path, e.g. /404."""
+
+    class Handler(QuietHandler):
+        def do_GET(self):
+            self.send_body(f'<html>{self.path}</html>', status=int(self.path.strip('/')))
+
+    return serve(Handler)
+
+def fetch_error(url):
+    try:
+        with requests.Session() as session:
+            session.get(url, timeout=5).raise_for_status()
+    except requests.exceptions.RequestException as e:
+        return FetchError(e)
+    raise AssertionError(f'{url} did not fail')
+
+@pytest.mark.parametrize('status, permanent', [
+    (404, True), (410, True), (403, True), (400, True),
+    (429, False), (408, False), (500, False), (503, False),
+])
+def test_fetch_error_status(status_url, status, permanent):
+    error = fetch_error(f'{status_url}/{status}')
+    assert error.status == status
+    assert error.permanent is permanent
+
+def test_errors_without_status_are_transient():
+    assert not FetchError('Timeout on https://www.metrocuadrado.com/inmueble/1').permanent
+    assert not FetchError(requests.exceptions.ConnectionError('connection reset')).permanent
+    assert FetchError('Listing removed', status=410).permanent
+
+@pytest.fixture
+def work_queue(tmp_path):
+    work_queue = WorkQueue('lalonja/Apartments/all/2025-06-01', tmp_path / 'work_queue.sqlite', retry_base=0, max_attempts=3)
+    yield work_queue
+    work_queue.close()
+
+def test_permanent_failure_is_gone(work_queue, status_url):
+    links = [(f'{status_url}/{status}', {'code': status}) for status in (404, 410, 503)]
+    links.append((f'{status_url}/200', {'code': 200}))
+    assert work_queue.add(links) == links
+    for link, _ in links[:3]:
+        work_queue.mark_failed(link, fetch_error(link))
+    work_queue.mark_done([links[3][0]])
+
+    assert work_queue.counts() == {'pending': 0, 'done': 1, 'failed': 1, 'gone': 2, 'retryable': 1}
+    assert work_queue.due() == [links[2]]  # Only the 503 is retried
+
+def test_transient_failure_is_given_up_after_max_attempts(work_queue, status_url):
+    link = f'{status_url}/503'
+    work_queue.add([(link, None)])
+    for _ in range(3):
+        assert work_queue.due() == [(link, None)]
+        work_queue.mark_failed(link, fetch_error(link))
+    assert work_queue.due() == []
+    assert work_queue.counts() == {'pending': 0, 'done': 0, 'failed': 1, 'gone': 0, 'retryable': 0}